@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+'''
+Fault-injection scenarios for the ``voxel51.task.TaskManager`` lifecycle
+against a local stand-in of the Vision Services Platform.
+
+Each scenario runs the task lifecycle of ``benchmark_task.py`` several times
+against fake servers that inject seeded faults (see ``fake_platform.py``),
+and checks that the SDK handles them:
+
+- ``errors``: the first storage and API requests and then 10% of them fail
+  with ``503`` responses. Every run must complete, which exercises the
+  retries of idempotent requests
+- ``stalls``: the first API response and then 25% of them stall for a few
+  seconds. Every run must
+  complete, and the job states recorded by the API must never be reordered,
+  which exercises hedged requests and the ordering of their losers
+- ``deadline``: every storage response stalls for longer than the time
+  budget of the task. Every run must fail with a ``DeadlineExceededError``
+  shortly after its budget expires, which exercises the task deadline
+
+Since the first eligible requests always fail or stall, every scenario
+injects faults regardless of the seed and the number of runs, and the random
+faults that follow are reproducible via ``--seed``. The results are written
+as JSON, and the exit code is nonzero if any expectation is not met or if a
+scenario did not inject any faults.
+
+Example usage::
+
+    python benchmarks/benchmark_faults.py --seed 0 --runs 10 \\
+        --output faults.json
+
+    python benchmarks/benchmark_faults.py --scenarios errors --error-rate 0.2
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+from collections import OrderedDict
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import voxel51.config as voxc
+import voxel51.task as voxt
+import voxel51.utils as voxu
+
+from benchmark_task import make_task, parse_size, run_task
+from fake_platform import FakeAPIServer, FakeStorageServer, FaultConfig
+
+
+SCENARIOS = ("errors", "stalls", "deadline")
+
+#
+# The time, in seconds, that a failed run may take beyond its time budget in
+# the ``deadline`` scenario
+#
+DEADLINE_SLACK = 2.0
+
+
+logger = logging.getLogger(__name__)
+
+
+def make_faults(scenario, args):
+    '''Makes the faults to inject into the fake servers in the given
+    scenario.
+
+    Args:
+        scenario (str): one of ``SCENARIOS``
+        args (argparse.Namespace): the command-line arguments
+
+    Returns:
+        a (storage_faults, api_faults) tuple of FaultConfigs
+    '''
+    if scenario == "errors":
+        return (
+            FaultConfig(
+                error_rate=args.error_rate, error_count=1, seed=args.seed),
+            FaultConfig(
+                error_rate=args.error_rate, error_count=1, seed=args.seed))
+
+    if scenario == "stalls":
+        return (
+            FaultConfig(seed=args.seed),
+            FaultConfig(
+                stall_rate=args.stall_rate, stall_time=args.stall_time,
+                stall_count=1, seed=args.seed))
+
+    if scenario == "deadline":
+        return (
+            FaultConfig(
+                stall_rate=1.0,
+                stall_time=args.time_budget + 2 * DEADLINE_SLACK,
+                seed=args.seed),
+            FaultConfig(seed=args.seed))
+
+    raise ValueError("Unsupported scenario '%s'" % scenario)
+
+
+def run_scenario(scenario, storage, api, args):
+    '''Runs the given scenario.
+
+    The fake servers are reused across scenarios, since the fake API listens
+    on a fixed address, and connections to it are kept alive by the SDK.
+
+    Args:
+        scenario (str): one of ``SCENARIOS``
+        storage (FakeStorageServer): the fake storage server
+        api (FakeAPIServer): the fake API server
+        args (argparse.Namespace): the command-line arguments
+
+    Returns:
+        a result dictionary
+    '''
+    storage_faults, api_faults = make_faults(scenario, args)
+    storage.set_faults(storage_faults)
+    api.set_faults(api_faults)
+    result = OrderedDict([
+        ("scenario", scenario),
+        ("storage_faults", storage_faults.serialize()),
+        ("api_faults", api_faults.serialize()),
+    ])
+
+    size = parse_size(args.size)
+    runs = [
+        _run_once(scenario, storage, api, size, args)
+        for _ in range(args.runs)]
+    result["injected_errors"] = (
+        storage.num_injected_errors + api.num_injected_errors)
+    result["injected_stalls"] = (
+        storage.num_injected_stalls + api.num_injected_stalls)
+    result["runs"] = runs
+    result["failures"] = [run["failure"] for run in runs if "failure" in run]
+    if not result["injected_errors"] and not result["injected_stalls"]:
+        result["failures"].append(
+            "no faults were injected")
+
+    return result
+
+
+def main(args=None):
+    '''Runs the scenarios from the command line.
+
+    Args:
+        args (list, optional): the command-line arguments. By default,
+            ``sys.argv[1:]`` is used
+
+    Returns:
+        the exit code, which is nonzero if any expectation was not met
+    '''
+    parser = argparse.ArgumentParser(
+        description="Run fault-injection scenarios of the TaskManager "
+        "lifecycle against a local stand-in of the Vision Services Platform")
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS),
+        help="comma-separated scenarios to run")
+    parser.add_argument(
+        "--runs", type=int, default=10,
+        help="the number of runs of each scenario")
+    parser.add_argument(
+        "--size", default="1MB", help="the size of the input and output")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.1,
+        help="the probability with which a request fails in the errors "
+        "scenario")
+    parser.add_argument(
+        "--stall-rate", type=float, default=0.25,
+        help="the probability with which an API response stalls in the "
+        "stalls scenario")
+    parser.add_argument(
+        "--stall-time", type=float, default=3.0,
+        help="the duration, in seconds, of stalls in the stalls scenario")
+    parser.add_argument(
+        "--time-budget", type=float, default=1.0,
+        help="the time budget, in seconds, of each task in the deadline "
+        "scenario")
+    parser.add_argument(
+        "--seed", type=int, default=0, help="a seed for the fault injection")
+    parser.add_argument(
+        "--output", default=None,
+        help="the path to which to write the results. By default, the "
+        "results are written to stdout")
+    parser.add_argument(
+        "--verbose", action="store_true", help="log the task progress")
+    args = parser.parse_args(args)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING)
+
+    os.environ[voxc.DEPLOYMENT_ENV_VAR] = voxc.DeploymentEnvironments.LOCAL
+    os.environ.setdefault(voxc.API_TOKEN_ENV_VAR, "benchmark-token")
+
+    with FakeStorageServer() as storage, FakeAPIServer() as api:
+        results = [
+            run_scenario(scenario, storage, api, args)
+            for scenario in args.scenarios.split(",")]
+
+    failures = [
+        "%s: %s" % (result["scenario"], failure)
+        for result in results for failure in result["failures"]]
+
+    results_str = json.dumps(OrderedDict([
+        ("seed", args.seed),
+        ("results", results),
+        ("failures", failures),
+    ]), indent=4)
+    if args.output:
+        with io.open(args.output, "w", encoding="utf-8") as f:
+            f.write(results_str + "\n")
+    else:
+        print(results_str)
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+def _run_once(scenario, storage, api, size, args):
+    job_id, task_config_url, output = make_task(storage, size, 1, size)
+    run = OrderedDict([("job_id", job_id), ("ok", False)])
+
+    work_dir = tempfile.mkdtemp(prefix="voxel51-faults-")
+    start = time.time()
+    try:
+        if scenario == "deadline":
+            # Bound every request of the task, including fetching its config
+            voxu.set_task_deadline(voxu.Deadline(args.time_budget))
+
+        run_task(task_config_url, output, work_dir)
+        run["ok"] = (
+            storage.get_object("%s/output.bin" % job_id) == output and
+            api.get_job_state(job_id) == voxt.TaskState.COMPLETE)
+    except Exception as e:
+        logger.debug("Run failed", exc_info=True)
+        run["error"] = "%s: %s" % (type(e).__name__, e)
+    finally:
+        voxu.set_task_deadline(None)
+        run["duration"] = time.time() - start
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with api._lock:  # pylint: disable=protected-access
+        run["job_states"] = list(api.job_states.get(job_id, []))
+
+    failure = _check_run(scenario, run, args)
+    if failure:
+        run["failure"] = "job %s: %s" % (job_id, failure)
+
+    return run
+
+
+def _check_run(scenario, run, args):
+    if scenario == "deadline":
+        if run["ok"] or not run["error"].startswith("DeadlineExceededError"):
+            return "expected DeadlineExceededError, got %s" % (
+                run.get("error") or "success")
+
+        if run["duration"] > args.time_budget + DEADLINE_SLACK:
+            return "failed after %.2fs, but the time budget was %.2fs" % (
+                run["duration"], args.time_budget)
+
+        return None
+
+    if not run["ok"]:
+        return run.get("error") or "output or job state was not recorded"
+
+    # Duplicates of a hedged write may be recorded, but a state must never
+    # be recorded again after a later state
+    states = [
+        state for idx, state in enumerate(run["job_states"])
+        if idx == 0 or state != run["job_states"][idx - 1]]
+    if len(states) != len(set(states)):
+        return "job states were reordered: %s" % run["job_states"]
+
+    return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
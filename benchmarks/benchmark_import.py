@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+'''
+Benchmark of the cold import time of the voxel51 package.
+
+Each module is imported in fresh interpreters via ``python -X importtime``,
+and the median cumulative import time is compared against a budget. The
+budget is relative to the median import time of ``BASELINE_MODULE``, i.e.,
+the parts of ETA that the SDK cannot avoid importing, so that it only covers
+the overhead of the SDK itself and does not depend on the speed of the
+machine or the version of ETA. The benchmark also fails if importing a module
+eagerly loads any of the heavy dependencies in ``LAZY_MODULES``, which must
+only be loaded when first used.
+
+Example usage::
+
+    python benchmarks/benchmark_import.py --budget 100 --output imports.json
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+from collections import OrderedDict
+import io
+import json
+import re
+import subprocess
+import sys
+
+
+#
+# The modules whose import time is measured
+#
+MODULES = ("voxel51.task", "voxel51.api", "voxel51.utils")
+
+#
+# Heavy dependencies that must not be loaded by importing any of ``MODULES``
+#
+LAZY_MODULES = (
+    "eta.core.storage", "eta.core.video", "multiprocessing.pool", "requests",
+    "zstandard", "google_crc32c")
+
+#
+# The module whose import time is the baseline of the budget, which includes
+# all ETA modules that are imported by ``MODULES``
+#
+BASELINE_MODULE = "eta.core.config"
+
+#
+# The default budget, in milliseconds, for the median cumulative import time
+# of each module beyond the median import time of ``BASELINE_MODULE``
+#
+DEFAULT_BUDGET_MS = 100
+
+_IMPORT_TIME_PATTERN = re.compile(
+    r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure_import(module=None, python=sys.executable):
+    '''Imports the given module in a fresh interpreter and records the import
+    time of every module that was loaded.
+
+    Args:
+        module (str, optional): the module to import. By default, only the
+            modules loaded at interpreter startup are measured
+        python (str, optional): the Python interpreter to use
+
+    Returns:
+        an OrderedDict mapping the names of the loaded modules to their
+            cumulative import times, in milliseconds. Modules that were
+            already loaded at interpreter startup are not included
+    '''
+    code = "import " + module if module else "pass"
+    proc = subprocess.Popen(
+        [python, "-X", "importtime", "-c", code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, err = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(
+            "Failed to import '%s':\n%s" % (module, err.decode("utf-8")))
+
+    times = OrderedDict()
+    for line in err.decode("utf-8").splitlines():
+        match = _IMPORT_TIME_PATTERN.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2)) / 1000
+
+    return times
+
+
+def benchmark_module(module, repeats=5, python=sys.executable, top=10):
+    '''Benchmarks the cold import time of the given module.
+
+    Args:
+        module (str): the module to import
+        repeats (int, optional): the number of measured imports
+        python (str, optional): the Python interpreter to use
+        top (int, optional): the number of slowest dependencies to report
+
+    Returns:
+        a result dictionary
+    '''
+    # Warm up, so that bytecode compilation is not measured
+    measure_import(module, python=python)
+
+    startup = measure_import(python=python)
+    runs = [measure_import(module, python=python) for _ in range(repeats)]
+    totals = sorted(run.get(module, 0.0) for run in runs)
+    last = runs[-1]
+    slowest = sorted(
+        ((name, ms) for name, ms in last.items()
+         if name != module and name not in startup),
+        key=lambda item: -item[1])[:top]
+
+    return OrderedDict([
+        ("module", module),
+        ("median_ms", totals[len(totals) // 2]),
+        ("min_ms", totals[0]),
+        ("max_ms", totals[-1]),
+        ("num_modules", len(last)),
+        ("slowest", OrderedDict(slowest)),
+        ("eager_lazy_modules", [m for m in LAZY_MODULES if m in last]),
+    ])
+
+
+def main(args=None):
+    '''Runs the benchmark from the command line.
+
+    Args:
+        args (list, optional): the command-line arguments. By default,
+            ``sys.argv[1:]`` is used
+
+    Returns:
+        the exit code, which is nonzero if the budget was exceeded or a lazy
+            dependency was loaded eagerly
+    '''
+    parser = argparse.ArgumentParser(
+        description="Benchmark the cold import time of the voxel51 package")
+    parser.add_argument(
+        "--modules", default=",".join(MODULES),
+        help="comma-separated modules to import")
+    parser.add_argument(
+        "--repeats", type=int, default=5,
+        help="the number of measured imports of each module")
+    parser.add_argument(
+        "--budget", type=float, default=DEFAULT_BUDGET_MS,
+        help="the budget, in milliseconds, for the median import time of "
+        "each module beyond the median import time of %s" % BASELINE_MODULE)
+    parser.add_argument(
+        "--output", default=None,
+        help="the path to which to write the results. By default, the "
+        "results are written to stdout")
+    args = parser.parse_args(args)
+
+    baseline = benchmark_module(BASELINE_MODULE, repeats=args.repeats)
+    results = [
+        benchmark_module(module, repeats=args.repeats)
+        for module in args.modules.split(",")]
+
+    failures = []
+    budget = baseline["median_ms"] + args.budget
+    for result in results:
+        result["overhead_ms"] = result["median_ms"] - baseline["median_ms"]
+        if result["median_ms"] > budget:
+            failures.append(
+                "Importing '%s' took %.1fms, which exceeds the budget of "
+                "%.1fms beyond the %.1fms of '%s'" % (
+                    result["module"], result["median_ms"], args.budget,
+                    baseline["median_ms"], BASELINE_MODULE))
+        for name in result["eager_lazy_modules"]:
+            failures.append(
+                "Importing '%s' eagerly loaded '%s'" % (
+                    result["module"], name))
+
+    results_str = json.dumps(OrderedDict([
+        ("budget_ms", args.budget),
+        ("baseline", baseline),
+        ("results", results),
+        ("failures", failures),
+    ]), indent=4)
+    if args.output:
+        with io.open(args.output, "w", encoding="utf-8") as f:
+            f.write(results_str + "\n")
+    else:
+        print(results_str)
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+'''
+Benchmark of the peak memory used by ``voxel51.utils.upload_bytes()`` when
+uploading large in-memory buffers.
+
+For each buffer type, a fresh interpreter allocates a buffer of the requested
+size, uploads it to a fake storage server that discards what it receives
+(see ``fake_platform.py``), and reports its peak resident set size (RSS)
+before and after the upload. Buffers are uploaded in zero-copy slices, so the
+peak RSS should grow by much less than the size of the buffer. The benchmark
+fails if the growth exceeds a budget.
+
+Example usage::
+
+    python benchmarks/benchmark_memory.py --size 1GB --budget 64MB \\
+        --output memory.json
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+from collections import OrderedDict
+import io
+import json
+import mmap
+import resource
+import subprocess
+import sys
+import time
+
+from benchmark_task import parse_size
+from fake_platform import FakeSinkServer
+
+
+#
+# The buffer types whose uploads are measured
+#
+BUFFER_TYPES = ("bytes", "bytearray", "memoryview", "mmap", "numpy")
+
+#
+# The default budget for the growth of the peak RSS during an upload
+#
+DEFAULT_BUDGET = "64MB"
+
+
+def make_buffer(buffer_type, size):
+    '''Allocates a buffer of the given type and size whose pages are all
+    resident.
+
+    Args:
+        buffer_type (str): one of ``BUFFER_TYPES``
+        size (int): the size of the buffer, in bytes
+
+    Returns:
+        the buffer, or None if the buffer type is unavailable
+    '''
+    if buffer_type == "bytes":
+        return b"\x01" * size
+
+    if buffer_type == "bytearray":
+        return bytearray(b"\x01") * size
+
+    if buffer_type == "memoryview":
+        return memoryview(bytearray(b"\x01") * size)
+
+    if buffer_type == "mmap":
+        buf = mmap.mmap(-1, size)
+        for start in range(0, size, mmap.PAGESIZE):
+            buf[start] = 1
+        return buf
+
+    if buffer_type == "numpy":
+        try:
+            import numpy as np
+        except ImportError:
+            return None
+        return np.ones(size, dtype=np.uint8)
+
+    raise ValueError("Unsupported buffer type '%s'" % buffer_type)
+
+
+def get_peak_rss():
+    '''Gets the peak resident set size of the current process.
+
+    Returns:
+        the peak RSS, in bytes
+    '''
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak_rss  # bytes on macOS
+
+    return peak_rss * 1024  # kilobytes elsewhere
+
+
+def measure_upload(buffer_type, size, url):
+    '''Uploads a buffer of the given type and size to the given URL and
+    measures the peak RSS of the current process.
+
+    Args:
+        buffer_type (str): one of ``BUFFER_TYPES``
+        size (int): the size of the buffer, in bytes
+        url (str): the signed URL to which to upload the buffer
+
+    Returns:
+        a result dictionary
+    '''
+    import voxel51.utils as voxu
+
+    result = OrderedDict([("buffer_type", buffer_type), ("size", size)])
+    buf = make_buffer(buffer_type, size)
+    if buf is None:
+        result["skipped"] = True
+        return result
+
+    path_config = voxu.RemotePathConfig({"signed-url": url})
+    peak_before = get_peak_rss()
+    start = time.time()
+    voxu.upload_bytes(
+        buf, path_config, content_type="application/octet-stream")
+    result["duration"] = time.time() - start
+    result["peak_rss_before"] = peak_before
+    result["peak_rss_after"] = get_peak_rss()
+    result["peak_rss_growth"] = result["peak_rss_after"] - peak_before
+    return result
+
+
+def benchmark_buffer(sink, buffer_type, size, python=sys.executable):
+    '''Measures the upload of a buffer of the given type and size in a fresh
+    interpreter, so that the measurement is not affected by the memory of
+    previous uploads or of the fake server.
+
+    Args:
+        sink (FakeSinkServer): the fake storage server
+        buffer_type (str): one of ``BUFFER_TYPES``
+        size (int): the size of the buffer, in bytes
+        python (str, optional): the Python interpreter to use
+
+    Returns:
+        a result dictionary
+    '''
+    num_bytes = sink.num_bytes_received
+    proc = subprocess.Popen(
+        [python, __file__, "--worker", buffer_type, "--size", str(size),
+         "--url", sink.make_signed_url("memory-benchmark")],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(
+            "Failed to upload %s buffer:\n%s" % (
+                buffer_type, err.decode("utf-8")))
+
+    result = json.loads(out.decode("utf-8"), object_pairs_hook=OrderedDict)
+    if not result.get("skipped"):
+        result["num_bytes_received"] = sink.num_bytes_received - num_bytes
+
+    return result
+
+
+def main(args=None):
+    '''Runs the benchmark from the command line.
+
+    Args:
+        args (list, optional): the command-line arguments. By default,
+            ``sys.argv[1:]`` is used
+
+    Returns:
+        the exit code, which is nonzero if the budget was exceeded or an
+            upload was incomplete
+    '''
+    parser = argparse.ArgumentParser(
+        description="Benchmark the peak memory used by uploads of large "
+        "in-memory buffers")
+    parser.add_argument(
+        "--buffer-types", default=",".join(BUFFER_TYPES),
+        help="comma-separated buffer types to upload")
+    parser.add_argument(
+        "--size", default="1GB", help="the size of each buffer, e.g. 1GB")
+    parser.add_argument(
+        "--budget", default=DEFAULT_BUDGET,
+        help="the budget for the growth of the peak RSS during an upload, "
+        "e.g. 64MB")
+    parser.add_argument(
+        "--output", default=None,
+        help="the path to which to write the results. By default, the "
+        "results are written to stdout")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--url", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    size = parse_size(args.size)
+    if args.worker:
+        print(json.dumps(measure_upload(args.worker, size, args.url)))
+        return 0
+
+    budget = parse_size(args.budget)
+    with FakeSinkServer() as sink:
+        results = [
+            benchmark_buffer(sink, buffer_type, size)
+            for buffer_type in args.buffer_types.split(",")]
+
+    failures = []
+    for result in results:
+        if result.get("skipped"):
+            continue
+
+        if result["num_bytes_received"] != size:
+            failures.append(
+                "Only %d of %d bytes of the %s buffer were received" % (
+                    result["num_bytes_received"], size,
+                    result["buffer_type"]))
+        if result["peak_rss_growth"] > budget:
+            failures.append(
+                "Uploading the %s buffer grew the peak RSS by %d bytes, "
+                "which exceeds the budget of %d bytes" % (
+                    result["buffer_type"], result["peak_rss_growth"],
+                    budget))
+
+    results_str = json.dumps(OrderedDict([
+        ("size", size),
+        ("budget", budget),
+        ("results", results),
+        ("failures", failures),
+    ]), indent=4)
+    if args.output:
+        with io.open(args.output, "w", encoding="utf-8") as f:
+            f.write(results_str + "\n")
+    else:
+        print(results_str)
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+'''
+End-to-end check of sharded video tasks run in multiple processes.
+
+The check runs a task against a local stand-in of the Vision Services
+Platform (see ``fake_platform.py``) with a stub analytic: the input video is
+split into shards via ``voxel51.shards.ShardCoordinator.plan()``, the shards
+are run in spawned worker processes via a ``LocalShardExecutor``, and their
+frame labels are merged into the task output. The stub analytic labels every
+frame of its shard with the index of the shard, and, like a shard whose clip
+was not frame-exact, it also labels the frames just outside of its range.
+
+The check fails if the merged output does not cover every frame of the video
+exactly once, or if any frame is labeled by a shard that does not contain it.
+The results, including the time taken by each phase, are written as JSON.
+
+Example usage::
+
+    python benchmarks/benchmark_shards.py --frames 1000 --shards 4 \\
+        --workers 4 --output shards.json
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+from collections import Counter, OrderedDict
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import voxel51.config as voxc
+import voxel51.shards as voxs
+import voxel51.task as voxt
+import voxel51.utils as voxu
+
+from benchmark_task import make_task
+from fake_platform import FakeAPIServer, FakeStorageServer
+
+
+#
+# The frame rate of the stub video
+#
+FRAME_RATE = 30.0
+
+
+logger = logging.getLogger(__name__)
+
+
+def label_shard(shard_task):
+    '''Stub analytic that labels every frame of the given shard, and the
+    frames just outside of its range, with the index of the shard.
+
+    Args:
+        shard_task (voxel51.shards.ShardTask): the ShardTask
+
+    Returns:
+        the path to the frame labels of the shard
+    '''
+    shard = shard_task.shard
+    labels_path = os.path.join(shard_task.output_dir, "labels.jsonl")
+    labels = {"shard": shard.index, "pid": os.getpid()}
+    with voxu.FrameLabelsWriter(
+            io.open(labels_path, "wb"), jsonl=True) as writer:
+        writer.write_frame(shard.first_frame - 1, labels)
+        for clip_frame_number in range(1, shard.num_frames + 1):
+            writer.write_frame(
+                shard.get_frame_number(clip_frame_number), labels)
+        writer.write_frame(shard.last_frame + 1, labels)
+
+    return labels_path
+
+
+def run_check(storage, api, num_frames, num_shards, num_workers):
+    '''Runs a sharded task with the stub analytic and checks its output.
+
+    Args:
+        storage (FakeStorageServer): the fake storage server
+        api (FakeAPIServer): the fake API server
+        num_frames (int): the number of frames of the stub video
+        num_shards (int): the maximum number of shards
+        num_workers (int): the number of worker processes
+
+    Returns:
+        a result dictionary
+    '''
+    job_id, task_config_url, _ = make_task(storage, 1024, 1, 0)
+    result = OrderedDict([
+        ("job_id", job_id),
+        ("num_frames", num_frames),
+        ("num_workers", num_workers),
+    ])
+
+    work_dir = tempfile.mkdtemp(prefix="voxel51-shards-")
+    timings = OrderedDict()
+    start = time.time()
+
+    def _lap(phase):
+        timings[phase] = time.time() - start - sum(timings.values())
+
+    try:
+        task_manager = voxt.TaskManager.from_url(task_config_url)
+        task_manager.start()
+        coordinator = voxs.ShardCoordinator(
+            task_manager, "video-0", num_shards=num_shards,
+            min_frames_per_shard=1,
+            executor=voxs.LocalShardExecutor(num_workers))
+        shards = coordinator.plan(metadata={
+            "total_frame_count": num_frames, "frame_rate": FRAME_RATE})
+        _lap("plan")
+        statuses = coordinator.run(label_shard, work_dir)
+        _lap("run")
+        num_merged = coordinator.merge_frame_labels(statuses, jsonl=True)
+        task_manager.complete()
+        _lap("merge")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    result["num_shards"] = len(shards)
+    result["num_merged"] = num_merged
+    result["timings"] = timings
+
+    output = storage.get_object("%s/output.bin" % job_id)
+    if output[:2] == b"\x1f\x8b":
+        output = gzip.GzipFile(fileobj=io.BytesIO(output)).read()
+
+    frames = [
+        json.loads(line) for line in output.decode("utf-8").splitlines()
+        if line.strip()]
+    result["num_pids"] = len(set(f["labels"]["pid"] for f in frames))
+    result["failures"] = check_frames(frames, shards, num_frames)
+    return result
+
+
+def check_frames(frames, shards, num_frames):
+    '''Checks that the given merged frames cover every frame of the video
+    exactly once, and that each frame was labeled by its shard.
+
+    Args:
+        frames (list): the merged ``{"frame_number": ..., "labels": ...}``
+            dictionaries
+        shards (list): the VideoShard instances of the video
+        num_frames (int): the number of frames of the video
+
+    Returns:
+        a list of failure messages, which is empty if the check passed
+    '''
+    failures = []
+    counts = Counter(f["frame_number"] for f in frames)
+    missing = sorted(set(range(1, num_frames + 1)) - set(counts))
+    if missing:
+        failures.append("%d frame(s) are missing, e.g., %s" % (
+            len(missing), missing[:10]))
+
+    duplicates = sorted(n for n, count in counts.items() if count > 1)
+    if duplicates:
+        failures.append("%d frame(s) are duplicated, e.g., %s" % (
+            len(duplicates), duplicates[:10]))
+
+    extra = sorted(n for n in counts if not 1 <= n <= num_frames)
+    if extra:
+        failures.append("%d frame(s) are outside of the video, e.g., %s" % (
+            len(extra), extra[:10]))
+
+    misplaced = [
+        f["frame_number"] for f in frames
+        if not any(
+            s.index == f["labels"]["shard"] and
+            s.first_frame <= f["frame_number"] <= s.last_frame
+            for s in shards)]
+    if misplaced:
+        failures.append(
+            "%d frame(s) were labeled by the wrong shard, e.g., %s" % (
+                len(misplaced), misplaced[:10]))
+
+    return failures
+
+
+def main(args=None):
+    '''Runs the check from the command line.
+
+    Args:
+        args (list, optional): the command-line arguments. By default,
+            ``sys.argv[1:]`` is used
+
+    Returns:
+        the exit code, which is nonzero if the check failed
+    '''
+    parser = argparse.ArgumentParser(
+        description="Check sharded video tasks run in multiple processes "
+        "against a local stand-in of the Vision Services Platform")
+    parser.add_argument(
+        "--frames", type=int, default=1000,
+        help="the number of frames of the stub video")
+    parser.add_argument(
+        "--shards", type=int, default=4, help="the number of shards")
+    parser.add_argument(
+        "--workers", type=int, default=2,
+        help="the number of worker processes")
+    parser.add_argument(
+        "--output", default=None,
+        help="the path to which to write the results. By default, the "
+        "results are written to stdout")
+    parser.add_argument(
+        "--verbose", action="store_true", help="log the task progress")
+    args = parser.parse_args(args)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING)
+
+    os.environ[voxc.DEPLOYMENT_ENV_VAR] = voxc.DeploymentEnvironments.LOCAL
+    os.environ.setdefault(voxc.API_TOKEN_ENV_VAR, "benchmark-token")
+
+    with FakeStorageServer() as storage, FakeAPIServer() as api:
+        result = run_check(
+            storage, api, args.frames, args.shards, args.workers)
+
+    results_str = json.dumps(result, indent=4)
+    if args.output:
+        with io.open(args.output, "w", encoding="utf-8") as f:
+            f.write(results_str + "\n")
+    else:
+        print(results_str)
+
+    for failure in result["failures"]:
+        print(failure, file=sys.stderr)
+
+    return 1 if result["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+'''
+End-to-end benchmark of the ``voxel51.task.TaskManager`` lifecycle against a
+local stand-in of the Vision Services Platform.
+
+The benchmark starts a fake API on the address of the ``LOCAL`` deployment
+environment and a fake signed-URL storage server (see ``fake_platform.py``),
+and then times ``from_url``, ``start``, ``download_inputs``,
+``publish_status``, ``upload_output`` and ``complete`` for every combination
+of the requested input sizes and counts. The results are written as JSON, and
+they can be compared against a previous run to catch regressions. The exit
+code is nonzero if any run fails or if any regressions are found.
+
+Example usage::
+
+    python benchmarks/benchmark_task.py --sizes 1MB,64MB --counts 1,4 \\
+        --repeats 5 --output results.json
+
+    python benchmarks/benchmark_task.py --latency 0.02 --bandwidth 50MB \\
+        --compare results.json
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import argparse
+from collections import OrderedDict
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+import voxel51.config as voxc
+import voxel51.task as voxt
+
+from fake_platform import FakeAPIServer, FakeStorageServer, FaultConfig
+
+
+PHASES = (
+    "from_url", "start", "download_inputs", "publish_status", "upload_output",
+    "complete")
+
+_RESULTS_VERSION = 1
+_SIZE_UNITS = OrderedDict([
+    ("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024), ("B", 1)])
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_size(size_str):
+    '''Parses a human-readable size such as ``64MB`` into bytes.
+
+    Args:
+        size_str (str): the size string
+
+    Returns:
+        the size, in bytes
+    '''
+    size_str = size_str.strip().upper()
+    for unit, multiplier in _SIZE_UNITS.items():
+        if size_str.endswith(unit):
+            return int(float(size_str[:-len(unit)]) * multiplier)
+
+    return int(size_str)
+
+
+def make_task(storage, input_size, num_inputs, output_size):
+    '''Creates the objects and the TaskConfig of a benchmark task in the fake
+    storage server.
+
+    Args:
+        storage (FakeStorageServer): the fake storage server
+        input_size (int): the size of each input, in bytes
+        num_inputs (int): the number of inputs
+        output_size (int): the size of the output, in bytes
+
+    Returns:
+        a (job_id, task_config_url, output) tuple, where ``output`` is the
+            contents of the output that the task should upload
+    '''
+    job_id = uuid.uuid4().hex
+    data = os.urandom(input_size)
+    inputs = {}
+    for idx in range(num_inputs):
+        signed_url = storage.put_object(
+            "%s/inputs/video-%d.mp4" % (job_id, idx), data)
+        inputs["video-%d" % idx] = {"signed-url": signed_url}
+
+    task_config = {
+        "analytic": "benchmark",
+        "version": "1.0",
+        "job_id": job_id,
+        "inputs": inputs,
+        "parameters": {},
+        "status": {"signed-url": storage.make_signed_url(
+            "%s/status.json" % job_id)},
+        "logfile": {"signed-url": storage.make_signed_url(
+            "%s/logfile.log" % job_id)},
+        "output": {"signed-url": storage.make_signed_url(
+            "%s/output.bin" % job_id)},
+    }
+    task_config_url = storage.put_object(
+        "%s/task.json" % job_id, json.dumps(task_config).encode("utf-8"))
+    return job_id, task_config_url, os.urandom(output_size)
+
+
+def run_task(task_config_url, output, work_dir):
+    '''Runs the lifecycle of a benchmark task and times each phase.
+
+    Args:
+        task_config_url (str): the URL of the TaskConfig
+        output (bytes): the output to upload
+        work_dir (str): a scratch directory for the task
+
+    Returns:
+        an OrderedDict mapping the phases in ``PHASES`` to their durations, in
+            seconds
+    '''
+    inputs_dir = os.path.join(work_dir, "inputs")
+    output_path = os.path.join(work_dir, "output.bin")
+    logfile_path = os.path.join(work_dir, "logfile.log")
+    os.makedirs(inputs_dir)
+    with open(output_path, "wb") as f:
+        f.write(output)
+    with io.open(logfile_path, "w", encoding="utf-8") as f:
+        f.write("Benchmark task\n")
+
+    timings = OrderedDict()
+    start = time.time()
+
+    def _lap(phase):
+        timings[phase] = time.time() - start - sum(timings.values())
+
+    task_manager = voxt.TaskManager.from_url(task_config_url)
+    _lap("from_url")
+    task_manager.start()
+    _lap("start")
+    task_manager.download_inputs(inputs_dir)
+    _lap("download_inputs")
+    task_manager.publish_status()
+    _lap("publish_status")
+    task_manager.upload_output(output_path)
+    _lap("upload_output")
+    task_manager.complete(logfile_path=logfile_path)
+    _lap("complete")
+    return timings
+
+
+def run_benchmark(
+        storage, api, sizes, counts, repeats=3, output_size=1024 ** 2):
+    '''Runs the benchmark for every combination of input size and count.
+
+    Args:
+        storage (FakeStorageServer): the fake storage server
+        api (FakeAPIServer): the fake API server
+        sizes (list): the input sizes to benchmark, in bytes
+        counts (list): the input counts to benchmark
+        repeats (int, optional): the number of runs of each combination
+        output_size (int, optional): the size of the task output, in bytes
+
+    Returns:
+        a list of run dictionaries
+    '''
+    runs = []
+    for input_size in sizes:
+        for num_inputs in counts:
+            for repeat in range(repeats):
+                runs.append(_run_once(
+                    storage, api, input_size, num_inputs, output_size,
+                    repeat))
+
+    return runs
+
+
+def summarize(runs):
+    '''Summarizes the given runs by input size and count.
+
+    Args:
+        runs (list): a list of run dictionaries
+
+    Returns:
+        a list of summary dictionaries
+    '''
+    groups = OrderedDict()
+    for run in runs:
+        key = (run["input_size"], run["num_inputs"])
+        groups.setdefault(key, []).append(run)
+
+    summary = []
+    for (input_size, num_inputs), group in groups.items():
+        ok_runs = [r for r in group if r["ok"]]
+        entry = OrderedDict([
+            ("input_size", input_size),
+            ("num_inputs", num_inputs),
+            ("runs", len(group)),
+            ("failures", len(group) - len(ok_runs)),
+        ])
+        if ok_runs:
+            totals = [r["total"] for r in ok_runs]
+            entry["total"] = _describe(totals)
+            entry["phases"] = OrderedDict(
+                (phase, _describe([r["phases"][phase] for r in ok_runs]))
+                for phase in PHASES)
+            download_time = entry["phases"]["download_inputs"]["median"]
+            if download_time > 0:
+                entry["download_throughput"] = (
+                    input_size * num_inputs / download_time)
+
+        summary.append(entry)
+
+    return summary
+
+
+def compare(summary, baseline, tolerance):
+    '''Compares a summary against a baseline summary.
+
+    Args:
+        summary (list): a list of summary dictionaries
+        baseline (list): a list of baseline summary dictionaries
+        tolerance (float): the tolerated relative slowdown of the median total
+            time of each combination
+
+    Returns:
+        a list of regression dictionaries, which is empty if there are none
+    '''
+    baseline = {
+        (entry["input_size"], entry["num_inputs"]): entry
+        for entry in baseline}
+
+    regressions = []
+    for entry in summary:
+        key = (entry["input_size"], entry["num_inputs"])
+        base = baseline.get(key)
+        if base is None or "total" not in base:
+            continue
+
+        if "total" not in entry:
+            regressions.append(OrderedDict([
+                ("input_size", key[0]), ("num_inputs", key[1]),
+                ("reason", "all runs failed")]))
+            continue
+
+        before = base["total"]["median"]
+        after = entry["total"]["median"]
+        if after > before * (1 + tolerance):
+            regressions.append(OrderedDict([
+                ("input_size", key[0]), ("num_inputs", key[1]),
+                ("baseline", before), ("median", after),
+                ("slowdown", after / before - 1)]))
+
+    return regressions
+
+
+def main(args=None):
+    '''Runs the benchmark from the command line.
+
+    Args:
+        args (list, optional): the command-line arguments. By default,
+            ``sys.argv[1:]`` is used
+
+    Returns:
+        the exit code, which is nonzero if any run failed or if regressions
+            were found
+    '''
+    parser = argparse.ArgumentParser(
+        description="Benchmark the TaskManager lifecycle against a local "
+        "stand-in of the Vision Services Platform")
+    parser.add_argument(
+        "--sizes", default="1MB,16MB,64MB",
+        help="comma-separated input sizes, e.g. 1MB,64MB")
+    parser.add_argument(
+        "--counts", default="1,4", help="comma-separated input counts")
+    parser.add_argument(
+        "--repeats", type=int, default=3,
+        help="the number of runs of each combination")
+    parser.add_argument(
+        "--output-size", default="1MB", help="the size of the task output")
+    parser.add_argument(
+        "--latency", type=float, default=0.0,
+        help="storage latency per request, in seconds")
+    parser.add_argument(
+        "--bandwidth", default=None,
+        help="storage bandwidth per connection per second, e.g. 50MB")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0,
+        help="the probability with which a storage request fails")
+    parser.add_argument(
+        "--api-latency", type=float, default=0.0,
+        help="API latency per request, in seconds")
+    parser.add_argument(
+        "--api-error-rate", type=float, default=0.0,
+        help="the probability with which an API request fails")
+    parser.add_argument(
+        "--seed", type=int, default=None,
+        help="a seed for the error injection")
+    parser.add_argument(
+        "--output", default=None,
+        help="the path to which to write the results. By default, the "
+        "results are written to stdout")
+    parser.add_argument(
+        "--compare", default=None,
+        help="the path to a previous results file to compare against")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1,
+        help="the tolerated relative slowdown when comparing")
+    parser.add_argument(
+        "--verbose", action="store_true", help="log the task progress")
+    args = parser.parse_args(args)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING)
+
+    os.environ[voxc.DEPLOYMENT_ENV_VAR] = voxc.DeploymentEnvironments.LOCAL
+    os.environ.setdefault(voxc.API_TOKEN_ENV_VAR, "benchmark-token")
+
+    bandwidth = parse_size(args.bandwidth) if args.bandwidth else None
+    storage_faults = FaultConfig(
+        latency=args.latency, bandwidth=bandwidth,
+        error_rate=args.error_rate, seed=args.seed)
+    api_faults = FaultConfig(
+        latency=args.api_latency, error_rate=args.api_error_rate,
+        seed=args.seed)
+
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    counts = [int(c) for c in args.counts.split(",")]
+    with FakeStorageServer(faults=storage_faults) as storage, \
+            FakeAPIServer(faults=api_faults) as api:
+        runs = run_benchmark(
+            storage, api, sizes, counts, repeats=args.repeats,
+            output_size=parse_size(args.output_size))
+
+    results = OrderedDict([
+        ("version", _RESULTS_VERSION),
+        ("timestamp", time.time()),
+        ("python", platform.python_version()),
+        ("platform", platform.platform()),
+        ("storage_faults", storage_faults.serialize()),
+        ("api_faults", api_faults.serialize()),
+        ("summary", summarize(runs)),
+        ("runs", runs),
+    ])
+
+    failures = [
+        "job %s: %s" % (run["job_id"], run["error"])
+        for run in runs if not run["ok"]]
+    results["failures"] = failures
+
+    exit_code = 1 if failures else 0
+    if args.compare:
+        with io.open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(
+            results["summary"], baseline["summary"], args.tolerance)
+        results["regressions"] = regressions
+        if regressions:
+            exit_code = 1
+
+    results_str = json.dumps(results, indent=4)
+    if args.output:
+        with io.open(args.output, "w", encoding="utf-8") as f:
+            f.write(results_str + "\n")
+    else:
+        print(results_str)
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+
+    return exit_code
+
+
+def _run_once(storage, api, input_size, num_inputs, output_size, repeat):
+    job_id, task_config_url, output = make_task(
+        storage, input_size, num_inputs, output_size)
+    run = OrderedDict([
+        ("job_id", job_id),
+        ("input_size", input_size),
+        ("num_inputs", num_inputs),
+        ("repeat", repeat),
+        ("ok", False),
+    ])
+
+    work_dir = tempfile.mkdtemp(prefix="voxel51-benchmark-")
+    num_errors = storage.num_injected_errors + api.num_injected_errors
+    try:
+        timings = run_task(task_config_url, output, work_dir)
+        run["phases"] = timings
+        run["total"] = sum(timings.values())
+        run["ok"] = (
+            storage.get_object("%s/output.bin" % job_id) == output and
+            api.get_job_state(job_id) == voxt.TaskState.COMPLETE)
+        if not run["ok"]:
+            run["error"] = "Output or job state was not recorded"
+    except Exception as e:
+        logger.warning("Run failed: %s", e)
+        logger.debug("Run failed", exc_info=True)
+        run["error"] = "%s: %s" % (type(e).__name__, e)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        storage.delete_objects(job_id + "/")
+
+    run["injected_errors"] = (
+        storage.num_injected_errors + api.num_injected_errors - num_errors)
+    return run
+
+
+def _describe(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        median = values[mid]
+    else:
+        median = (values[mid - 1] + values[mid]) / 2
+
+    return OrderedDict([
+        ("min", values[0]), ("median", median), ("max", values[-1])])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
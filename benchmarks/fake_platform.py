@@ -0,0 +1,646 @@
+#!/usr/bin/env python
+'''
+Local stand-ins for the Voxel51 Vision Services API and for the signed-URL
+cloud storage used by tasks, with configurable latency, bandwidth and error
+injection.
+
+The fake API listens on the address of the
+``voxel51.config.DeploymentEnvironments.LOCAL`` deployment environment, so
+tasks reach it by setting the ``voxel51.config.DEPLOYMENT_ENV_VAR``
+environment variable to ``LOCAL``.
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+import base64
+import hashlib
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # Python 3
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # Python 2
+    from SocketServer import ThreadingMixIn
+
+try:
+    import urllib.parse as urlparse  # Python 3
+except ImportError:
+    import urlparse  # Python 2
+
+import voxel51.config as voxc
+
+
+_CHUNK_SIZE = 64 * 1024
+_RANGE_PATTERN = re.compile(r"bytes=(\d+)-(\d*)$")
+_JOB_PATTERN = re.compile(r"/jobs/([^/]+)/(state|metadata|data)$")
+
+
+class FaultConfig(object):
+    '''Class describing the faults to inject into the responses of a fake
+    server.
+
+    Attributes:
+        latency (float): the delay, in seconds, before each response
+        bandwidth (float): the maximum bandwidth, in bytes/second, of each
+            request and response body, or None for no limit
+        error_rate (float): the probability with which a request fails with a
+            ``503 Service Unavailable`` response
+        stall_rate (float): the probability with which a response is delayed
+            by an additional ``stall_time``, which simulates tail latency
+        stall_time (float): the additional delay, in seconds, of stalled
+            responses
+        error_count (int): the number of requests, starting with the first
+            one, that fail regardless of ``error_rate``
+        stall_count (int): the number of responses, starting with the first
+            one, that are stalled regardless of ``stall_rate``
+        seed (int): the seed of the random number generator used to inject
+            errors and stalls, if any
+    '''
+
+    def __init__(
+            self, latency=0.0, bandwidth=None, error_rate=0.0, stall_rate=0.0,
+            stall_time=0.0, error_count=0, stall_count=0, seed=None):
+        '''Creates a FaultConfig instance.
+
+        Args:
+            latency (float, optional): the delay, in seconds, before each
+                response. By default, there is no delay
+            bandwidth (float, optional): the maximum bandwidth, in
+                bytes/second, of each request and response body. By default,
+                there is no limit
+            error_rate (float, optional): the probability with which a request
+                fails. By default, no errors are injected
+            stall_rate (float, optional): the probability with which a
+                response is stalled. By default, no responses are stalled
+            stall_time (float, optional): the additional delay, in seconds, of
+                stalled responses
+            error_count (int, optional): the number of requests, starting
+                with the first one, that fail regardless of ``error_rate``.
+                By default, only ``error_rate`` applies
+            stall_count (int, optional): the number of responses, starting
+                with the first one, that are stalled regardless of
+                ``stall_rate``. By default, only ``stall_rate`` applies
+            seed (int, optional): a seed for the random number generator used
+                to inject errors and stalls
+        '''
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_time = stall_time
+        self.error_count = error_count
+        self.stall_count = stall_count
+        self.seed = seed
+
+    def serialize(self):
+        '''Serializes the FaultConfig into a dictionary.
+
+        Returns:
+            a JSON dictionary
+        '''
+        return {
+            "latency": self.latency,
+            "bandwidth": self.bandwidth,
+            "error_rate": self.error_rate,
+            "stall_rate": self.stall_rate,
+            "stall_time": self.stall_time,
+            "error_count": self.error_count,
+            "stall_count": self.stall_count,
+            "seed": self.seed,
+        }
+
+
+class FakeServer(object):
+    '''Base class for fake HTTP servers that run in a background thread.
+
+    Attributes:
+        faults (FaultConfig): the faults to inject
+        num_requests (int): the number of requests received so far
+        num_injected_errors (int): the number of errors injected so far
+        num_injected_stalls (int): the number of stalls injected so far
+    '''
+
+    def __init__(self, handler_cls, host="127.0.0.1", port=0, faults=None):
+        '''Creates a FakeServer instance.
+
+        Args:
+            handler_cls (type): the ``FakeRequestHandler`` subclass that
+                handles requests
+            host (str, optional): the host on which to listen
+            port (int, optional): the port on which to listen. By default, an
+                unused port is chosen
+            faults (FaultConfig, optional): the faults to inject. By default,
+                no faults are injected
+        '''
+        self.faults = faults or FaultConfig()
+        self.num_requests = 0
+        self.num_injected_errors = 0
+        self.num_injected_stalls = 0
+        self._random = random.Random(self.faults.seed)
+        self._lock = threading.Lock()
+        self._server = _ThreadingHTTPServer((host, port), handler_cls)
+        self._server.fake = self
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def url(self):
+        '''The base URL of the server.'''
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+    def start(self):
+        '''Starts serving requests in a background daemon thread.'''
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name=type(self).__name__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        '''Stops the server.'''
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def set_faults(self, faults):
+        '''Sets the faults to inject from now on and resets the fault
+        counters, so that a running server can be reused across scenarios.
+
+        Args:
+            faults (FaultConfig): the faults to inject
+        '''
+        with self._lock:
+            self.faults = faults
+            self.num_requests = 0
+            self.num_injected_errors = 0
+            self.num_injected_stalls = 0
+            self._random = random.Random(faults.seed)
+
+    def should_fail(self):
+        '''Records a request and decides whether it should fail.
+
+        Returns:
+            True/False
+        '''
+        with self._lock:
+            self.num_requests += 1
+            fail = self._random.random() < self.faults.error_rate
+            fail |= self.num_injected_errors < self.faults.error_count
+            if fail:
+                self.num_injected_errors += 1
+            return fail
+
+    def should_stall(self):
+        '''Decides whether the response to a request should be stalled.
+
+        Returns:
+            True/False
+        '''
+        with self._lock:
+            stall = self._random.random() < self.faults.stall_rate
+            stall |= self.num_injected_stalls < self.faults.stall_count
+            if stall:
+                self.num_injected_stalls += 1
+            return stall
+
+
+class FakeStorageServer(FakeServer):
+    '''A fake cloud storage server that serves objects via signed URLs.
+
+    Objects support ``GET`` (including single ``Range`` requests), ``HEAD`` and
+    ``PUT``. ``GET`` responses carry an ``x-goog-hash`` header with the MD5
+    digest of the object, as Google Cloud Storage does.
+    '''
+
+    def __init__(self, host="127.0.0.1", port=0, faults=None):
+        super(FakeStorageServer, self).__init__(
+            _StorageRequestHandler, host=host, port=port, faults=faults)
+        self._objects = {}
+
+    def make_signed_url(self, key):
+        '''Makes a signed URL for the object with the given key.
+
+        Args:
+            key (str): the object key
+
+        Returns:
+            the signed URL
+        '''
+        return "%s/%s?X-Goog-Signature=%s" % (
+            self.url, key, uuid.uuid4().hex)
+
+    def put_object(self, key, data):
+        '''Stores an object.
+
+        Args:
+            key (str): the object key
+            data (bytes): the object contents
+
+        Returns:
+            a signed URL for the object
+        '''
+        md5 = base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+        with self._lock:
+            self._objects[key] = (data, md5)
+        return self.make_signed_url(key)
+
+    def get_object(self, key):
+        '''Gets the contents of an object.
+
+        Args:
+            key (str): the object key
+
+        Returns:
+            the object contents, or None if the object does not exist
+        '''
+        with self._lock:
+            obj = self._objects.get(key)
+        return obj[0] if obj is not None else None
+
+    def delete_objects(self, prefix):
+        '''Deletes all objects whose keys start with the given prefix.
+
+        Args:
+            prefix (str): the key prefix
+        '''
+        with self._lock:
+            for key in [k for k in self._objects if k.startswith(prefix)]:
+                del self._objects[key]
+
+    def _get(self, key):
+        with self._lock:
+            return self._objects.get(key)
+
+
+class FakeSinkServer(FakeServer):
+    '''A fake storage server that accepts ``PUT`` requests to any URL and
+    discards their bodies as they arrive, so that the server itself uses no
+    memory for them.
+
+    Attributes:
+        num_bytes_received (int): the number of body bytes received so far
+    '''
+
+    def __init__(self, host="127.0.0.1", port=0, faults=None):
+        super(FakeSinkServer, self).__init__(
+            _SinkRequestHandler, host=host, port=port, faults=faults)
+        self.num_bytes_received = 0
+
+    def make_signed_url(self, key):
+        '''Makes a signed URL for the object with the given key.
+
+        Args:
+            key (str): the object key
+
+        Returns:
+            the signed URL
+        '''
+        return "%s/%s?X-Goog-Signature=%s" % (
+            self.url, key, uuid.uuid4().hex)
+
+
+class FakeAPIServer(FakeServer):
+    '''A fake Vision Services API that implements the job endpoints used by
+    ``voxel51.api.API``.
+
+    By default, the server listens on the address of the
+    ``voxel51.config.DeploymentEnvironments.LOCAL`` deployment environment.
+
+    Attributes:
+        job_states (dict): a dictionary mapping job IDs to lists of the states
+            posted for them
+        job_metadata (dict): a dictionary mapping job IDs to their posted
+            metadata
+        job_data (dict): a dictionary mapping job IDs to lists of the sizes,
+            in bytes, of the data uploaded for them
+    '''
+
+    def __init__(self, host=None, port=None, faults=None):
+        base_url = urlparse.urlsplit(
+            voxc.BASE_API_URLS[voxc.DeploymentEnvironments.LOCAL])
+        self.path_prefix = base_url.path
+        super(FakeAPIServer, self).__init__(
+            _APIRequestHandler, host=host or base_url.hostname,
+            port=port or base_url.port, faults=faults)
+        self.job_states = {}
+        self.job_metadata = {}
+        self.job_data = {}
+
+    @property
+    def url(self):
+        '''The base URL of the API.'''
+        return super(FakeAPIServer, self).url + self.path_prefix
+
+    def get_job_state(self, job_id):
+        '''Gets the last state posted for the given job.
+
+        Args:
+            job_id (str): the job ID
+
+        Returns:
+            the job state, or None if no state has been posted
+        '''
+        with self._lock:
+            states = self.job_states.get(job_id)
+        return states[-1] if states else None
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    '''Base request handler for fake servers that injects the faults of the
+    server and supports throttled, chunked and keep-alive transfers.
+    '''
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def fake(self):
+        '''The FakeServer that is handling the request.'''
+        return self.server.fake
+
+    def log_message(self, *args):
+        pass
+
+    def inject_faults(self):
+        '''Applies the latency of the server, stalls the response if
+        necessary, and decides whether to inject an error. When an error is
+        injected, the request body is discarded and a ``503`` response is
+        sent.
+
+        Returns:
+            True if an error was injected, and False otherwise
+        '''
+        if self.fake.faults.latency:
+            time.sleep(self.fake.faults.latency)
+
+        faults = self.fake.faults
+        if (faults.stall_rate or faults.stall_count) and \
+                self.fake.should_stall():
+            time.sleep(self.fake.faults.stall_time)
+
+        if not self.fake.should_fail():
+            return False
+
+        self.read_body()
+        self.send_body(503, b"Injected error", content_type="text/plain")
+        return True
+
+    def read_body(self):
+        '''Reads the request body, which may use chunked transfer encoding.
+
+        Returns:
+            the body bytes
+        '''
+        throttle = _Throttle(self.fake.faults.bandwidth)
+        chunks = []
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                throttle.consume(size)
+        else:
+            remaining = int(self.headers.get("Content-Length") or 0)
+            while remaining > 0:
+                chunk = self.rfile.read(min(_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+
+                chunks.append(chunk)
+                remaining -= len(chunk)
+                throttle.consume(len(chunk))
+
+        return b"".join(chunks)
+
+    def send_body(
+            self, code, body=b"", content_type="application/octet-stream",
+            headers=None, include_body=True):
+        '''Sends a response with the given body.
+
+        Args:
+            code (int): the HTTP status code
+            body (bytes, optional): the response body
+            content_type (str, optional): the content type of the body
+            headers (dict, optional): additional response headers
+            include_body (bool, optional): whether to write the body. Set this
+                to False for ``HEAD`` requests
+        '''
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not include_body:
+            return
+
+        throttle = _Throttle(self.fake.faults.bandwidth)
+        view = memoryview(body)
+        for start in range(0, len(body), _CHUNK_SIZE):
+            chunk = view[start:start + _CHUNK_SIZE]
+            self.wfile.write(chunk)
+            throttle.consume(len(chunk))
+
+    def send_json(self, code, obj):
+        '''Sends a JSON response.
+
+        Args:
+            code (int): the HTTP status code
+            obj: a JSON-serializable object
+        '''
+        self.send_body(
+            code, json.dumps(obj).encode("utf-8"),
+            content_type="application/json")
+
+
+class _StorageRequestHandler(FakeRequestHandler):
+
+    def do_HEAD(self):
+        self._serve_object(include_body=False)
+
+    def do_GET(self):
+        self._serve_object(include_body=True)
+
+    def do_PUT(self):
+        if self.inject_faults():
+            return
+
+        data = self.read_body()
+        # pylint: disable=protected-access
+        self.fake.put_object(self._get_key(), data)
+        self.send_body(200)
+
+    def _serve_object(self, include_body):
+        if self.inject_faults():
+            return
+
+        # pylint: disable=protected-access
+        obj = self.fake._get(self._get_key())
+        if obj is None:
+            self.send_body(404, include_body=include_body)
+            return
+
+        data, md5 = obj
+        headers = {"x-goog-hash": "md5=" + md5}
+        match = _RANGE_PATTERN.match(self.headers.get("Range", ""))
+        if match is None:
+            self.send_body(
+                200, data, headers=headers, include_body=include_body)
+            return
+
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(data) - 1
+        if start >= len(data):
+            headers["Content-Range"] = "bytes */%d" % len(data)
+            self.send_body(416, headers=headers, include_body=include_body)
+            return
+
+        end = min(end, len(data) - 1)
+        headers["Content-Range"] = "bytes %d-%d/%d" % (start, end, len(data))
+        self.send_body(
+            206, data[start:end + 1], headers=headers,
+            include_body=include_body)
+
+    def _get_key(self):
+        return urlparse.urlsplit(self.path).path.lstrip("/")
+
+
+class _SinkRequestHandler(FakeRequestHandler):
+
+    def do_PUT(self):
+        if self.inject_faults():
+            return
+
+        num_bytes = 0
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+
+                num_bytes += self._discard(size)
+                self.rfile.readline()
+        else:
+            num_bytes = self._discard(
+                int(self.headers.get("Content-Length") or 0))
+
+        with self.fake._lock:  # pylint: disable=protected-access
+            self.fake.num_bytes_received += num_bytes
+        self.send_body(200)
+
+    def _discard(self, size):
+        remaining = size
+        while remaining > 0:
+            chunk = self.rfile.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        return size - remaining
+
+
+class _APIRequestHandler(FakeRequestHandler):
+
+    def do_HEAD(self):
+        self.send_body(200, include_body=False)
+
+    def do_PUT(self):
+        self._handle(("state",))
+
+    def do_POST(self):
+        self._handle(("metadata", "data"))
+
+    def _handle(self, endpoints):
+        if self.inject_faults():
+            return
+
+        body = self.read_body()
+        path = urlparse.urlsplit(self.path).path
+        match = _JOB_PATTERN.match(path[len(self.fake.path_prefix):])
+        if match is None or match.group(2) not in endpoints:
+            self._send_error(404, "Not found")
+            return
+
+        if not self.headers.get("X-Voxel51-Agent"):
+            self._send_error(401, "Missing agent token")
+            return
+
+        job_id, endpoint = match.groups()
+        fake = self.fake
+        # pylint: disable=protected-access
+        with fake._lock:
+            if endpoint == "state":
+                form = urlparse.parse_qs(body.decode("utf-8"))
+                fake.job_states.setdefault(job_id, []).append(
+                    form["state"][0])
+                response = {"state": form["state"][0]}
+            elif endpoint == "metadata":
+                fake.job_metadata[job_id] = json.loads(body.decode("utf-8"))
+                response = {}
+            else:
+                fake.job_data.setdefault(job_id, []).append(len(body))
+                response = {"data": {"data_id": uuid.uuid4().hex}}
+
+        self.send_json(200, response)
+
+    def _send_error(self, code, message):
+        self.send_json(code, {"error": {"code": code, "message": message}})
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], socket.error):
+            return  # The client gave up on a stalled or slow response
+
+        HTTPServer.handle_error(self, request, client_address)
+
+
+class _Throttle(object):
+
+    def __init__(self, bandwidth):
+        self._bandwidth = bandwidth
+        self._start = time.time()
+        self._num_bytes = 0
+
+    def consume(self, num_bytes):
+        if not self._bandwidth:
+            return
+
+        self._num_bytes += num_bytes
+        delay = self._num_bytes / self._bandwidth - (time.time() - self._start)
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,61 @@
+#!/usr/bin/env/python
+'''
+Transport adapters for the HTTP sessions of the Voxel51 Platform SDK.
+
+This module imports ``requests`` eagerly, so it is only imported when the
+first session is made, which keeps ``requests`` off the import path of
+``voxel51.task``.
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+from requests.adapters import HTTPAdapter
+
+
+class SourceAddressAdapter(HTTPAdapter):
+    '''Custom HTTPAdapter that binds its connections to a local source
+    address and, optionally, source port.'''
+
+    def __init__(self, source_address, source_port=0, *args, **kwargs):
+        '''Creates a SourceAddressAdapter instance.
+
+        Args:
+            source_address (str): the local IP address to bind to, or "" to
+                let the OS choose
+            source_port (int, optional): the local port to bind to, or 0 to
+                let the OS choose
+            *args: positional arguments for ``requests.adapters.HTTPAdapter``
+            **kwargs: keyword arguments for
+                ``requests.adapters.HTTPAdapter``
+        '''
+        self._source_address = (source_address, source_port)
+        super(SourceAddressAdapter, self).__init__(*args, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **kwargs):
+        kwargs["source_address"] = self._source_address
+        super(SourceAddressAdapter, self).init_poolmanager(
+            connections, maxsize, block=block, **kwargs)
+
+
+class SourcePortAdapter(SourceAddressAdapter):
+    '''Custom HTTPAdapter that allows the source port to be specified.
+
+    See ``SourceAddressAdapter`` to also specify the source address.
+    '''
+
+    def __init__(self, source_port, *args, **kwargs):
+        super(SourcePortAdapter, self).__init__(
+            "", source_port, *args, **kwargs)
@@ -18,13 +18,10 @@ from builtins import *
 # pragma pylint: enable=unused-wildcard-import
 # pragma pylint: enable=wildcard-import
 
+import contextlib
 import json
 import os
-
-import mimetypes
-import requests
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.poolmanager import PoolManager
+import uuid
 
 import voxel51.auth as voxa
 import voxel51.config as voxc
@@ -35,14 +32,30 @@ def make_api_client():
     '''Creates an API instance for communicating with the Voxel51 Vision
     Services API.
 
+    The client keeps a pool of connections alive between requests, and it can
+    safely be shared by multiple threads. If the
+    ``voxel51.config.API_SOURCE_ADDRESS_ENV_VAR`` environment variable is set,
+    the client is pinned to the given local address or network interface.
+
+    If the ``voxel51.config.LOCAL_API_DIR_ENV_VAR`` environment variable is
+    set, a LocalAPI backed by the given directory is returned instead, and no
+    API token is required.
+
     Returns:
-        an API instance
+        an API or LocalAPI instance
     '''
+    local_api_dir = os.environ.get(voxc.LOCAL_API_DIR_ENV_VAR)
+    if local_api_dir:
+        return LocalAPI(local_api_dir)
+
     private_key = os.environ[voxc.API_TOKEN_ENV_VAR]
     deployment_env = os.environ[voxc.DEPLOYMENT_ENV_VAR]
     is_macos = voxu.is_macos()
+    source_address = os.environ.get(voxc.API_SOURCE_ADDRESS_ENV_VAR) or None
     token = voxa.Token(private_key)
-    return API(token, deployment_env=deployment_env, is_macos=is_macos)
+    return API(
+        token, deployment_env=deployment_env, is_macos=is_macos,
+        keep_alive=True, source_address=source_address)
 
 
 class API(object):
@@ -56,12 +69,14 @@ class API(object):
         is_macos (bool): whether this session is running on macOS
         keep_alive (bool): whether the request session should be kept alive
             between requests
+        source_address (str): the local IP address or network interface to
+            which the session is pinned, if any
         base_url (str): the base URL of the API for the session
     '''
 
     def __init__(
             self, token, deployment_env=voxc.DeploymentEnvironments.PROD,
-            is_macos=False, keep_alive=False):
+            is_macos=False, keep_alive=False, source_address=None):
         '''Starts a new API session.
 
         Args:
@@ -73,14 +88,26 @@ class API(object):
                 The default is False
             keep_alive (bool, optional): whether to keep the request session
                 alive between requests. By default, this is False
+            source_address (str, optional): a local IP address or network
+                interface name to which to pin the session. This requires
+                ``keep_alive=True``. By default, the OS chooses
         '''
         self.token = token
         self.deployment_env = deployment_env
         self.is_macos = is_macos
         self.keep_alive = keep_alive
+        self.source_address = source_address
         self.base_url = self._get_base_url(deployment_env, is_macos)
         self._header = self.token.get_header()
-        self._requests = requests.Session() if keep_alive else requests
+        if keep_alive:
+            self._requests = voxu.make_session(
+                source_address=source_address,
+                pool_size=voxc.API_CONNECTION_POOL_SIZE)
+        elif source_address:
+            raise ValueError("Pinning a source address requires keep_alive")
+        else:
+            import requests
+            self._requests = requests
 
     def __enter__(self):
         return self
@@ -95,9 +122,26 @@ class API(object):
         if self.keep_alive:
             self._requests.close()
 
+    def warm_up(self):
+        '''Opens a connection to the API in the background, so that the first
+        request skips the DNS, TCP and TLS handshakes. Only has an effect when
+        ``keep_alive=True`` is passed to the constructor.
+
+        Returns:
+            the list of started daemon threads
+        '''
+        if not self.keep_alive:
+            return []
+
+        return voxu.warm_up_connections(
+            [self.base_url], sessions=[self._requests])
+
     def post_job_metadata(self, job_id, metadata):
         '''Posts metadata for the job with the given ID.
 
+        The request is idempotent, so it is retried and hedged as described in
+        ``voxel51.utils.send_request``.
+
         Args:
             job_id (str): the job ID
             metadata (dict): the dictionary of metadata to post
@@ -106,13 +150,18 @@ class API(object):
             APIError if the request was unsuccessful
         '''
         endpoint = self.base_url + "/jobs/" + job_id + "/metadata"
-        res = self._requests.post(
-            endpoint, headers=self._header, json=metadata)
+        res = voxu.send_request(
+            self._requests, "POST", endpoint,
+            timeout=voxc.CONTROL_REQUEST_TIMEOUT, idempotent=True, hedge=True,
+            headers=self._header, json=metadata)
         _validate_response(res)
 
     def update_job_state(self, job_id, state, failure_type=None):
         '''Updates the state of the job with the given ID.
 
+        The request is idempotent, so it is retried and hedged as described in
+        ``voxel51.utils.send_request``.
+
         Args:
             job_id (str): the job ID
             state (str): the new job state
@@ -127,15 +176,28 @@ class API(object):
         if failure_type is not None:
             data["failure_type"] = failure_type
 
-        res = self._requests.put(endpoint, headers=self._header, data=data)
+        res = voxu.send_request(
+            self._requests, "PUT", endpoint,
+            timeout=voxc.CONTROL_REQUEST_TIMEOUT, idempotent=True, hedge=True,
+            headers=self._header, data=data)
         _validate_response(res)
 
-    def upload_job_output_as_data(self, job_id, path):
+    def upload_job_output_as_data(
+            self, job_id, path, content_encoding=None, compression_level=None):
         '''Uploads the job output as data to the user's account.
 
+        The request body is not compressed unless a ``content_encoding`` is
+        provided.
+
         Args:
             job_id (str): the job ID
             path (str): the path to the data to upload
+            content_encoding (voxel51.utils.ContentEncoding, optional): the
+                content encoding to apply to the request body. By default, the
+                body is not encoded
+            compression_level (int, optional): the compression level to use.
+                By default, the level is chosen via
+                ``voxel51.utils.get_compression_level``
 
         Returns:
             the ID of the uploaded data
@@ -143,13 +205,59 @@ class API(object):
         Raises:
             APIError if the request was unsuccessful
         '''
-        endpoint = self.base_url + "/jobs/" + job_id + "/data"
         filename = os.path.basename(path)
-        mime_type = _get_mime_type(path)
         with open(path, "rb") as df:
-            files = {"file": (filename, df, mime_type)}
-            res = self._requests.post(
-                endpoint, files=files, headers=self._header)
+            return self.upload_job_output_file_as_data(
+                job_id, df, filename, content_encoding=content_encoding,
+                compression_level=compression_level)
+
+    def upload_job_output_file_as_data(
+            self, job_id, f, filename, content_encoding=None,
+            compression_level=None):
+        '''Uploads the contents of the given file-like object as data to the
+        user's account.
+
+        The file is read from its current position. The request body is sent
+        with a Content-Length and can be sent again if the request is retried,
+        so the file is spooled if it is not seekable, and the body is spooled
+        if it is compressed.
+
+        Args:
+            job_id (str): the job ID
+            f: a binary file-like object containing the data to upload
+            filename (str): the filename of the data
+            content_encoding (voxel51.utils.ContentEncoding, optional): the
+                content encoding to apply to the request body. By default, the
+                body is not encoded
+            compression_level (int, optional): the compression level to use.
+                By default, the level is chosen via
+                ``voxel51.utils.get_compression_level``
+
+        Returns:
+            the ID of the uploaded data
+
+        Raises:
+            APIError if the request was unsuccessful
+        '''
+        endpoint = self.base_url + "/jobs/" + job_id + "/data"
+        mime_type = _get_mime_type(filename)
+        content_encoding = content_encoding or voxu.ContentEncoding.IDENTITY
+        boundary = uuid.uuid4().hex
+        head, tail = _make_multipart_delimiters(
+            boundary, "file", filename, mime_type)
+        headers = dict(self._header)
+        headers["Content-Type"] = "multipart/form-data; boundary=%s" % boundary
+        if content_encoding != voxu.ContentEncoding.IDENTITY:
+            headers["Content-Encoding"] = content_encoding
+        scheduler = voxu.get_transfer_scheduler()
+        with contextlib.closing(voxu.make_request_body(
+                [head, f, tail], content_encoding=content_encoding,
+                compression_level=compression_level)) as body:
+            with scheduler.transfer(voxu.TransferPriority.BULK) as transfer:
+                body.transfer = transfer
+                res = voxu.send_request(
+                    self._requests, "POST", endpoint, idempotent=True,
+                    data=body, headers=headers)
         _validate_response(res)
         return _parse_json_response(res)["data"]["data_id"]
 
@@ -159,6 +267,136 @@ class API(object):
         return voxu.handle_macos_localhost(base_url) if is_macos else base_url
 
 
+class LocalAPI(object):
+    '''Stand-in for the Vision Services API that records job states, job
+    metadata and posted data in a local directory.
+
+    The directory has the following layout::
+
+        <base_dir>/jobs/<job_id>/state.json
+        <base_dir>/jobs/<job_id>/metadata.json
+        <base_dir>/jobs/<job_id>/data/<data_id>/<filename>
+
+    Posted data are made available via ``voxel51.utils.link_or_copy``, so
+    they are cloned rather than copied when the filesystem supports it. They
+    are never hard linked, so later writes to the posted files do not change
+    the recorded data.
+
+    Attributes:
+        base_dir (str): the directory in which the jobs are recorded
+    '''
+
+    def __init__(self, base_dir):
+        '''Creates a LocalAPI instance.
+
+        Args:
+            base_dir (str): the directory in which to record the jobs
+        '''
+        self.base_dir = base_dir
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        '''Does nothing, since no connections are opened.'''
+        pass
+
+    def warm_up(self):
+        '''Does nothing, since no connections are opened.
+
+        Returns:
+            an empty list
+        '''
+        return []
+
+    def get_job_dir(self, job_id):
+        '''Gets the directory in which the given job is recorded.
+
+        Args:
+            job_id (str): the job ID
+
+        Returns:
+            the path to the job directory
+        '''
+        return os.path.join(self.base_dir, "jobs", job_id)
+
+    def post_job_metadata(self, job_id, metadata):
+        '''Records metadata for the job with the given ID.
+
+        Args:
+            job_id (str): the job ID
+            metadata (dict): the dictionary of metadata to record
+        '''
+        self._write_json(job_id, "metadata.json", metadata)
+
+    def update_job_state(self, job_id, state, failure_type=None):
+        '''Records the state of the job with the given ID.
+
+        Args:
+            job_id (str): the job ID
+            state (str): the new job state
+            failure_type (str, optional): the job failure type, if any
+        '''
+        data = {"state": state}
+        if failure_type is not None:
+            data["failure_type"] = failure_type
+
+        self._write_json(job_id, "state.json", data)
+
+    def upload_job_output_as_data(
+            self, job_id, path, content_encoding=None, compression_level=None):
+        '''Records the job output as data.
+
+        Args:
+            job_id (str): the job ID
+            path (str): the path to the data to record
+            content_encoding (voxel51.utils.ContentEncoding, optional): unused
+            compression_level (int, optional): unused
+
+        Returns:
+            the ID of the recorded data
+        '''
+        data_id, data_path = self._make_data_path(
+            job_id, os.path.basename(path))
+        voxu.link_or_copy(path, data_path, allow_link=False)
+        return data_id
+
+    def upload_job_output_file_as_data(
+            self, job_id, f, filename, content_encoding=None,
+            compression_level=None):
+        '''Records the contents of the given file-like object as data.
+
+        Args:
+            job_id (str): the job ID
+            f: a binary file-like object containing the data to record
+            filename (str): the filename of the data
+            content_encoding (voxel51.utils.ContentEncoding, optional): unused
+            compression_level (int, optional): unused
+
+        Returns:
+            the ID of the recorded data
+        '''
+        data_id, data_path = self._make_data_path(job_id, filename)
+        voxu.upload_file_obj(
+            f, voxu.RemotePathConfig.from_local_path(data_path))
+        return data_id
+
+    def _make_data_path(self, job_id, filename):
+        data_id = uuid.uuid4().hex
+        data_path = os.path.join(
+            self.get_job_dir(job_id), "data", data_id, filename)
+        return data_id, data_path
+
+    def _write_json(self, job_id, filename, obj):
+        path = os.path.join(self.get_job_dir(job_id), filename)
+        voxu.upload_bytes(
+            json.dumps(obj, indent=4),
+            voxu.RemotePathConfig.from_local_path(path))
+
+
 class APIError(Exception):
     '''Exception raised when an API request fails.'''
 
@@ -195,21 +433,18 @@ class APIError(Exception):
         return cls(message, res.status_code)
 
 
-class SourcePortAdapter(HTTPAdapter):
-    '''Custom HTTPAdapter that allows the source port to be specified.'''
-
-    def __init__(self, source_port, *args, **kwargs):
-        self._source_port = source_port
-        super(SourcePortAdapter, self).__init__(*args, **kwargs)
-
-    def init_poolmanager(self, connections, maxsize, block=False):
-        self.poolmanager = PoolManager(
-            num_pools=connections, maxsize=maxsize,
-            block=block, source_address=("", self._source_port))
+def _get_mime_type(path):
+    return voxu.get_mime_type(path)
 
 
-def _get_mime_type(path):
-    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+def _make_multipart_delimiters(boundary, name, filename, mime_type):
+    head = (
+        "--%s\r\n"
+        "Content-Disposition: form-data; name=\"%s\"; filename=\"%s\"\r\n"
+        "Content-Type: %s\r\n\r\n" % (boundary, name, filename, mime_type)
+    ).encode("utf-8")
+    tail = ("\r\n--%s--\r\n" % boundary).encode("utf-8")
+    return head, tail
 
 
 def _validate_response(res):
@@ -61,3 +61,348 @@ BASE_API_URLS = {
     DeploymentEnvironments.PROD: "https://api.voxel51.com/v1",
     DeploymentEnvironments.LOCAL: "http://127.0.0.1:4000/v1",
 }
+
+#
+# The environment variable that enables sampling profiling of tasks. Its value
+# is the fraction of tasks, in [0, 1], that should be profiled. For example,
+# "1" profiles every task and "0.05" profiles a random 5% of tasks
+#
+PROFILE_ENV_VAR = "VOXEL51_PROFILE"
+
+#
+# The environment variable that can be used to override the sampling interval
+# of the profiler, in seconds
+#
+PROFILE_INTERVAL_ENV_VAR = "VOXEL51_PROFILE_INTERVAL"
+
+#
+# The default sampling interval of the profiler, in seconds
+#
+DEFAULT_PROFILE_INTERVAL = 0.01
+
+#
+# The maximum fraction of wall time that the profiler may spend sampling. If
+# sampling becomes more expensive than this, the sampling interval is
+# increased accordingly
+#
+PROFILE_MAX_OVERHEAD = 0.01
+
+#
+# The maximum stack depth and the maximum number of distinct stacks recorded
+# by the profiler
+#
+PROFILE_MAX_DEPTH = 64
+PROFILE_MAX_STACKS = 10000
+
+#
+# The default interval, in seconds, at which new logfile contents are shipped
+# to the platform when log shipping is enabled
+#
+DEFAULT_LOG_SHIPPING_INTERVAL = 60
+
+#
+# The compression level used when shipping logfile chunks
+#
+LOG_SHIPPING_COMPRESSION_LEVEL = 6
+
+#
+# The environment variable that can be used to enable the compression of
+# uploads of compressible (JSON/text) content to signed URLs. Supported values
+# are "gzip", "zstd" and "identity" (no compression)
+#
+CONTENT_ENCODING_ENV_VAR = "VOXEL51_CONTENT_ENCODING"
+
+#
+# The environment variable that can be used to override the compression level
+# of compressed uploads
+#
+COMPRESSION_LEVEL_ENV_VAR = "VOXEL51_COMPRESSION_LEVEL"
+
+#
+# The default content encoding applied to uploads of compressible content.
+# Uploads are not compressed by default, since the signature of a signed URL
+# may cover its Content-Encoding header
+#
+DEFAULT_CONTENT_ENCODING = "identity"
+
+#
+# The default compression levels for each content encoding
+#
+DEFAULT_COMPRESSION_LEVELS = {
+    "gzip": 6,
+    "zstd": 3,
+}
+
+#
+# The MIME types, in addition to all "text/*" types, whose uploads are
+# compressed by default
+#
+COMPRESSIBLE_MIME_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "application/xml",
+}
+
+#
+# The maximum number of connections that the API client keeps open to the API
+#
+API_CONNECTION_POOL_SIZE = 16
+
+#
+# The default number of outputs posted concurrently by batch uploads
+#
+DEFAULT_MAX_UPLOAD_WORKERS = 8
+
+#
+# The default number of concurrent operations used to bootstrap a task
+#
+DEFAULT_MAX_BOOTSTRAP_WORKERS = 8
+
+#
+# The default time budget, in seconds, for reporting the failure of a task
+#
+DEFAULT_FAILURE_TIMEOUT = 10
+
+#
+# The minimum number of frames in each shard of a video that is processed in
+# shards, so that short videos are not split into shards whose startup costs
+# exceed their processing time
+#
+DEFAULT_MIN_FRAMES_PER_SHARD = 300
+
+#
+# The name of the member of output bundles that contains the index of the
+# other members of the bundle
+#
+OUTPUT_BUNDLE_INDEX_NAME = "voxel51-index.json"
+
+#
+# The size of the parts in which streamed outputs are handed to the uploader,
+# and the maximum number of parts that may be buffered in memory at once
+#
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_MAX_BUFFERED_PARTS = 4
+
+#
+# The default size, in bytes, up to which staged outputs are kept in memory
+# before they are spilled to a temporary file on disk
+#
+DEFAULT_OUTPUT_SPOOL_MAX_SIZE = 100 * 1024 * 1024
+
+#
+# The size, in bytes, up to which request bodies whose size is not known in
+# advance, e.g., compressed uploads, are spooled in memory before they are
+# spilled to a temporary file on disk. Such bodies are spooled so that they
+# are sent with a Content-Length, as signed URLs often require
+#
+UPLOAD_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+#
+# The environment variable that can be used to override the digests computed
+# inline during transfers, as a comma-separated list of algorithms. Supported
+# algorithms are "md5", "sha256" and "crc32c". Use "none" to disable hashing
+#
+TRANSFER_DIGESTS_ENV_VAR = "VOXEL51_TRANSFER_DIGESTS"
+
+#
+# The digests computed inline during transfers by default
+#
+DEFAULT_TRANSFER_DIGESTS = ["md5"]
+
+#
+# The environment variable that, when set to "true", allows the MD5 digests of
+# transfers to be verified against the ETags of the transferred objects.
+# ETags are only MD5s for some objects in some stores, e.g., they are not for
+# S3 objects encrypted with SSE-KMS or SSE-C, so, by default, digests are only
+# verified against Content-MD5 and x-goog-hash headers
+#
+VERIFY_ETAG_MD5_ENV_VAR = "VOXEL51_VERIFY_ETAG_MD5"
+
+#
+# The environment variable that can be used to cap the total bandwidth, in
+# bytes per second, of bulk data transfers. By default, bandwidth is unlimited
+#
+MAX_BANDWIDTH_ENV_VAR = "VOXEL51_MAX_BANDWIDTH"
+
+#
+# The environment variable that can be used to override the maximum number of
+# concurrent bulk data transfers
+#
+MAX_TRANSFERS_ENV_VAR = "VOXEL51_MAX_TRANSFERS"
+
+#
+# The default maximum number of concurrent bulk data transfers. Control-plane
+# transfers (status publishes, etc.) are not subject to this limit
+#
+DEFAULT_MAX_TRANSFERS = 8
+
+#
+# The relative shares of the bandwidth cap given to each concurrent transfer of
+# the given priority
+#
+TRANSFER_PRIORITY_WEIGHTS = {
+    "BULK": 4,
+    "BACKGROUND": 1,
+}
+
+#
+# The maximum burst, in seconds of its bandwidth share, that a shaped transfer
+# may send at once
+#
+TRANSFER_MAX_BURST = 0.25
+
+#
+# The time, in seconds, after which a waiting transfer is promoted by one
+# priority rank, so that lower-priority transfers are never starved
+#
+TRANSFER_PRIORITY_AGING_INTERVAL = 5.0
+
+#
+# The number of transfer slots that higher-priority transfers may not take
+# while lower-priority transfers are waiting and none of them is active
+#
+TRANSFER_RESERVED_SLOTS = 1
+
+#
+# The size of the byte ranges in which large files are downloaded in parallel
+#
+DOWNLOAD_SEGMENT_SIZE = 8 * 1024 * 1024
+
+#
+# The bounds and initial value of the number of parallel range requests per
+# download, which is adapted to the observed throughput and throttling
+#
+MIN_SEGMENT_CONCURRENCY = 1
+MAX_SEGMENT_CONCURRENCY = 16
+INITIAL_SEGMENT_CONCURRENCY = 2
+
+#
+# The minimum relative throughput gain required to increase the concurrency,
+# the factor by which the concurrency is decreased on throttling, and the
+# factor by which latency may rise above its baseline before the concurrency
+# is decreased
+#
+ADAPTIVE_MIN_THROUGHPUT_GAIN = 0.05
+ADAPTIVE_DECREASE_FACTOR = 0.5
+ADAPTIVE_LATENCY_TOLERANCE = 2.0
+
+#
+# The maximum number of times a throttled or failed range request is retried
+#
+MAX_SEGMENT_RETRIES = 5
+
+#
+# The environment variable that can be used to specify a comma-separated list
+# of local IP addresses or network interface names across which bulk data
+# transfers are spread
+#
+DATA_SOURCE_ADDRESSES_ENV_VAR = "VOXEL51_DATA_SOURCE_ADDRESSES"
+
+#
+# The environment variable that can be used to pin API requests to a specific
+# local IP address or network interface name
+#
+API_SOURCE_ADDRESS_ENV_VAR = "VOXEL51_API_SOURCE_ADDRESS"
+
+#
+# The environment variable that can be used to replace the Vision Services API
+# with a local directory, in which job states, job metadata and posted data
+# are recorded. This allows tasks to be run offline, e.g., when reprocessing
+# archived jobs whose inputs and outputs are on the local filesystem
+#
+LOCAL_API_DIR_ENV_VAR = "VOXEL51_LOCAL_API_DIR"
+
+#
+# The environment variable that, when set to "true", allows the signed URLs of
+# remote paths to be plain local paths rather than ``file://`` URLs. Plain
+# local paths are also allowed when ``LOCAL_API_DIR_ENV_VAR`` is set
+#
+ALLOW_LOCAL_PATHS_ENV_VAR = "VOXEL51_ALLOW_LOCAL_PATHS"
+
+#
+# The timeout, in seconds, of the requests used to pre-warm connections
+#
+PREWARM_TIMEOUT = 5
+
+#
+# The name of the manifest member of task checkpoint archives
+#
+CHECKPOINT_MANIFEST_NAME = "voxel51-checkpoint.json"
+
+#
+# The time budget, in seconds, for taking the final checkpoint of a task when
+# it receives SIGTERM
+#
+SIGTERM_CHECKPOINT_TIMEOUT = 20
+
+#
+# The default connect and read timeouts, in seconds, of HTTP requests. The
+# read timeout bounds the time to wait for each chunk of the response, so
+# stalled connections are detected even if the request itself is long-lived
+#
+REQUEST_CONNECT_TIMEOUT = 10
+REQUEST_READ_TIMEOUT = 60
+
+#
+# The connect and read timeouts, in seconds, of small control-plane requests,
+# such as job state updates and status publishes
+#
+CONTROL_REQUEST_TIMEOUT = (5, 15)
+
+#
+# The maximum number of times a failed idempotent request is retried, and the
+# base and maximum delays, in seconds, of the exponential backoff between
+# retries. The delays are fully jittered
+#
+MAX_REQUEST_RETRIES = 4
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 10
+
+#
+# Small idempotent control-plane requests are hedged: if no response is
+# received within the given percentile of the recent latencies to the host, a
+# duplicate request is sent and the first response wins. Until enough
+# latencies have been recorded, the default delay is used
+#
+HEDGE_LATENCY_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MAX_SAMPLES = 200
+HEDGE_DEFAULT_DELAY = 1.0
+HEDGE_MIN_DELAY = 0.05
+
+#
+# The maximum size, in bytes, of control-plane uploads that are buffered in
+# memory so that they can be retried and hedged
+#
+CONTROL_UPLOAD_MAX_SIZE = 1024 * 1024
+
+#
+# The environment variable that can be used to set a time budget, in seconds,
+# for the task. Once the budget is exhausted, HTTP requests fail with a
+# ``voxel51.utils.DeadlineExceededError`` rather than blocking the task
+#
+TASK_TIME_BUDGET_ENV_VAR = "VOXEL51_TASK_TIME_BUDGET"
+
+#
+# The environment variable that can be used to enable the deduplication of
+# outputs posted as data. Its value is the path to a local index of the
+# digests of previously posted outputs, which may be shared by the tasks run
+# on the same machine
+#
+DATA_DEDUP_INDEX_ENV_VAR = "VOXEL51_DATA_DEDUP_INDEX"
+
+#
+# The environment variable that can be used to override the scope within
+# which posted data are reused, and the default scope. Supported values are
+# "job" (data are reused by re-runs of the same job) and "user" (data are
+# reused by all jobs of the same user)
+#
+DATA_DEDUP_SCOPE_ENV_VAR = "VOXEL51_DATA_DEDUP_SCOPE"
+DEFAULT_DATA_DEDUP_SCOPE = "job"
+
+#
+# The default number of members of zip archives that are fetched and
+# extracted concurrently when archive inputs are downloaded
+#
+DEFAULT_MAX_ARCHIVE_WORKERS = 8
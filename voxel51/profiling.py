@@ -0,0 +1,247 @@
+#!/usr/bin/env/python
+'''
+Low-overhead sampling profiler for Voxel51 Vision Analytics tasks.
+
+The profiler is enabled via the ``voxel51.config.PROFILE_ENV_VAR`` environment
+variable and records the stacks of all running threads in collapsed-stack
+format, which can be rendered directly by flamegraph tools such as
+``flamegraph.pl`` or speedscope.
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+from future.utils import iteritems
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+from collections import defaultdict
+import io
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+import voxel51.config as voxc
+
+
+_PROFILER = None
+_TRUNCATED_STACK = "[truncated]"
+
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler(object):
+    '''A statistical profiler that periodically samples the stacks of all
+    running threads and aggregates them in collapsed-stack format.
+
+    The overhead of the profiler is bounded: if sampling takes more than
+    ``max_overhead`` of the wall time, the sampling interval is increased
+    accordingly, and at most ``max_stacks`` distinct stacks are recorded.
+
+    Attributes:
+        interval (float): the current sampling interval, in seconds
+        max_depth (int): the maximum depth of the recorded stacks
+        max_stacks (int): the maximum number of distinct stacks recorded
+        max_overhead (float): the maximum fraction of wall time that may be
+            spent sampling
+        num_samples (int): the number of samples recorded so far
+    '''
+
+    def __init__(
+            self, interval=voxc.DEFAULT_PROFILE_INTERVAL,
+            max_depth=voxc.PROFILE_MAX_DEPTH,
+            max_stacks=voxc.PROFILE_MAX_STACKS,
+            max_overhead=voxc.PROFILE_MAX_OVERHEAD):
+        '''Creates a SamplingProfiler instance.
+
+        Args:
+            interval (float, optional): the sampling interval, in seconds
+            max_depth (int, optional): the maximum depth of the recorded stacks
+            max_stacks (int, optional): the maximum number of distinct stacks
+                to record. Further stacks are counted as ``[truncated]``
+            max_overhead (float, optional): the maximum fraction of wall time
+                that may be spent sampling
+        '''
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self.max_overhead = max_overhead
+        self.num_samples = 0
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        '''Whether the profiler is currently sampling.'''
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        '''Starts sampling in a background daemon thread.'''
+        if self.is_running:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="voxel51-profiler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        '''Stops sampling. The samples recorded so far are retained.'''
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def to_collapsed_str(self):
+        '''Renders the recorded samples in collapsed-stack format, i.e., one
+        ``frame;frame;...;frame count`` line per distinct stack.
+
+        Returns:
+            the collapsed-stack string
+        '''
+        with self._lock:
+            counts = dict(self._counts)
+
+        lines = [
+            "%s %d" % (stack, count)
+            for stack, count in sorted(iteritems(counts))]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_collapsed(self, path):
+        '''Writes the recorded samples in collapsed-stack format to the given
+        path.
+
+        Args:
+            path (str): the output path
+        '''
+        with io.open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_collapsed_str())
+
+    def _run(self):
+        this_thread_id = threading.current_thread().ident
+        while not self._stop_event.wait(self.interval):
+            start = time.time()
+            self._sample(this_thread_id)
+            elapsed = time.time() - start
+
+            # Back off if sampling is exceeding the overhead budget
+            min_interval = elapsed / self.max_overhead
+            if min_interval > self.interval:
+                self.interval = min_interval
+
+    def _sample(self, this_thread_id):
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        # pylint: disable=protected-access
+        frames = sys._current_frames()
+        with self._lock:
+            for thread_id, frame in iteritems(frames):
+                if thread_id == this_thread_id:
+                    continue
+
+                thread_name = thread_names.get(thread_id, str(thread_id))
+                stack = _collapse_stack(frame, thread_name, self.max_depth)
+                if (stack not in self._counts and
+                        len(self._counts) >= self.max_stacks):
+                    stack = _TRUNCATED_STACK
+
+                self._counts[stack] += 1
+
+            self.num_samples += 1
+
+
+def maybe_start_profiler():
+    '''Starts the global sampling profiler if profiling has been enabled via
+    the ``voxel51.config.PROFILE_ENV_VAR`` environment variable and this task
+    was selected for profiling.
+
+    This function is idempotent.
+
+    Returns:
+        the running SamplingProfiler, or None if profiling is disabled
+    '''
+    global _PROFILER
+    if _PROFILER is not None:
+        return _PROFILER
+
+    rate = _get_float_env(voxc.PROFILE_ENV_VAR, 0.0)
+    if rate <= 0 or random.random() >= rate:
+        return None
+
+    interval = _get_float_env(
+        voxc.PROFILE_INTERVAL_ENV_VAR, voxc.DEFAULT_PROFILE_INTERVAL)
+    _PROFILER = SamplingProfiler(interval=interval)
+    _PROFILER.start()
+    logger.info("Sampling profiler started (interval = %gs)", interval)
+    return _PROFILER
+
+
+def stop_profiler():
+    '''Stops the global sampling profiler, if it is running.
+
+    Returns:
+        the stopped SamplingProfiler, or None if profiling was not enabled
+    '''
+    global _PROFILER
+    profiler = _PROFILER
+    _PROFILER = None
+    if profiler is not None:
+        profiler.stop()
+        logger.info(
+            "Sampling profiler stopped (%d samples)", profiler.num_samples)
+    return profiler
+
+
+def get_profile_path(logfile_path):
+    '''Gets the path to which to write the profile of a task with the given
+    logfile.
+
+    Args:
+        logfile_path (str): the path to the logfile of the task
+
+    Returns:
+        the path to the collapsed-stack profile
+    '''
+    return os.path.splitext(logfile_path)[0] + ".folded"
+
+
+def _collapse_stack(frame, thread_name, max_depth):
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append("%s (%s:%d)" % (
+            code.co_name, os.path.basename(code.co_filename),
+            code.co_firstlineno))
+        frame = frame.f_back
+
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+def _get_float_env(name, default):
+    value = os.environ.get(name)
+    if not value:
+        return default
+
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning("Ignoring invalid value '%s' for %s", value, name)
+        return default
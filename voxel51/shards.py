@@ -0,0 +1,640 @@
+#!/usr/bin/env/python
+'''
+Sharded execution of video tasks for the Voxel51 Vision Analytics SDK.
+
+A ShardCoordinator splits an input video of a task into contiguous frame
+ranges, runs each range as a sub-task with its own status, and merges the
+frame labels produced by the shards into the task output. Each sub-task
+extracts only its clip of the video, so, when the video is read from its
+signed URL, only the byte ranges that the shard needs are downloaded.
+
+Sub-tasks are run by a shard executor, which is any object providing a
+``map(func, items)`` method that yields the results of the calls as they
+complete. The LocalShardExecutor runs the sub-tasks in a local process pool.
+
+| Copyright 2017-2019, Voxel51, Inc.
+| `voxel51.com <https://voxel51.com/>`_
+|
+'''
+# pragma pylint: disable=redefined-builtin
+# pragma pylint: disable=unused-wildcard-import
+# pragma pylint: disable=wildcard-import
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from builtins import *
+# pragma pylint: enable=redefined-builtin
+# pragma pylint: enable=unused-wildcard-import
+# pragma pylint: enable=wildcard-import
+
+from functools import partial
+import logging
+import multiprocessing
+import os
+
+from eta.core.serial import Serializable
+import eta.core.utils as etau
+
+import voxel51.config as voxc
+import voxel51.task as voxt
+import voxel51.utils as voxu
+
+
+logger = logging.getLogger(__name__)
+
+
+class VideoShard(Serializable):
+    '''Class describing a contiguous range of frames of a video.
+
+    Attributes:
+        index (int): the index of the shard
+        num_shards (int): the total number of shards of the video
+        first_frame (int): the first frame number of the shard
+        last_frame (int): the last frame number of the shard, inclusive
+        start_time (float): the time, in seconds, of the first frame
+        duration (float): the duration, in seconds, of the shard
+    '''
+
+    def __init__(
+            self, index, num_shards, first_frame, last_frame, start_time,
+            duration):
+        '''Creates a VideoShard instance.
+
+        Args:
+            index (int): the index of the shard
+            num_shards (int): the total number of shards of the video
+            first_frame (int): the first frame number of the shard
+            last_frame (int): the last frame number of the shard, inclusive
+            start_time (float): the time, in seconds, of the first frame
+            duration (float): the duration, in seconds, of the shard
+        '''
+        self.index = index
+        self.num_shards = num_shards
+        self.first_frame = first_frame
+        self.last_frame = last_frame
+        self.start_time = start_time
+        self.duration = duration
+
+    @property
+    def num_frames(self):
+        '''The number of frames in the shard.'''
+        return self.last_frame - self.first_frame + 1
+
+    @property
+    def frames(self):
+        '''The frames of the shard, as a frames string like "1-100".'''
+        return "%d-%d" % (self.first_frame, self.last_frame)
+
+    def get_frame_number(self, clip_frame_number):
+        '''Converts a frame number within the clip of the shard to the
+        corresponding frame number of the video.
+
+        Args:
+            clip_frame_number (int): a frame number within the clip, starting
+                from 1
+
+        Returns:
+            the frame number within the video
+        '''
+        return self.first_frame + clip_frame_number - 1
+
+    def attributes(self):
+        '''Returns a list of class attributes to be serialized.'''
+        return [
+            "index", "num_shards", "first_frame", "last_frame", "start_time",
+            "duration"]
+
+    @classmethod
+    def from_dict(cls, d):
+        '''Constructs a VideoShard from a JSON dictionary.
+
+        Args:
+            d (dict): a JSON dictionary
+
+        Returns:
+            a VideoShard instance
+        '''
+        return cls(
+            d["index"], d["num_shards"], d["first_frame"], d["last_frame"],
+            d["start_time"], d["duration"])
+
+
+class ShardTask(Serializable):
+    '''Class describing a sub-task that processes a shard of a video.
+
+    Attributes:
+        job_id (str): the ID of the job
+        input_name (str): the name of the input video
+        video_path (str): the local path or URL of the input video
+        shard (VideoShard): the shard to process
+        parameters (dict): the parameters of the task
+        output_dir (str): the directory to which to write the outputs of the
+            shard
+    '''
+
+    def __init__(
+            self, job_id, input_name, video_path, shard, output_dir,
+            parameters=None):
+        '''Creates a ShardTask instance.
+
+        Args:
+            job_id (str): the ID of the job
+            input_name (str): the name of the input video
+            video_path (str): the local path or URL of the input video
+            shard (VideoShard): the shard to process
+            output_dir (str): the directory to which to write the outputs of
+                the shard
+            parameters (dict, optional): the parameters of the task
+        '''
+        self.job_id = job_id
+        self.input_name = input_name
+        self.video_path = video_path
+        self.shard = shard
+        self.output_dir = output_dir
+        self.parameters = parameters or {}
+
+    def attributes(self):
+        '''Returns a list of class attributes to be serialized.'''
+        return [
+            "job_id", "input_name", "video_path", "shard", "output_dir",
+            "parameters"]
+
+    @classmethod
+    def from_dict(cls, d):
+        '''Constructs a ShardTask from a JSON dictionary.
+
+        Args:
+            d (dict): a JSON dictionary
+
+        Returns:
+            a ShardTask instance
+        '''
+        return cls(
+            d["job_id"], d["input_name"], d["video_path"],
+            VideoShard.from_dict(d["shard"]), d["output_dir"],
+            parameters=d.get("parameters"))
+
+
+class ShardStatus(Serializable):
+    '''Class for recording the status of a shard of a task.
+
+    Attributes:
+        index (int): the index of the shard
+        state (voxel51.task.TaskState): the current state of the shard
+        start_time (str): time the shard was started, or None if not started
+        complete_time (str): time the shard was completed, or None if not
+            completed
+        fail_time (str): time the shard failed, or None if not failed
+        messages (list): list of ``voxel51.task.TaskStatusMessage`` instances
+            for the shard
+        output_path (str): the path to the output of the shard, or None if it
+            has not completed
+    '''
+
+    def __init__(self, index):
+        '''Creates a ShardStatus instance.
+
+        Args:
+            index (int): the index of the shard
+        '''
+        self.index = index
+        self.state = voxt.TaskState.SCHEDULED
+        self.start_time = None
+        self.complete_time = None
+        self.fail_time = None
+        self.messages = []
+        self.output_path = None
+
+    def start(self, msg="Shard started"):
+        '''Marks the shard as started.
+
+        Args:
+            msg (str, optional): a message to log
+        '''
+        self.start_time = self.add_message(msg)
+        self.state = voxt.TaskState.RUNNING
+
+    def complete(self, output_path, msg="Shard complete"):
+        '''Marks the shard as complete.
+
+        Args:
+            output_path (str): the path to the output of the shard
+            msg (str, optional): a message to log
+        '''
+        self.output_path = output_path
+        self.complete_time = self.add_message(msg)
+        self.state = voxt.TaskState.COMPLETE
+
+    def fail(self, msg="Shard failed"):
+        '''Marks the shard as failed.
+
+        Args:
+            msg (str, optional): a message to log
+        '''
+        self.fail_time = self.add_message(msg)
+        self.state = voxt.TaskState.FAILED
+
+    def add_message(self, msg):
+        '''Adds the given timestamped message to the status.
+
+        Args:
+            msg (str): a message to log
+
+        Returns:
+            the timestamp of the message
+        '''
+        message = voxt.TaskStatusMessage(msg)
+        self.messages.append(message)
+        return message.time
+
+    def attributes(self):
+        '''Returns a list of class attributes to be serialized.'''
+        return [
+            "index", "state", "start_time", "complete_time", "fail_time",
+            "messages", "output_path"]
+
+
+class ShardError(Exception):
+    '''Exception raised when one or more shards of a task failed.
+
+    Attributes:
+        statuses (list): the ShardStatus instances of the failed shards
+    '''
+
+    def __init__(self, statuses):
+        '''Creates a ShardError instance.
+
+        Args:
+            statuses (list): the ShardStatus instances of the failed shards
+        '''
+        self.statuses = statuses
+        super(ShardError, self).__init__(
+            "%d shard(s) failed: %s" % (
+                len(statuses),
+                ", ".join(str(status.index) for status in statuses)))
+
+
+class LocalShardExecutor(object):
+    '''Shard executor that runs sub-tasks in a pool of local processes.
+
+    Since the sub-tasks are run in separate processes, the functions that
+    they run must be picklable, e.g., defined at the top-level of a module.
+
+    By the time the shards are run, the task has background threads (log
+    shipping, uploads, etc.) that may hold locks, so, by default, the worker
+    processes are spawned rather than forked. Spawned workers import the main
+    module of the program, so its entry point must be guarded by
+    ``if __name__ == "__main__":``. On Python 2, workers are always forked.
+
+    Attributes:
+        num_workers (int): the number of worker processes
+        start_method (str): the ``multiprocessing`` start method of the
+            workers
+    '''
+
+    def __init__(self, num_workers=None, start_method="spawn"):
+        '''Creates a LocalShardExecutor instance.
+
+        Args:
+            num_workers (int, optional): the number of worker processes. By
+                default, the number of CPUs is used
+            start_method (str, optional): the ``multiprocessing`` start method
+                of the workers. By default, "spawn" is used
+        '''
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.start_method = start_method
+
+    def map(self, func, items):
+        '''Runs the given function on each item in the process pool.
+
+        Args:
+            func: a picklable function
+            items (list): the items to process
+
+        Returns:
+            an iterator over the results of the calls, in the order in which
+                they complete
+        '''
+        if hasattr(multiprocessing, "get_context"):
+            context = multiprocessing.get_context(self.start_method)
+        else:
+            context = multiprocessing  # Python 2 only supports forking
+
+        pool = context.Pool(min(self.num_workers, len(items)) or 1)
+        try:
+            for result in pool.imap_unordered(func, items):
+                yield result
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+class ShardCoordinator(object):
+    '''Class that runs a video task in shards.
+
+    Example usage::
+
+        task_manager = voxt.TaskManager.from_url(task_config_url)
+        task_manager.start()
+        coordinator = ShardCoordinator(task_manager, "video", num_shards=8)
+        coordinator.plan()
+        statuses = coordinator.run(process_shard, "/tmp/shards")
+        coordinator.merge_frame_labels(statuses)
+        task_manager.complete(logfile_path=logfile_path)
+
+    where ``process_shard(shard_task)`` is a top-level function that
+    extracts the clip of the shard via ``extract_shard_clip()``, processes it,
+    and returns the path to the frame labels of the shard, written via a
+    ``voxel51.utils.FrameLabelsWriter`` with frame numbers of the video.
+    '''
+
+    def __init__(
+            self, task_manager, input_name, num_shards=None,
+            min_frames_per_shard=None, executor=None):
+        '''Creates a ShardCoordinator instance.
+
+        Args:
+            task_manager (voxel51.task.TaskManager): the TaskManager of the
+                task
+            input_name (str): the name of the input video
+            num_shards (int, optional): the maximum number of shards. By
+                default, the number of CPUs is used
+            min_frames_per_shard (int, optional): the minimum number of frames
+                in each shard. By default,
+                ``voxel51.config.DEFAULT_MIN_FRAMES_PER_SHARD`` is used
+            executor (optional): the shard executor to use. By default, a
+                LocalShardExecutor with ``num_shards`` workers is used
+        '''
+        self.task_manager = task_manager
+        self.input_name = input_name
+        self.num_shards = num_shards or multiprocessing.cpu_count()
+        if min_frames_per_shard is None:
+            min_frames_per_shard = voxc.DEFAULT_MIN_FRAMES_PER_SHARD
+        self.min_frames_per_shard = min_frames_per_shard
+        self.executor = executor or LocalShardExecutor(self.num_shards)
+        self.shards = []
+        self._video_path = None
+
+    @property
+    def video_path(self):
+        '''The local path or URL from which the shards read the input video.
+
+        If the input was not downloaded, the shards read it from its signed
+        URL.
+        '''
+        if self._video_path:
+            return self._video_path
+
+        path_config = self.task_manager.task_config.inputs[self.input_name]
+        if path_config.local_path is not None:
+            return path_config.local_path
+
+        return voxu.handle_macos_localhost(path_config.signed_url)
+
+    def plan(self, video_path=None, metadata=None):
+        '''Splits the input video into shards.
+
+        The shards are planned from the metadata recorded for the input in
+        the TaskStatus, if any, or from the metadata of the video, which is
+        read from the signed URL of the input if it was not downloaded.
+
+        Args:
+            video_path (str, optional): the local path to the input video, if
+                it was downloaded
+            metadata (optional): an ``eta.core.video.VideoMetadata`` instance
+                or dictionary describing the input video
+
+        Returns:
+            the list of VideoShard instances
+        '''
+        self._video_path = video_path
+        if metadata is None:
+            metadata = self.task_manager.task_status.inputs.get(
+                self.input_name)
+        if metadata is None:
+            metadata = voxu.get_metadata_for_video(self.video_path)
+            self.task_manager.record_input_metadata(
+                self.input_name, metadata=metadata.serialize())
+
+        self.shards = plan_video_shards(
+            metadata, self.num_shards,
+            min_frames_per_shard=self.min_frames_per_shard)
+        self.task_manager.add_status_message(
+            "Input '%s' split into %d shard(s)" % (
+                self.input_name, len(self.shards)))
+        return self.shards
+
+    def run(self, shard_func, work_dir, parameters=None):
+        '''Runs the given function on each shard of the input video.
+
+        The status of each shard is recorded in the TaskStatus, which is
+        published whenever a shard finishes.
+
+        Args:
+            shard_func: a function that accepts a ShardTask, processes the
+                shard, and returns the path to its output. The function must
+                be picklable if the shards are run in separate processes
+            work_dir (str): the directory in which the shards write their
+                outputs. Each shard is given its own subdirectory
+            parameters (dict, optional): the parameters to pass to the shards
+
+        Returns:
+            the list of ShardStatus instances of the shards, in order
+
+        Raises:
+            ShardError: if any shard failed
+        '''
+        if not self.shards:
+            self.plan()
+
+        task_status = self.task_manager.task_status
+        shard_tasks = []
+        for shard in self.shards:
+            shard_tasks.append(ShardTask(
+                self.task_manager.task_config.job_id, self.input_name,
+                self.video_path, shard,
+                os.path.join(work_dir, "shard-%03d" % shard.index),
+                parameters=parameters))
+            status = ShardStatus(shard.index)
+            task_status.record_shard_status(shard.index, status)
+
+        statuses = {}
+        results = self.executor.map(
+            partial(run_shard, shard_func), shard_tasks)
+        for status in results:
+            statuses[status.index] = status
+            task_status.record_shard_status(status.index, status)
+            logger.info(
+                "Shard %d finished with state %s", status.index, status.state)
+            task_status.add_message(
+                "%d/%d shard(s) finished" % (len(statuses), len(shard_tasks)))
+            task_status.publish()
+
+        statuses = [statuses[shard.index] for shard in self.shards]
+        failed = [s for s in statuses if s.state != voxt.TaskState.COMPLETE]
+        if failed:
+            raise ShardError(failed)
+
+        return statuses
+
+    def merge_frame_labels(self, statuses, jsonl=False, header=None):
+        '''Merges the frame labels output by the shards into the task output.
+
+        The merged labels are streamed to the task output via
+        ``voxel51.task.TaskManager.open_frame_labels_writer()``, and the upload
+        is finalized by ``voxel51.task.TaskManager.complete()``.
+
+        Only the labels of the frames of each shard are merged from its output,
+        so that frames that a shard processed beyond its range, e.g., because
+        its clip was not frame-exact, are never duplicated.
+
+        Args:
+            statuses (list): the ShardStatus instances of the shards, in order
+            jsonl (bool, optional): whether the shard outputs and the task
+                output are in JSON-lines format. By default, this is False
+            header (dict, optional): a dictionary of top-level fields to write
+                before the frames of the task output
+
+        Returns:
+            the number of merged frames
+        '''
+        shards = {shard.index: shard for shard in self.shards}
+        writer = self.task_manager.open_frame_labels_writer(
+            jsonl=jsonl, header=header)
+        num_dropped = 0
+        for status in statuses:
+            shard = shards[status.index]
+            frame_numbers = set()
+            for frame_number, labels in voxu.iter_frame_labels(
+                    status.output_path, jsonl=jsonl):
+                if (frame_number in frame_numbers or
+                        not shard.first_frame <= frame_number <=
+                        shard.last_frame):
+                    num_dropped += 1
+                    continue
+
+                frame_numbers.add(frame_number)
+                writer.write_frame(frame_number, labels)
+
+        if num_dropped:
+            logger.warning(
+                "Dropped %d duplicate frame(s) or frame(s) outside the range "
+                "of their shard", num_dropped)
+
+        logger.info(
+            "Merged %d frame(s) from %d shard(s)", writer.num_frames,
+            len(statuses))
+        return writer.num_frames
+
+
+def plan_video_shards(metadata, num_shards, min_frames_per_shard=None):
+    '''Splits a video into contiguous shards of nearly equal numbers of frames.
+
+    Args:
+        metadata: an ``eta.core.video.VideoMetadata`` instance or dictionary
+            describing the video
+        num_shards (int): the maximum number of shards
+        min_frames_per_shard (int, optional): the minimum number of frames in
+            each shard. By default,
+            ``voxel51.config.DEFAULT_MIN_FRAMES_PER_SHARD`` is used
+
+    Returns:
+        a list of VideoShard instances
+
+    Raises:
+        ValueError: if the video has no frames
+    '''
+    if hasattr(metadata, "serialize"):
+        metadata = metadata.serialize()
+    if min_frames_per_shard is None:
+        min_frames_per_shard = voxc.DEFAULT_MIN_FRAMES_PER_SHARD
+
+    total_frame_count = int(metadata.get("total_frame_count") or 0)
+    if total_frame_count <= 0:
+        raise ValueError("Cannot shard a video without frames")
+
+    frame_rate = float(metadata["frame_rate"])
+    num_shards = max(1, min(
+        num_shards, total_frame_count // max(1, min_frames_per_shard)))
+    shards = []
+    for index in range(num_shards):
+        first_frame = index * total_frame_count // num_shards + 1
+        last_frame = (index + 1) * total_frame_count // num_shards
+        shards.append(VideoShard(
+            index, num_shards, first_frame, last_frame,
+            (first_frame - 1) / frame_rate,
+            (last_frame - first_frame + 1) / frame_rate))
+
+    return shards
+
+
+def run_shard(shard_func, shard_task):
+    '''Runs the given function on a shard and records its status.
+
+    Args:
+        shard_func: a function that accepts a ShardTask and returns the path
+            to its output
+        shard_task (ShardTask): the ShardTask
+
+    Returns:
+        the ShardStatus of the shard
+    '''
+    status = ShardStatus(shard_task.shard.index)
+    status.start()
+    try:
+        etau.ensure_dir(shard_task.output_dir)
+        output_path = shard_func(shard_task)
+        status.complete(output_path)
+    except Exception as e:
+        logger.error(
+            "Shard %d failed", shard_task.shard.index, exc_info=True)
+        status.fail("Shard failed: %s" % e)
+
+    return status
+
+
+def extract_shard_clip(shard_task, ext=".mp4"):
+    '''Extracts the clip of the video covered by the given shard.
+
+    The clip is extracted by seeking directly to the start of the shard, so,
+    when the video is read from a URL, only the byte ranges of the video that
+    contain the shard are downloaded. Frame ``n`` of the clip corresponds to
+    frame ``shard.get_frame_number(n)`` of the video.
+
+    The clip is cut by frame count rather than by duration, and the number of
+    frames of the extracted clip is verified, so that the clips of adjacent
+    shards neither overlap nor leave gaps.
+
+    Args:
+        shard_task (ShardTask): the ShardTask
+        ext (str, optional): the extension of the clip
+
+    Returns:
+        the path to the extracted clip
+
+    Raises:
+        IOError: if the clip does not contain exactly the frames of the shard
+    '''
+    import eta.core.video as etav
+
+    shard = shard_task.shard
+    clip_path = os.path.join(
+        shard_task.output_dir, "clip-%03d%s" % (shard.index, ext))
+
+    # Seeking to half a frame before the first frame of the shard ensures that
+    # the rounding of its timestamp does not skip it
+    frame_duration = shard.duration / shard.num_frames
+    seek_time = max(0.0, shard.start_time - 0.5 * frame_duration)
+    ffmpeg = etav.FFmpeg(
+        in_opts=["-vsync", "0", "-ss", "%.6f" % seek_time],
+        out_opts=["-vsync", "0", "-frames:v", str(shard.num_frames)])
+    ffmpeg.run(shard_task.video_path, clip_path)
+
+    num_frames = etav.get_frame_count(clip_path)
+    if num_frames != shard.num_frames:
+        raise IOError(
+            "Expected %d frames in the clip of shard %d, but found %d" % (
+                shard.num_frames, shard.index, num_frames))
+
+    return clip_path
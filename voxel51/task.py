@@ -19,9 +19,18 @@ from future.utils import iteritems
 # pragma pylint: enable=unused-wildcard-import
 # pragma pylint: enable=wildcard-import
 
+from collections import OrderedDict
+from functools import partial
+import hashlib
 import logging
+import json
 import os
+import shutil
 import sys
+import tarfile
+import tempfile
+import threading
+import time
 
 try:
     import urllib.parse as urlparse  # Python 3
@@ -29,16 +38,22 @@ except ImportError:
     import urlparse  # Python 2
 
 from eta.core.config import Config
-import eta.core.log as etal
 from eta.core.serial import Serializable
 import eta.core.utils as etau
 
 import voxel51.api as voxa
 import voxel51.config as voxc
+import voxel51.profiling as voxp
 import voxel51.utils as voxu
 
 
 _API_CLIENT = None
+_API_CLIENT_LOCK = threading.Lock()
+_LOG_SHIPPER = None
+_CHECKPOINT_FILES_DIR = "files"
+_DATA_DEDUP_SETTINGS = None
+_DATA_DEDUP_INDEXES = {}
+_DATA_DEDUP_LOCK = threading.Lock()
 
 
 logger = logging.getLogger(__name__)
@@ -58,6 +73,25 @@ class TaskConfig(Config):
         self.logfile = self.parse_object(d, "logfile", voxu.RemotePathConfig)
         self.output = self.parse_object(
             d, "output", voxu.RemotePathConfig, default=None)
+        self.profile = self.parse_object(
+            d, "profile", voxu.RemotePathConfig, default=None)
+        self.log_chunks = self.parse_object_array(
+            d, "log_chunks", voxu.RemotePathConfig, default=[])
+        self.checkpoint = self.parse_object(
+            d, "checkpoint", CheckpointConfig, default=None)
+
+
+class CheckpointConfig(Config):
+    '''Class that describes where the checkpoint of a task is stored.
+
+    Since signed URLs are only valid for a single HTTP method, separate
+    locations are provided for downloading and uploading the checkpoint.
+    '''
+
+    def __init__(self, d):
+        self.download = self.parse_object(
+            d, "download", voxu.RemotePathConfig)
+        self.upload = self.parse_object(d, "upload", voxu.RemotePathConfig)
 
 
 class TaskState(object):
@@ -78,6 +112,13 @@ class TaskFailureType(object):
     NONE = "NONE"
 
 
+class DataDedupScope(object):
+    '''Enum describing the scopes within which posted data are reused.'''
+
+    JOB = "job"
+    USER = "user"
+
+
 class TaskManager(object):
     '''Class for managing the execution of a task.'''
 
@@ -94,37 +135,343 @@ class TaskManager(object):
             self.task_status = task_status
         else:
             self.task_status = make_task_status(task_config)
+        self._output_writer = None
+        self._input_paths = {}
+        self._checkpointed_input_paths = {}
+        self._checkpoint_state = None
+        self._checkpoint_files = {}
+        self._checkpoint_sequence = 0
+        self._metadata_posted = False
+        self._terminated = False
+        self._resumed_checkpoint = None
 
     @classmethod
-    def from_url(cls, task_config_url):
+    def from_url(cls, task_config_url, prewarm=True, resume=True):
         '''Creates a TaskManager for the TaskConfig downloadable from the given
         URL.
 
         Args:
             task_config_url (str): a URL from which to download a TaskConfig
+            prewarm (bool, optional): whether to open connections to the API
+                and to the storage hosts of the task in the background as soon
+                as the TaskConfig is available. By default, this is True
+            resume (bool, optional): whether to resume the task from its
+                checkpoint, if the task supports checkpointing and a previous
+                run of the job left one. By default, this is True
 
         Returns:
             a TaskManager instance
         '''
         task_config = download_task_config(task_config_url)
-        return cls(task_config)
+        if prewarm:
+            prewarm_connections(task_config)
+        task_manager = cls(task_config)
+        if resume:
+            task_manager.resume()
+        return task_manager
+
+    @property
+    def resumed_checkpoint(self):
+        '''The Checkpoint from which the task was resumed, or None if the task
+        was started from scratch.
+        '''
+        return self._resumed_checkpoint
 
-    def start(self):
+    def checkpoint(self, state, files=None):
+        '''Persists the progress of the analytic to the job-scoped checkpoint
+        location of the task.
+
+        Along with the given state, the checkpoint records the progress of the
+        task itself (downloaded inputs, posted job metadata and posted data),
+        so that these phases are skipped when the job is resumed.
+
+        Args:
+            state (dict): a JSON-serializable dictionary describing the
+                progress of the analytic, e.g., the index of the last processed
+                frame
+            files (dict, optional): a dictionary mapping names to the local
+                paths of files to include in the checkpoint, e.g., partial
+                outputs. Names must not contain path separators
+
+        Returns:
+            the Checkpoint
+
+        Raises:
+            ValueError: if the task does not support checkpointing
+        '''
+        return self._checkpoint(state, files, voxu.TransferPriority.BULK)
+
+    def _checkpoint(self, state, files, priority):
+        files = dict(files or {})
+        checkpoint = Checkpoint(
+            self.task_config.job_id, self._checkpoint_sequence + 1, state,
+            files=files, inputs={
+                name: {
+                    "path": path,
+                    "digests": self.task_status.input_digests.get(name),
+                }
+                for name, path in iteritems(self._input_paths)},
+            posted_data=dict(self.task_status.posted_data),
+            input_metadata=dict(self.task_status.inputs),
+            metadata_posted=self._metadata_posted)
+        upload_checkpoint(checkpoint, self.task_config, priority=priority)
+        self._checkpoint_sequence = checkpoint.sequence
+        self._checkpoint_state = state
+        self._checkpoint_files = files
+        return checkpoint
+
+    def resume(self, checkpoint_dir=None):
+        '''Resumes the task from its checkpoint, if one exists.
+
+        The recorded progress of the task is restored, so that inputs that are
+        still present locally are not downloaded again, and job metadata and
+        data that were already posted are not posted again.
+
+        Args:
+            checkpoint_dir (str, optional): the directory to which to extract
+                the files of the checkpoint. By default, a temporary directory
+                is used
+
+        Returns:
+            the Checkpoint, or None if there was no checkpoint to resume from
+        '''
+        if self.task_config.checkpoint is None:
+            return None
+
+        if checkpoint_dir is None:
+            checkpoint_dir = tempfile.mkdtemp(prefix="voxel51-checkpoint-")
+
+        checkpoint = download_checkpoint(checkpoint_dir, self.task_config)
+        if checkpoint is None:
+            return None
+
+        for name, input_info in iteritems(checkpoint.inputs):
+            if input_info.get("digests"):
+                self.task_status.record_input_digests(
+                    name, input_info["digests"])
+                self._checkpointed_input_paths[name] = input_info["path"]
+        for name, metadata in iteritems(checkpoint.input_metadata):
+            self.task_status.record_input_metadata(name, metadata)
+        for name, data_id in iteritems(checkpoint.posted_data):
+            self.task_status.record_posted_data(name, data_id)
+
+        self._metadata_posted = checkpoint.metadata_posted
+        self._checkpoint_sequence = checkpoint.sequence
+        self._checkpoint_state = checkpoint.state
+        self._checkpoint_files = dict(checkpoint.files)
+        self._resumed_checkpoint = checkpoint
+        logger.info("Task resumed from checkpoint %d", checkpoint.sequence)
+        self.task_status.add_message(
+            "Task resumed from checkpoint %d" % checkpoint.sequence)
+        return checkpoint
+
+    def enable_sigterm_checkpoint(self, get_state=None):
+        '''Installs a SIGTERM handler that takes a final checkpoint of the task
+        before the process exits, e.g., when a preemptible node is reclaimed.
+
+        The handler itself only records the signal, since the main thread may
+        have been interrupted while holding locks that the checkpoint needs.
+        The checkpoint is taken by a background thread within
+        ``voxel51.config.SIGTERM_CHECKPOINT_TIMEOUT`` seconds, as a
+        control-plane transfer, so that it does not wait for transfer slots.
+        Afterwards, SIGTERM is raised again, and any previously installed
+        handler is invoked, or the process exits. Once terminated,
+        ``fail_gracefully`` does not mark the task as failed, so that the job
+        can be resumed.
+
+        This method must be called from the main thread.
+
+        Args:
+            get_state (function, optional): a function that returns the current
+                state of the analytic. By default, the state of the last
+                checkpoint is used. The files of the last checkpoint are
+                always included
+        '''
+        import signal
+
+        previous_handler = signal.getsignal(signal.SIGTERM)
+        received = threading.Event()
+        checkpointed = threading.Event()
+
+        def _take_final_checkpoint():
+            received.wait()
+            logger.warning("Received SIGTERM; taking a final checkpoint")
+            try:
+                if get_state is not None:
+                    state = get_state()
+                else:
+                    state = self._checkpoint_state
+            except Exception:
+                logger.error("Failed to get the final state", exc_info=True)
+                state = self._checkpoint_state
+
+            errors, pending = _run_concurrently(
+                {"checkpoint": partial(
+                    self._checkpoint, state, self._checkpoint_files,
+                    voxu.TransferPriority.CONTROL)},
+                timeout=voxc.SIGTERM_CHECKPOINT_TIMEOUT)
+            if errors or pending:
+                logger.error("Failed to take the final checkpoint")
+
+            checkpointed.set()
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        def _handle_sigterm(signum, frame):
+            self._terminated = True
+            if not checkpointed.is_set():
+                received.set()
+                return
+
+            if callable(previous_handler):
+                previous_handler(signum, frame)
+            else:
+                sys.exit(128 + signum)
+
+        thread = threading.Thread(
+            target=_take_final_checkpoint, name="voxel51-sigterm-checkpoint")
+        thread.daemon = True
+        thread.start()
+        signal.signal(signal.SIGTERM, _handle_sigterm)
+
+    def start(self, time_budget=None):
         '''Marks the task as started and publishes the TaskStatus to the
         platform.
+
+        Args:
+            time_budget (float, optional): a time budget, in seconds, for the
+                task, after which requests to the platform fail rather than
+                block the task. By default, the budget is read from the
+                ``voxel51.config.TASK_TIME_BUDGET_ENV_VAR`` environment
+                variable, if set
         '''
-        start_task(self.task_status)
+        start_task(self.task_status, time_budget=time_budget)
+
+    def bootstrap(
+            self, inputs_dir, data_params_dir=None, video_inputs=None,
+            post_metadata=False, max_workers=None, archive_inputs=None,
+            time_budget=None):
+        '''Starts the task and prepares everything that the analytic needs to
+        begin inference, overlapping the steps that do not depend on each
+        other.
+
+        The RUNNING status is published, the inputs and data parameters are
+        downloaded, and the metadata of the video inputs is probed, all
+        concurrently. This is equivalent to calling ``start()``,
+        ``download_inputs()``, ``parse_parameters()`` and
+        ``record_input_metadata()`` in sequence.
 
-    def download_inputs(self, inputs_dir):
+        Args:
+            inputs_dir (str): the directory to which to download the inputs
+            data_params_dir (str, optional): the directory to which to download
+                data parameters, if any
+            video_inputs (list, optional): the names of the video inputs whose
+                metadata should be probed and recorded. By default, no
+                metadata is probed
+            post_metadata (bool, optional): whether to also post the job
+                metadata, which requires exactly one video input. By default,
+                this is False
+            max_workers (int, optional): the maximum number of concurrent
+                operations. By default,
+                ``voxel51.config.DEFAULT_MAX_BOOTSTRAP_WORKERS`` is used
+            archive_inputs (list, optional): the names of the inputs that are
+                archives to extract as they are downloaded. See
+                ``download_inputs()`` for details
+            time_budget (float, optional): a time budget, in seconds, for the
+                task, as in ``start()``
+
+        Returns:
+            a BootstrapResult
+        '''
+        if post_metadata and self._metadata_posted:
+            logger.info("Job metadata was already posted")
+            post_metadata = False
+
+        result = bootstrap_task(
+            inputs_dir, self.task_config, self.task_status,
+            data_params_dir=data_params_dir, video_inputs=video_inputs,
+            post_metadata=post_metadata, max_workers=max_workers,
+            existing_paths=self._checkpointed_input_paths,
+            archive_inputs=archive_inputs, time_budget=time_budget)
+        self._input_paths.update(result.inputs)
+        self._metadata_posted |= post_metadata
+        return result
+
+    def download_inputs(self, inputs_dir, archive_inputs=None):
         '''Downloads the task inputs.
 
         Args:
             inputs_dir (str): the directory to which to download the inputs
+            archive_inputs (list, optional): the names of the inputs that are
+                tar, tar.gz, tar.zst or zip archives. These inputs are
+                extracted as they are downloaded into a subdirectory of
+                ``inputs_dir`` named after the input
 
         Returns:
-            a dictionary mapping input names to filepaths
+            a dictionary mapping input names to filepaths. The paths of
+                archive inputs are the directories to which they were
+                extracted
         '''
-        return download_inputs(inputs_dir, self.task_config, self.task_status)
+        input_paths = download_inputs(
+            inputs_dir, self.task_config, self.task_status,
+            existing_paths=self._checkpointed_input_paths,
+            archive_inputs=archive_inputs)
+        self._input_paths.update(input_paths)
+        return input_paths
+
+    def map_input(
+            self, name, access_pattern=voxu.AccessPattern.SEQUENTIAL,
+            dtype=None, shape=None, offset=0):
+        '''Memory-maps the given downloaded input read-only.
+
+        Processes on the same host that map the same input share its pages
+        rather than each reading their own copy.
+
+        Args:
+            name (str): the input name
+            access_pattern (voxel51.utils.AccessPattern, optional): the
+                expected access pattern, which is passed to the kernel as an
+                ``madvise`` hint. By default, sequential access is assumed
+            dtype (optional): a NumPy dtype. If provided, the input is mapped
+                as a NumPy array rather than an ``mmap.mmap``
+            shape (tuple, optional): the shape of the NumPy array, if ``dtype``
+                is provided
+            offset (int, optional): the byte offset of the NumPy array in the
+                input, if ``dtype`` is provided
+
+        Returns:
+            a read-only ``mmap.mmap``, or a read-only ``numpy.ndarray`` if
+                ``dtype`` is provided
+
+        Raises:
+            KeyError: if the input has not been downloaded
+        '''
+        path = self._input_paths[name]
+        if dtype is not None:
+            return voxu.map_array(
+                path, dtype, shape=shape, offset=offset,
+                access_pattern=access_pattern)
+
+        return voxu.map_file(path, access_pattern=access_pattern)
+
+    def start_log_shipping(self, logfile_path, interval=None):
+        '''Starts shipping the new contents of the given logfile to the
+        platform in the background.
+
+        Log shipping requires the TaskConfig to provide ``log_chunks``
+        locations. When shipping is active, completing or failing the task only
+        needs to upload the tail of the logfile.
+
+        Args:
+            logfile_path (str): the path to the logfile of the task
+            interval (float, optional): the shipping interval, in seconds. By
+                default, ``voxel51.config.DEFAULT_LOG_SHIPPING_INTERVAL`` is
+                used
+
+        Returns:
+            the LogShipper, or None if the task does not support log shipping
+        '''
+        return start_log_shipping(
+            logfile_path, self.task_config, interval=interval)
 
     def parse_parameters(self, data_params_dir=None):
         '''Parses the task parameters.
@@ -162,11 +509,19 @@ class TaskManager(object):
         Note that this function currently only supports jobs that process
         a single video.
 
+        If the task was resumed from a checkpoint taken after the metadata was
+        posted, it is not posted again.
+
         Args:
             video_path (str): the path to the input video for the job
         '''
+        if self._metadata_posted:
+            logger.info("Job metadata was already posted")
+            return
+
         post_job_metadata_for_video(
             video_path, self.task_config, self.task_status)
+        self._metadata_posted = True
 
     def add_status_message(self, msg):
         '''Adds the given status message to the TaskStatus for the task. The
@@ -189,6 +544,110 @@ class TaskManager(object):
         '''
         upload_output(output_path, self.task_config, self.task_status)
 
+    def stage_output(self, filename, max_size=None):
+        '''Creates a staging buffer for an output that is kept in memory up to
+        ``max_size`` bytes and spilled to disk beyond it.
+
+        Staged outputs can be uploaded via ``upload_staged_output()`` or
+        ``upload_staged_output_as_data()`` without an intermediate file.
+
+        Args:
+            filename (str): the filename of the output, which determines its
+                MIME type and the name under which it is posted as data
+            max_size (int, optional): the size, in bytes, beyond which the
+                output is spilled to disk. By default,
+                ``voxel51.config.DEFAULT_OUTPUT_SPOOL_MAX_SIZE`` is used
+
+        Returns:
+            a ``voxel51.utils.SpooledOutput``
+        '''
+        if max_size is None:
+            max_size = voxc.DEFAULT_OUTPUT_SPOOL_MAX_SIZE
+        return voxu.SpooledOutput(filename, max_size=max_size)
+
+    def upload_staged_output(self, staged_output):
+        '''Uploads the given staged output as the task output.
+
+        Args:
+            staged_output (voxel51.utils.SpooledOutput): a staged output
+        '''
+        upload_staged_output(
+            staged_output, self.task_config, self.task_status)
+
+    def upload_staged_output_as_data(self, name, staged_output):
+        '''Uploads the given staged output as data on behalf of the user.
+
+        Args:
+            name (str): the name of the output
+            staged_output (voxel51.utils.SpooledOutput): a staged output
+        '''
+        upload_staged_output_as_data(
+            name, staged_output, self.task_config, self.task_status)
+
+    def open_output(self, content_type=None):
+        '''Opens a writable stream that uploads the task output in the
+        background as it is written.
+
+        The stream is closed automatically by ``complete()``, which waits only
+        for the final part of the output to be uploaded.
+
+        Args:
+            content_type (str, optional): the MIME type of the output, which is
+                used to decide whether to compress it
+
+        Returns:
+            a ``voxel51.utils.UploadWriter``
+        '''
+        self._output_writer = open_output(
+            self.task_config, content_type=content_type)
+        return self._output_writer
+
+    def open_frame_labels_writer(self, jsonl=False, header=None):
+        '''Opens a writer that incrementally streams frame-indexed labels to
+        the task output as they are produced.
+
+        The writer is closed automatically by ``complete()`` and
+        ``fail_gracefully()``, so the output is always a valid document.
+
+        Args:
+            jsonl (bool, optional): whether to write JSON-lines rather than a
+                single JSON document. By default, this is False
+            header (dict, optional): a dictionary of top-level fields to write
+                before the frames
+
+        Returns:
+            a ``voxel51.utils.FrameLabelsWriter``
+        '''
+        content_type = (
+            "application/x-ndjson" if jsonl else "application/json")
+        writer = voxu.FrameLabelsWriter(
+            self.open_output(content_type=content_type), jsonl=jsonl,
+            header=header)
+        self._output_writer = writer
+        return writer
+
+    def upload_output_bundle(self, output_paths, compress=False):
+        '''Uploads the given files as a single tar archive task output.
+
+        The archive is generated on the fly as it is uploaded, and its index
+        is recorded in the TaskStatus so that consumers can extract individual
+        members via range requests. See ``voxel51.utils.TarBundle`` for
+        details.
+
+        Args:
+            output_paths (dict or list): a dictionary mapping archive names to
+                local paths, or a list of local paths, which are archived by
+                their basenames
+            compress (bool, optional): whether to gzip-compress the archive.
+                By default, this is False
+
+        Returns:
+            the list of index entries of the archive members
+        '''
+        return upload_output_bundle(
+            output_paths, self.task_config, self.task_status,
+            compress=compress)
+
     def upload_output_as_data(self, name, output_path):
         '''Uploads the given task output as data on behalf of the user.
 
@@ -199,18 +658,72 @@ class TaskManager(object):
         upload_output_as_data(
             name, output_path, self.task_config, self.task_status)
 
-    def complete(self, logfile_path=None):
-        '''Marks the task as complete and publishes the TaskStatus to the
-        platform.
+    def upload_outputs_as_data(self, output_paths, max_workers=None):
+        '''Concurrently uploads the given task outputs as data on behalf of the
+        user.
+
+        Args:
+            output_paths (dict): a dictionary mapping output names to the local
+                paths of the output files to upload
+            max_workers (int, optional): the maximum number of concurrent
+                uploads. By default,
+                ``voxel51.config.DEFAULT_MAX_UPLOAD_WORKERS`` is used
+
+        Returns:
+            a dictionary mapping output names to the IDs of the posted data
+
+        Raises:
+            PostDataError: if any of the outputs failed to upload. All other
+                outputs are still uploaded and recorded
+        '''
+        return upload_outputs_as_data(
+            output_paths, self.task_config, self.task_status,
+            max_workers=max_workers)
+
+    def enable_data_dedup(self, index_path, scope=None):
+        '''Enables the deduplication of outputs posted as data.
+
+        See ``enable_data_dedup()`` for details.
+
+        Args:
+            index_path (str): the path to the local index of posted data
+            scope (DataDedupScope, optional): the scope within which posted
+                data are reused
+
+        Returns:
+            the DataDedupIndex
+        '''
+        return enable_data_dedup(index_path, self.task_config, scope=scope)
+
+    def complete(
+            self, logfile_path=None, output_path=None,
+            data_output_paths=None):
+        '''Uploads the final artifacts of the task concurrently and, once all
+        of them have succeeded, marks the task as complete and publishes the
+        TaskStatus to the platform.
+
+        Any output stream opened via ``open_output`` is closed as part of the
+        final artifacts. The logfile is uploaded last, once the task has been
+        marked as complete.
 
         Args:
             logfile_path (str): an optional path to a logfile to upload for the
                 task
+            output_path (str, optional): the path to an output file to upload
+                as the task output
+            data_output_paths (dict, optional): a dictionary mapping output
+                names to the paths of output files to post as data
+
+        Raises:
+            FinalizeError: if any artifact failed to upload, in which case the
+                task is not marked as complete
         '''
         complete_task(
-            self.task_config, self.task_status, logfile_path=logfile_path)
+            self.task_config, self.task_status, logfile_path=logfile_path,
+            output_path=output_path, data_output_paths=data_output_paths,
+            output_writer=self._pop_output_writer())
 
-    def fail_gracefully(self, failure_type, logfile_path=None):
+    def fail_gracefully(self, failure_type, logfile_path=None, timeout=None):
         '''Marks the task as failed and gracefully winds up by posting any
         available information (status, logfile, etc.) to the platform.
 
@@ -218,10 +731,287 @@ class TaskManager(object):
             failure_type (TaskFailureType): the failure reason
             logfile_path (str): an optional local path to a logfile for the
                 task
+            timeout (float, optional): the time budget, in seconds, for
+                reporting the failure. By default,
+                ``voxel51.config.DEFAULT_FAILURE_TIMEOUT`` is used
         '''
+        if self._terminated and self.task_config.checkpoint is not None:
+            logger.warning(
+                "Task was terminated after checkpointing; leaving the job to "
+                "be resumed")
+            return
+
         fail_gracefully(
             failure_type, self.task_config, self.task_status,
-            logfile_path=logfile_path)
+            logfile_path=logfile_path, output_writer=self._pop_output_writer(),
+            timeout=timeout)
+
+    def _pop_output_writer(self):
+        writer = self._output_writer
+        self._output_writer = None
+        return writer
+
+
+class PostDataError(Exception):
+    '''Exception raised when one or more outputs of a batch could not be
+    posted as data.
+
+    Attributes:
+        errors (dict): a dictionary mapping the names of the failed outputs to
+            the exceptions that they raised
+        data_ids (dict): a dictionary mapping the names of the successfully
+            posted outputs to their data IDs
+    '''
+
+    def __init__(self, errors, data_ids):
+        '''Creates a PostDataError instance.
+
+        Args:
+            errors (dict): a dictionary mapping output names to exceptions
+            data_ids (dict): a dictionary mapping output names to data IDs
+        '''
+        self.errors = errors
+        self.data_ids = data_ids
+        message = "Failed to post %d of %d output(s) as data: %s" % (
+            len(errors), len(errors) + len(data_ids),
+            ", ".join(sorted(errors)))
+        super(PostDataError, self).__init__(message)
+
+
+class FinalizeError(Exception):
+    '''Exception raised when one or more final artifacts of a task could not
+    be uploaded.
+
+    Attributes:
+        errors (dict): a dictionary mapping the names of the failed artifacts
+            to the exceptions that they raised
+    '''
+
+    def __init__(self, errors):
+        '''Creates a FinalizeError instance.
+
+        Args:
+            errors (dict): a dictionary mapping artifact names to exceptions
+        '''
+        self.errors = errors
+        message = "Failed to upload %d final artifact(s): %s" % (
+            len(errors), ", ".join(sorted(errors)))
+        super(FinalizeError, self).__init__(message)
+
+
+class BootstrapResult(object):
+    '''Class describing everything that was prepared to run a task.
+
+    Attributes:
+        inputs (dict): a dictionary mapping input names to their downloaded
+            filepaths
+        parameters (dict): a dictionary mapping parameter names to values
+            (builtin parameters) or downloaded filepaths (data parameters)
+        metadata (dict): a dictionary mapping the names of the probed video
+            inputs to their VideoMetadata
+        timings (dict): a dictionary mapping the name of each bootstrap
+            operation to its duration, in seconds
+        time_to_first_inference (float): the time, in seconds, from the start
+            of the bootstrap until the analytic could begin inference
+    '''
+
+    def __init__(
+            self, inputs, parameters, metadata, timings,
+            time_to_first_inference):
+        '''Creates a BootstrapResult instance.
+
+        Args:
+            inputs (dict): the downloaded inputs
+            parameters (dict): the parsed parameters
+            metadata (dict): the probed video metadata
+            timings (dict): the durations of the bootstrap operations
+            time_to_first_inference (float): the total bootstrap time
+        '''
+        self.inputs = inputs
+        self.parameters = parameters
+        self.metadata = metadata
+        self.timings = timings
+        self.time_to_first_inference = time_to_first_inference
+
+
+class LogShipper(object):
+    '''Class that periodically uploads the new contents of a logfile in a
+    background thread.
+
+    Each upload is a gzip-compressed chunk containing only the bytes written
+    since the previous upload, sent to the next of a sequence of numbered
+    chunk locations. Since concatenated gzip members form a valid gzip stream,
+    the chunks can be concatenated to recover the full logfile.
+
+    The last chunk location is reserved for the final flush performed by
+    ``stop()``.
+
+    Attributes:
+        logfile_path (str): the path to the logfile being shipped
+        chunk_configs (list): the list of RemotePathConfig instances describing
+            where to upload the chunks
+        interval (float): the shipping interval, in seconds
+        num_chunks (int): the number of chunks uploaded so far
+        offset (int): the number of logfile bytes uploaded so far
+    '''
+
+    def __init__(
+            self, logfile_path, chunk_configs,
+            interval=voxc.DEFAULT_LOG_SHIPPING_INTERVAL):
+        '''Creates a LogShipper instance.
+
+        Args:
+            logfile_path (str): the path to the logfile to ship
+            chunk_configs (list): a list of RemotePathConfig instances
+                describing where to upload the chunks
+            interval (float, optional): the shipping interval, in seconds
+        '''
+        self.logfile_path = logfile_path
+        self.chunk_configs = chunk_configs
+        self.interval = interval
+        self.num_chunks = 0
+        self.offset = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_exhausted(self):
+        '''Whether all chunk locations have been used.'''
+        return self.num_chunks >= len(self.chunk_configs)
+
+    def start(self):
+        '''Starts shipping the logfile in a background daemon thread.'''
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="voxel51-log-shipper")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        '''Stops the background thread and ships the tail of the logfile.
+
+        Returns:
+            True if the entire logfile has been shipped, or False if the chunk
+                locations were exhausted before it could be
+        '''
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        return self.ship(final=True)
+
+    def ship(self, final=False):
+        '''Uploads the contents of the logfile written since the last upload,
+        if any, as the next chunk.
+
+        Args:
+            final (bool, optional): whether this is the final upload, which may
+                use the last chunk location. By default, this is False
+
+        Returns:
+            True if the logfile was fully shipped, and False otherwise
+        '''
+        with self._lock:
+            num_reserved = 0 if final else 1
+            if self.num_chunks + num_reserved >= len(self.chunk_configs):
+                return self._is_shipped()
+
+            end = os.path.getsize(self.logfile_path)
+            if end < self.offset:
+                logger.warning("Logfile was truncated; cannot ship it")
+                self.num_chunks = len(self.chunk_configs)
+                return False
+            if end == self.offset:
+                return True
+
+            data = b"".join(voxu.gzip_chunks(
+                voxu.read_chunks(self.logfile_path, self.offset, end),
+                level=voxc.LOG_SHIPPING_COMPRESSION_LEVEL))
+            voxu.upload_bytes(
+                data, self.chunk_configs[self.num_chunks],
+                content_type="application/gzip",
+                priority=voxu.TransferPriority.BACKGROUND)
+            self.num_chunks += 1
+            self.offset = end
+            return self._is_shipped()
+
+    def _is_shipped(self):
+        return os.path.getsize(self.logfile_path) == self.offset
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.ship()
+            except Exception:
+                # The same bytes will be retried on the next iteration
+                logger.warning("Failed to ship logfile chunk", exc_info=True)
+
+
+class DataDedupIndex(object):
+    '''Class that maintains a local index of the SHA-256 digests of outputs
+    posted as data, so that byte-identical outputs are not uploaded again.
+
+    The index is a JSON file that maps scope keys to dictionaries mapping
+    digests to data IDs, and entries are only reused within the same scope.
+    The file is rewritten atomically whenever an entry is added, after
+    merging the entries added by other processes, so it can be shared by the
+    tasks run on the same machine. Entries added concurrently by two
+    processes may be lost, which only causes an output to be uploaded again.
+
+    Attributes:
+        path (str): the path to the index file
+        scope_key (str): the key of the scope of the index
+    '''
+
+    def __init__(self, path, scope_key):
+        '''Creates a DataDedupIndex instance.
+
+        Args:
+            path (str): the path to the index file, which is created if
+                necessary
+            scope_key (str): the key of the scope of the index
+        '''
+        self.path = path
+        self.scope_key = scope_key
+        self._lock = threading.Lock()
+        self._data_ids = self._read().get(scope_key, {})
+
+    def get(self, digest):
+        '''Gets the ID of the data previously posted with the given digest.
+
+        Args:
+            digest (str): a SHA-256 hex digest
+
+        Returns:
+            the data ID, or None if no data with the digest were posted
+        '''
+        with self._lock:
+            return self._data_ids.get(digest)
+
+    def add(self, digest, data_id):
+        '''Records that data with the given digest were posted.
+
+        Args:
+            digest (str): a SHA-256 hex digest
+            data_id (str): the ID of the posted data
+        '''
+        with self._lock:
+            index = self._read()
+            data_ids = index.setdefault(self.scope_key, {})
+            data_ids[digest] = data_id
+            voxu.upload_bytes(
+                json.dumps(index), voxu.RemotePathConfig.from_local_path(
+                    self.path))
+            self._data_ids = data_ids
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
 
 
 class TaskStatus(Serializable):
@@ -239,8 +1029,18 @@ class TaskStatus(Serializable):
         messages (list): list of TaskStatusMessage instances for the task
         inputs (dict): a dictionary containing metadata about the inputs to the
             task
+        input_digests (dict): a dictionary mapping input names to dictionaries
+            of the hex digests of the downloaded inputs
         posted_data (dict): a dictionary mapping names of outputs posted as
             data to their associated data IDs
+        posted_data_metadata (dict): a dictionary mapping names of outputs
+            posted as data with deduplication enabled to dictionaries with
+            their ``sha256`` digest and whether they were ``deduplicated``,
+            i.e., whether previously posted data were reused
+        output_index (dict): the index entry of the index member of the output
+            bundle, if the output was uploaded as a bundle, or None
+        shards (dict): a dictionary mapping the indices of the shards of the
+            task, if it was processed in shards, to their statuses
     '''
 
     def __init__(self, task_config):
@@ -258,7 +1058,11 @@ class TaskStatus(Serializable):
         self.fail_time = None
         self.messages = []
         self.inputs = {}
+        self.input_digests = {}
         self.posted_data = {}
+        self.posted_data_metadata = {}
+        self.output_index = None
+        self.shards = {}
         self._publish_callback = make_publish_callback(
             task_config.job_id, task_config.status)
 
@@ -272,14 +1076,48 @@ class TaskStatus(Serializable):
         '''
         self.inputs[name] = metadata
 
-    def record_posted_data(self, name, data_id):
+    def record_input_digests(self, name, digests):
+        '''Records the digests of the given input, as computed while it was
+        downloaded.
+
+        Args:
+            name (str): the input name
+            digests (dict): a dictionary mapping digest algorithms to hex
+                digests
+        '''
+        self.input_digests[name] = digests
+
+    def record_posted_data(self, name, data_id, metadata=None):
         '''Records the ID of data posted to the cloud on the user's behalf.
 
         Args:
             name (str): the output name
             data_id (str): the ID of the posted data in cloud storage
+            metadata (dict, optional): metadata about how the data were
+                posted, e.g., whether they were deduplicated
         '''
         self.posted_data[name] = data_id
+        if metadata is not None:
+            self.posted_data_metadata[name] = metadata
+
+    def record_output_index(self, index_entry):
+        '''Records the location of the index of the output bundle.
+
+        Args:
+            index_entry (dict): the index entry of the index member of the
+                output bundle
+        '''
+        self.output_index = index_entry
+
+    def record_shard_status(self, index, shard_status):
+        '''Records the status of a shard of the task.
+
+        Args:
+            index (int): the index of the shard
+            shard_status (dict): a dictionary or Serializable object describing
+                the status of the shard
+        '''
+        self.shards[str(index)] = shard_status
 
     def start(self, msg="Task started"):
         '''Marks the task as started.
@@ -342,7 +1180,82 @@ class TaskStatus(Serializable):
         '''Returns a list of class attributes to be serialized.'''
         return [
             "analytic", "version", "state", "failure_type", "start_time",
-            "complete_time", "fail_time", "messages", "inputs", "posted_data"]
+            "complete_time", "fail_time", "messages", "inputs",
+            "input_digests", "posted_data", "posted_data_metadata",
+            "output_index", "shards"]
+
+
+class Checkpoint(Serializable):
+    '''Class describing a checkpoint of a task.
+
+    Attributes:
+        job_id (str): the ID of the job
+        sequence (int): the sequence number of the checkpoint within the job
+        time (str): the time at which the checkpoint was taken
+        state (dict): the state of the analytic
+        files (dict): a dictionary mapping the names of the checkpointed files
+            to their local paths
+        inputs (dict): a dictionary mapping the names of the downloaded inputs
+            to dictionaries with their local ``path`` and their ``digests``
+        posted_data (dict): a dictionary mapping the names of the outputs
+            posted as data to their data IDs
+        input_metadata (dict): a dictionary mapping input names to their
+            recorded metadata
+        metadata_posted (bool): whether the job metadata was posted
+    '''
+
+    def __init__(
+            self, job_id, sequence, state, files=None, inputs=None,
+            posted_data=None, input_metadata=None, metadata_posted=False,
+            time=None):
+        '''Creates a Checkpoint instance.
+
+        Args:
+            job_id (str): the ID of the job
+            sequence (int): the sequence number of the checkpoint
+            state (dict): the state of the analytic
+            files (dict, optional): the checkpointed files
+            inputs (dict, optional): the downloaded inputs
+            posted_data (dict, optional): the outputs posted as data
+            input_metadata (dict, optional): the recorded input metadata
+            metadata_posted (bool, optional): whether the job metadata was
+                posted
+            time (str, optional): the time of the checkpoint. If not provided,
+                the current time in ISO 8601 format is used
+        '''
+        self.job_id = job_id
+        self.sequence = sequence
+        self.time = time or etau.get_isotime()
+        self.state = state
+        self.files = files or {}
+        self.inputs = inputs or {}
+        self.posted_data = posted_data or {}
+        self.input_metadata = input_metadata or {}
+        self.metadata_posted = metadata_posted
+
+    def attributes(self):
+        '''Returns a list of class attributes to be serialized.'''
+        return [
+            "job_id", "sequence", "time", "state", "files", "inputs",
+            "posted_data", "input_metadata", "metadata_posted"]
+
+    @classmethod
+    def from_dict(cls, d):
+        '''Constructs a Checkpoint from a JSON dictionary.
+
+        Args:
+            d (dict): a JSON dictionary
+
+        Returns:
+            a Checkpoint instance
+        '''
+        return cls(
+            d["job_id"], d["sequence"], d.get("state"),
+            files=d.get("files"), inputs=d.get("inputs"),
+            posted_data=d.get("posted_data"),
+            input_metadata=d.get("input_metadata"),
+            metadata_posted=d.get("metadata_posted", False),
+            time=d.get("time"))
 
 
 class TaskStatusMessage(Serializable):
@@ -379,6 +1292,8 @@ def setup_logging(logfile_path, rotate=True):
             or append to any existing logfiles (False). By default, this is
             True
     '''
+    import eta.core.log as etal
+
     logging_config = etal.LoggingConfig.default()
     logging_config.filename = logfile_path
     etal.custom_setup(logging_config, rotate=rotate)
@@ -394,6 +1309,17 @@ def get_task_config_url():
     return os.environ[voxc.TASK_DESCRIPTION_ENV_VAR]
 
 
+def get_task_time_budget():
+    '''Gets the time budget for this task from the
+    ``voxel51.config.TASK_TIME_BUDGET_ENV_VAR`` environment variable.
+
+    Returns:
+        the time budget, in seconds, or None if the task has no budget
+    '''
+    value = os.environ.get(voxc.TASK_TIME_BUDGET_ENV_VAR)
+    return float(value) if value else None
+
+
 def download_task_config(task_config_url):
     '''Downloads the TaskConfig from the given URL.
 
@@ -409,6 +1335,37 @@ def download_task_config(task_config_url):
     return TaskConfig.from_str(task_config_str)
 
 
+def prewarm_connections(task_config):
+    '''Opens connections to the API and to every distinct storage host of the
+    task in the background, so that the first real requests skip the DNS,
+    TCP and TLS handshakes.
+
+    Args:
+        task_config (TaskConfig): the TaskConfig for the task
+    '''
+    path_configs = [task_config.status, task_config.logfile]
+    path_configs.extend(task_config.inputs.values())
+    path_configs.extend(task_config.log_chunks)
+    if task_config.output is not None:
+        path_configs.append(task_config.output)
+    if task_config.profile is not None:
+        path_configs.append(task_config.profile)
+    if task_config.checkpoint is not None:
+        path_configs.append(task_config.checkpoint.download)
+        path_configs.append(task_config.checkpoint.upload)
+    for val in task_config.parameters.values():
+        if voxu.RemotePathConfig.is_path_config_dict(val):
+            path_configs.append(voxu.RemotePathConfig(val))
+
+    logger.info("Pre-warming connections")
+    try:
+        _get_api_client().warm_up()
+    except Exception as e:
+        logger.warning("Failed to pre-warm API connection: %s", e)
+
+    voxu.warm_up_connections([pc.signed_url for pc in path_configs])
+
+
 def make_task_status(task_config):
     '''Makes a TaskStatus instance for the given TaskConfig.
 
@@ -423,12 +1380,16 @@ def make_task_status(task_config):
     return task_status
 
 
-def start_task(task_status):
+def start_task(task_status, time_budget=None):
     '''Marks the task as started and publishes the TaskStatus to the platform.
 
     Args:
         task_status (TaskStatus): the TaskStatus for the task
+        time_budget (float, optional): a time budget, in seconds, for the task.
+            By default, the budget is read via ``get_task_time_budget()``
     '''
+    _set_task_time_budget(time_budget)
+    voxp.maybe_start_profiler()
     logger.info("Task started")
     task_status.start()
     task_status.publish()
@@ -449,8 +1410,9 @@ def make_publish_callback(job_id, status_path_config):
     '''
     def _publish_status(task_status):
         voxu.upload_bytes(
-            task_status.to_str(), status_path_config,
-            content_type="application/json")
+            task_status.to_str().encode("utf-8"), status_path_config,
+            content_type="application/json",
+            priority=voxu.TransferPriority.CONTROL)
         logger.info("Task status written to cloud storage")
 
         if task_status.state == TaskState.FAILED:
@@ -470,21 +1432,50 @@ def make_publish_callback(job_id, status_path_config):
     return _publish_status
 
 
-def download_inputs(inputs_dir, task_config, task_status):
+def download_inputs(
+        inputs_dir, task_config, task_status, existing_paths=None,
+        archive_inputs=None):
     '''Downloads the task inputs to the specified directory.
 
+    Inputs listed in ``archive_inputs`` are never written to disk as archives.
+    Tar archives, optionally gzip- or zstd-compressed, are extracted from the
+    HTTP stream as it arrives, and the members of zip archives are fetched in
+    parallel via range requests. See ``voxel51.utils.download_archive()`` for
+    details.
+
     Args:
         inputs_dir (str): the directory to which to download the inputs
         task_config (TaskConfig): the TaskConfig for the task
         task_status (TaskStatus): the TaskStatus for the task
+        existing_paths (dict, optional): a dictionary mapping input names to
+            the paths to which they were downloaded by a previous run of the
+            task. Inputs that are still present in ``inputs_dir`` and whose
+            digests match those recorded in the TaskStatus are not downloaded
+            again
+        archive_inputs (list, optional): the names of the inputs that are
+            tar, tar.gz, tar.zst or zip archives. These inputs are extracted
+            as they are downloaded into a subdirectory of ``inputs_dir`` named
+            after the input
 
     Returns:
-        a dictionary mapping input names to their downloaded filepaths
+        a dictionary mapping input names to their downloaded filepaths. The
+            paths of archive inputs are the directories to which they were
+            extracted
     '''
+    archive_inputs = set(archive_inputs or [])
     input_paths = {}
     for name, path_config in iteritems(task_config.inputs):
-        local_path = voxu.download(path_config, inputs_dir)
-        input_paths[name] = local_path
+        path = _get_existing_input(
+            name, inputs_dir, existing_paths, task_status)
+        if path is not None:
+            input_paths[name] = path
+            logger.info("Input '%s' was already downloaded", name)
+            continue
+
+        result = _fetch_input(
+            name, path_config, inputs_dir, name in archive_inputs)
+        task_status.record_input_digests(name, result.digests)
+        input_paths[name] = result.path
         logger.info("Input '%s' downloaded", name)
         task_status.add_message("Input '%s' downloaded" % name)
 
@@ -520,6 +1511,148 @@ def parse_parameters(data_params_dir, task_config, task_status):
     return parameters
 
 
+def bootstrap_task(
+        inputs_dir, task_config, task_status, data_params_dir=None,
+        video_inputs=None, post_metadata=False, max_workers=None,
+        existing_paths=None, archive_inputs=None, time_budget=None):
+    '''Starts the task and prepares everything that the analytic needs to
+    begin inference.
+
+    Publishing the RUNNING status, downloading each input and data parameter,
+    and probing the metadata of each video input run concurrently. The
+    TaskStatus is only updated once all operations have finished, so that the
+    status being published is never modified concurrently.
+
+    Args:
+        inputs_dir (str): the directory to which to download the inputs
+        task_config (TaskConfig): the TaskConfig for the task
+        task_status (TaskStatus): the TaskStatus for the task
+        data_params_dir (str, optional): the directory to which to download
+            data parameters, if any
+        video_inputs (list, optional): the names of the video inputs whose
+            metadata should be probed and recorded. By default, no metadata is
+            probed
+        post_metadata (bool, optional): whether to also post the job metadata,
+            which requires exactly one video input. By default, this is False
+        max_workers (int, optional): the maximum number of concurrent
+            operations. By default,
+            ``voxel51.config.DEFAULT_MAX_BOOTSTRAP_WORKERS`` is used
+        existing_paths (dict, optional): a dictionary mapping input names to
+            the paths to which they were downloaded by a previous run of the
+            task, which are reused as in ``download_inputs()``
+        archive_inputs (list, optional): the names of the inputs that are
+            archives to extract as they are downloaded, as in
+            ``download_inputs()``
+        time_budget (float, optional): a time budget, in seconds, for the task.
+            By default, the budget is read via ``get_task_time_budget()``
+
+    Returns:
+        a BootstrapResult
+
+    Raises:
+        ValueError: if ``post_metadata`` is True but there is not exactly one
+            video input
+    '''
+    from multiprocessing.pool import ThreadPool
+
+    video_inputs = set(video_inputs or [])
+    archive_inputs = set(archive_inputs or [])
+    if post_metadata and len(video_inputs) != 1:
+        raise ValueError(
+            "Posting job metadata requires exactly one video input; found "
+            "%d" % len(video_inputs))
+
+    if max_workers is None:
+        max_workers = voxc.DEFAULT_MAX_BOOTSTRAP_WORKERS
+
+    start_time = time.time()
+    _set_task_time_budget(time_budget)
+    voxp.maybe_start_profiler()
+    logger.info("Task started")
+    task_status.start()
+
+    def _timed(func, *args):
+        op_start = time.time()
+        return func(*args), time.time() - op_start
+
+    def _download_input(name, path_config):
+        path = _get_existing_input(
+            name, inputs_dir, existing_paths, task_status)
+        digests = None
+        if path is None:
+            result = _fetch_input(
+                name, path_config, inputs_dir, name in archive_inputs)
+            path, digests = result.path, result.digests
+
+        metadata = None
+        if name in video_inputs:
+            metadata = voxu.get_metadata_for_video(path)
+            if post_metadata:
+                _get_api_client().post_job_metadata(
+                    task_config.job_id, _make_job_metadata(metadata))
+        return path, digests, metadata
+
+    data_params = {}
+    parameters = {}
+    for name, val in iteritems(task_config.parameters):
+        if voxu.RemotePathConfig.is_path_config_dict(val):
+            data_params[name] = voxu.RemotePathConfig(val)
+        else:
+            logger.info("Found value '%s' for parameter '%s'", val, name)
+            parameters[name] = val
+
+    num_ops = 1 + len(task_config.inputs) + len(data_params)
+    pool = ThreadPool(max(1, min(max_workers, num_ops)))
+    try:
+        publish = pool.apply_async(_timed, (task_status.publish,))
+        inputs = {
+            name: pool.apply_async(_timed, (_download_input, name, pc))
+            for name, pc in iteritems(task_config.inputs)}
+        params = {
+            name: pool.apply_async(
+                _timed, (voxu.download, pc, data_params_dir))
+            for name, pc in iteritems(data_params)}
+    finally:
+        # Wait for every operation, so that none is still running if one of
+        # them failed
+        pool.close()
+        pool.join()
+
+    timings = {}
+    _, timings["publish"] = publish.get()
+
+    input_paths = {}
+    metadata = {}
+    for name, async_result in iteritems(inputs):
+        (path, digests, vm), timings["input:" + name] = async_result.get()
+        input_paths[name] = path
+        if digests is None:
+            logger.info("Input '%s' was already downloaded", name)
+        else:
+            task_status.record_input_digests(name, digests)
+            logger.info("Input '%s' downloaded", name)
+            task_status.add_message("Input '%s' downloaded" % name)
+        if vm is not None:
+            task_status.record_input_metadata(name, vm.serialize())
+            metadata[name] = vm
+
+    for name, async_result in iteritems(params):
+        parameters[name], timings["parameter:" + name] = async_result.get()
+        logger.info("Parameter '%s' downloaded", name)
+        task_status.add_message("Parameter '%s' downloaded" % name)
+
+    if post_metadata:
+        task_status.add_message("Job metadata posted")
+
+    time_to_first_inference = time.time() - start_time
+    logger.info(
+        "Task ready for inference after %.3fs", time_to_first_inference)
+    task_status.add_message(
+        "Task ready for inference after %.3fs" % time_to_first_inference)
+    return BootstrapResult(
+        input_paths, parameters, metadata, timings, time_to_first_inference)
+
+
 def post_job_metadata_for_video(video_path, task_config, task_status):
     '''Posts the job metadata for the task, which must have the given video
     as its sole input.
@@ -530,12 +1663,7 @@ def post_job_metadata_for_video(video_path, task_config, task_status):
         task_status (TaskStatus): the TaskStatus for the task
     '''
     vm = voxu.get_metadata_for_video(video_path)
-    metadata = {
-        "frame_count": vm.total_frame_count,
-        "duration_seconds": vm.duration,
-        "size_bytes": vm.size_bytes
-    }
-    post_job_metadata(metadata, task_config, task_status)
+    post_job_metadata(_make_job_metadata(vm), task_config, task_status)
 
 
 def post_job_metadata(metadata, task_config, task_status):
@@ -566,30 +1694,400 @@ def upload_output(output_path, task_config, task_status):
     task_status.add_message("Output published")
 
 
+def upload_staged_output(staged_output, task_config, task_status):
+    '''Uploads the given staged output as the task output.
+
+    Args:
+        staged_output (voxel51.utils.SpooledOutput): a staged output
+        task_config (TaskConfig): the TaskConfig for the task
+        task_status (TaskStatus): the TaskStatus for the task
+    '''
+    voxu.upload_file_obj(
+        staged_output.open_for_reading(), task_config.output,
+        content_type=staged_output.content_type)
+    logger.info("Output uploaded to %s", task_config.output)
+    task_status.add_message("Output published")
+
+
+def upload_staged_output_as_data(
+        output_name, staged_output, task_config, task_status):
+    '''Uploads the given staged output as data on behalf of the user.
+
+    Args:
+        output_name (str): the name of the task output that you are posting
+        staged_output (voxel51.utils.SpooledOutput): a staged output
+        task_config (TaskConfig): the TaskConfig for the task
+        task_status (TaskStatus): the TaskStatus for the task
+    '''
+    api_client = _get_api_client()
+    index = _get_data_dedup_index(task_config)
+
+    # The file belongs to the staged output, which is closed by its owner
+    f = staged_output.open_for_reading()
+    digest = None
+    if index is not None:
+        digest = voxu.compute_chunk_digests(
+            voxu.read_file_obj_chunks(f),
+            [voxu.DigestAlgorithm.SHA256])[voxu.DigestAlgorithm.SHA256]
+        f.seek(0)
+
+    data_id, metadata = _post_data(
+        output_name, index, digest,
+        partial(
+            api_client.upload_job_output_file_as_data, task_config.job_id, f,
+            staged_output.filename))
+    task_status.record_posted_data(output_name, data_id, metadata=metadata)
+    task_status.add_message("Output '%s' published as data" % output_name)
+
+
+def open_output(task_config, content_type=None):
+    '''Opens a writable stream that uploads the task output in the background
+    as it is written.
+
+    Args:
+        task_config (TaskConfig): the TaskConfig for the task
+        content_type (str, optional): the MIME type of the output, which is
+            used to decide whether to compress it
+
+    Returns:
+        a ``voxel51.utils.UploadWriter``
+    '''
+    logger.info("Streaming output to %s", task_config.output)
+    return voxu.UploadWriter(task_config.output, content_type=content_type)
+
+
+def close_output(writer, task_config, task_status):
+    '''Closes the given output stream, waiting for the upload to complete.
+
+    Args:
+        writer: a ``voxel51.utils.UploadWriter`` opened via ``open_output``,
+            or a writer such as ``voxel51.utils.FrameLabelsWriter`` that wraps
+            one
+        task_config (TaskConfig): the TaskConfig for the task
+        task_status (TaskStatus): the TaskStatus for the task
+    '''
+    writer.close()
+    logger.info("Streamed output uploaded to %s", task_config.output)
+    task_status.add_message("Output published")
+
+
+def upload_output_bundle(
+        output_paths, task_config, task_status, compress=False):
+    '''Uploads the given files as a single tar archive task output.
+
+    The archive is streamed directly from the files as it is uploaded, so no
+    temporary archive is written to disk.
+
+    Args:
+        output_paths (dict or list): a dictionary mapping archive names to
+            local paths, or a list of local paths, which are archived by their
+            basenames
+        task_config (TaskConfig): the TaskConfig for the task
+        task_status (TaskStatus): the TaskStatus for the task
+        compress (bool, optional): whether to gzip-compress the archive. By
+            default, this is False
+
+    Returns:
+        the list of index entries of the archive members
+    '''
+    bundle = voxu.TarBundle(output_paths, compress=compress)
+    voxu.upload_stream(
+        bundle.iter_chunks(), task_config.output,
+        content_type=bundle.content_type)
+    task_status.record_output_index(bundle.index_entry)
+    logger.info(
+        "Output bundle with %d file(s) uploaded to %s", len(bundle.index),
+        task_config.output)
+    task_status.add_message("Output published")
+    return bundle.index
+
+
 def upload_output_as_data(output_name, output_path, task_config, task_status):
     '''Uploads the given output as data on behalf of the user.
 
+    Outputs that were already posted, according to the ``posted_data`` of the
+    TaskStatus, are not posted again. If data deduplication is enabled, see
+    ``enable_data_dedup()``, byte-identical outputs that were previously
+    posted are not uploaded again either.
+
     Args:
         output_name (str): the name of the task output that you are posting
         output_path (str): the path to the output file to post as data
         task_config (TaskConfig): the TaskConfig for the task
         task_status (TaskStatus): the TaskStatus for the task
     '''
-    data_id = _get_api_client().upload_job_output_as_data(
-        task_config.job_id, output_path)
-    task_status.record_posted_data(output_name, data_id)
-    logger.info("Output '%s' published as data", output_name)
+    if output_name in task_status.posted_data:
+        logger.info("Output '%s' was already published as data", output_name)
+        return
+
+    data_id, metadata = _post_output_as_data(
+        output_name, output_path, task_config, _get_api_client())
+    task_status.record_posted_data(output_name, data_id, metadata=metadata)
     task_status.add_message("Output '%s' published as data" % output_name)
 
 
-def complete_task(task_config, task_status, logfile_path=None):
-    '''Marks the task as complete and publishes the TaskStatus to the platform.
+def upload_outputs_as_data(
+        output_paths, task_config, task_status, max_workers=None):
+    '''Concurrently uploads the given outputs as data on behalf of the user.
+
+    The uploads share the connection pool of the API client. A failed upload
+    does not stop the rest of the batch; the posted data of the successful
+    uploads are recorded together in the TaskStatus once the batch finishes.
+    Outputs that were already posted, according to the ``posted_data`` of the
+    TaskStatus, are not posted again.
+
+    Args:
+        output_paths (dict): a dictionary mapping output names to the local
+            paths of the output files to upload
+        task_config (TaskConfig): the TaskConfig for the task
+        task_status (TaskStatus): the TaskStatus for the task
+        max_workers (int, optional): the maximum number of concurrent uploads.
+            By default, ``voxel51.config.DEFAULT_MAX_UPLOAD_WORKERS`` is used
+
+    Returns:
+        a dictionary mapping output names to the IDs of the posted data
+
+    Raises:
+        PostDataError: if any of the outputs failed to upload
+    '''
+    from multiprocessing.pool import ThreadPool
+
+    posted_data = {
+        name: task_status.posted_data[name] for name in output_paths
+        if name in task_status.posted_data}
+    output_paths = {
+        name: path for name, path in iteritems(output_paths)
+        if name not in posted_data}
+    if posted_data:
+        logger.info(
+            "%d output(s) were already published as data", len(posted_data))
+    if not output_paths:
+        return posted_data
+
+    if max_workers is None:
+        max_workers = voxc.DEFAULT_MAX_UPLOAD_WORKERS
+
+    api_client = _get_api_client()
+
+    def _upload(item):
+        name, path = item
+        try:
+            data_id, metadata = _post_output_as_data(
+                name, path, task_config, api_client)
+            return name, data_id, metadata, None
+        except Exception as e:
+            return name, None, None, e
+
+    pool = ThreadPool(min(max_workers, len(output_paths)))
+    try:
+        results = pool.map(_upload, list(iteritems(output_paths)))
+    finally:
+        pool.close()
+        pool.join()
+
+    data_ids = {}
+    errors = {}
+    for name, data_id, metadata, error in results:
+        if error is not None:
+            logger.error(
+                "Failed to publish output '%s' as data: %s", name, error)
+            errors[name] = error
+        else:
+            data_ids[name] = data_id
+            task_status.record_posted_data(name, data_id, metadata=metadata)
+    logger.info("%d output(s) published as data", len(data_ids))
+    task_status.add_message("%d output(s) published as data" % len(data_ids))
+
+    data_ids.update(posted_data)
+    if errors:
+        raise PostDataError(errors, data_ids)
+
+    return data_ids
+
+
+def enable_data_dedup(index_path, task_config, scope=None):
+    '''Enables the deduplication of outputs posted as data.
+
+    When enabled, the SHA-256 digest of each output is computed before it is
+    posted, and, if data with the same digest were already posted within the
+    same scope, according to the local index, the upload is skipped and the
+    previous data ID is reused. Deduplication is also enabled automatically
+    if the ``voxel51.config.DATA_DEDUP_INDEX_ENV_VAR`` environment variable is
+    set.
+
+    The digests of posted outputs and whether they were deduplicated are
+    recorded in the ``posted_data_metadata`` of the TaskStatus.
+
+    Args:
+        index_path (str): the path to the local index of posted data
+        task_config (TaskConfig): the TaskConfig for the task
+        scope (DataDedupScope, optional): the scope within which posted data
+            are reused. By default, the scope is read from the
+            ``voxel51.config.DATA_DEDUP_SCOPE_ENV_VAR`` environment variable,
+            if set, or ``voxel51.config.DEFAULT_DATA_DEDUP_SCOPE`` is used
+
+    Returns:
+        the DataDedupIndex for the task
+    '''
+    global _DATA_DEDUP_SETTINGS
+
+    if scope is None:
+        scope = os.environ.get(
+            voxc.DATA_DEDUP_SCOPE_ENV_VAR, voxc.DEFAULT_DATA_DEDUP_SCOPE)
+
+    index = _make_data_dedup_index(index_path, task_config, scope)
+    _DATA_DEDUP_SETTINGS = (index_path, scope)
+    logger.info("Data deduplication enabled (scope = %s)", scope)
+    return index
+
+
+def upload_checkpoint(
+        checkpoint, task_config, priority=voxu.TransferPriority.BULK):
+    '''Uploads the given checkpoint, along with its files, to the checkpoint
+    location of the task.
+
+    The checkpoint is streamed as a tar archive containing a
+    ``voxel51.config.CHECKPOINT_MANIFEST_NAME`` manifest and the checkpointed
+    files, and it replaces any previous checkpoint of the task.
+
+    Args:
+        checkpoint (Checkpoint): the Checkpoint
+        task_config (TaskConfig): the TaskConfig for the task
+        priority (TransferPriority, optional): the priority of the upload. By
+            default, this is ``TransferPriority.BULK``
+
+    Raises:
+        ValueError: if the task does not support checkpointing or a file name
+            is invalid
+    '''
+    if task_config.checkpoint is None:
+        raise ValueError("The task does not support checkpointing")
+
+    members = {}
+    for name, path in iteritems(checkpoint.files):
+        if not name or name in (".", "..") or os.path.basename(name) != name:
+            raise ValueError("Invalid checkpoint file name '%s'" % name)
+        members[_CHECKPOINT_FILES_DIR + "/" + name] = path
+
+    tmp_dir = tempfile.mkdtemp(prefix="voxel51-checkpoint-")
+    try:
+        manifest_path = os.path.join(tmp_dir, voxc.CHECKPOINT_MANIFEST_NAME)
+        checkpoint.write_json(manifest_path)
+        members[voxc.CHECKPOINT_MANIFEST_NAME] = manifest_path
+        bundle = voxu.TarBundle(members)
+        voxu.upload_stream(
+            bundle.iter_chunks(), task_config.checkpoint.upload,
+            content_encoding=voxu.ContentEncoding.IDENTITY,
+            priority=priority)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    logger.info(
+        "Checkpoint %d with %d file(s) uploaded to %s", checkpoint.sequence,
+        len(checkpoint.files), task_config.checkpoint.upload)
+
+
+def download_checkpoint(checkpoint_dir, task_config):
+    '''Downloads the checkpoint of the task, if one exists, and extracts its
+    files to the given directory.
+
+    Args:
+        checkpoint_dir (str): the directory to which to extract the files of
+            the checkpoint
+        task_config (TaskConfig): the TaskConfig for the task
+
+    Returns:
+        the Checkpoint, whose ``files`` map to the extracted files, or None if
+            the task has no checkpoint
+    '''
+    import requests
+
+    if task_config.checkpoint is None:
+        return None
+
+    local_path = task_config.checkpoint.download.local_path
+    if local_path is not None and not os.path.isfile(local_path):
+        logger.info("No checkpoint found for the task")
+        return None
+
+    tmp_dir = tempfile.mkdtemp(prefix="voxel51-checkpoint-")
+    try:
+        try:
+            result = voxu.download_file(
+                task_config.checkpoint.download, tmp_dir)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                logger.info("No checkpoint found for the task")
+                return None
+            raise
+
+        checkpoint, files = _extract_checkpoint(result.path, checkpoint_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if checkpoint is None:
+        logger.warning("Ignoring checkpoint without a manifest")
+        return None
+
+    if checkpoint.job_id != task_config.job_id:
+        logger.warning(
+            "Ignoring checkpoint of job '%s'", checkpoint.job_id)
+        return None
+
+    checkpoint.files = files
+    logger.info(
+        "Checkpoint %d with %d file(s) downloaded", checkpoint.sequence,
+        len(files))
+    return checkpoint
+
+
+def complete_task(
+        task_config, task_status, logfile_path=None, output_path=None,
+        data_output_paths=None, output_writer=None):
+    '''Uploads the final artifacts of the task concurrently and, once all of
+    them have succeeded, marks the task as complete and publishes the
+    TaskStatus to the platform.
+
+    The logfile is uploaded last, so that it records the outcome of the other
+    uploads and the completion of the task.
 
     Args:
         task_config (TaskConfig): the TaskConfig for the task
         task_status (TaskStatus): the TaskStatus for the task
         logfile_path (str, optional): the path to a logfile to upload
+        output_path (str, optional): the path to an output file to upload as
+            the task output
+        data_output_paths (dict, optional): a dictionary mapping output names
+            to the paths of output files to post as data
+        output_writer (optional): an output stream opened via ``open_output``
+            to close
+
+    Raises:
+        ValueError: if both ``output_path`` and ``output_writer`` are provided
+        FinalizeError: if any artifact failed to upload, in which case the task
+            is not marked as complete
     '''
+    if output_path and output_writer is not None:
+        raise ValueError(
+            "The task output was streamed, so an output path cannot also be "
+            "uploaded")
+
+    operations = OrderedDict()
+    if output_writer is not None:
+        operations["output"] = partial(
+            close_output, output_writer, task_config, task_status)
+    if output_path:
+        operations["output"] = partial(
+            upload_output, output_path, task_config, task_status)
+    for name, path in iteritems(data_output_paths or {}):
+        operations["data:" + name] = partial(
+            upload_output_as_data, name, path, task_config, task_status)
+
+    logger.info("Finalizing task")
+    errors, _ = _run_concurrently(operations)
+    if errors:
+        raise FinalizeError(errors)
+
     logger.info("Task complete")
     task_status.complete()
     task_status.publish()
@@ -597,26 +2095,111 @@ def complete_task(task_config, task_status, logfile_path=None):
         upload_logfile(logfile_path, task_config)
 
 
+def start_log_shipping(logfile_path, task_config, interval=None):
+    '''Starts shipping the new contents of the given logfile to the platform
+    in the background.
+
+    Log shipping requires the TaskConfig to provide at least two
+    ``log_chunks`` locations. Once started, ``upload_logfile`` only needs to
+    ship the tail of the logfile.
+
+    Args:
+        logfile_path (str): the path to the logfile of the task
+        task_config (TaskConfig): the TaskConfig for the task
+        interval (float, optional): the shipping interval, in seconds. By
+            default, ``voxel51.config.DEFAULT_LOG_SHIPPING_INTERVAL`` is used
+
+    Returns:
+        the LogShipper, or None if the task does not support log shipping
+    '''
+    global _LOG_SHIPPER
+    if len(task_config.log_chunks) < 2:
+        logger.info("Log shipping is not available for this task")
+        return None
+
+    if interval is None:
+        interval = voxc.DEFAULT_LOG_SHIPPING_INTERVAL
+
+    if _LOG_SHIPPER is not None:
+        _LOG_SHIPPER.stop()
+
+    _LOG_SHIPPER = LogShipper(
+        logfile_path, task_config.log_chunks, interval=interval)
+    _LOG_SHIPPER.start()
+    logger.info("Log shipping started (interval = %gs)", interval)
+    return _LOG_SHIPPER
+
+
 def upload_logfile(logfile_path, task_config):
     '''Uploads the given logfile for the task.
 
+    If log shipping is active for the logfile, only its tail is shipped. The
+    full logfile is uploaded if shipping was not active or could not ship the
+    entire logfile.
+
+    The profile of the task, if any, is uploaded afterwards via
+    ``upload_profile()``. Failures to write or upload the profile are logged
+    but never raised, so that they cannot affect the artifacts of the task.
+
     Args:
         logfile_path (str): the path to a logfile to upload
         task_config (TaskConfig): the TaskConfig for the task
     '''
-    logger.info("Uploading logfile to %s", str(task_config.logfile))
-    voxu.upload(logfile_path, task_config.logfile)
+    if not _flush_log_shipper(logfile_path):
+        logger.info("Uploading logfile to %s", str(task_config.logfile))
+        voxu.upload(
+            logfile_path, task_config.logfile, content_type="text/plain")
+
+    try:
+        upload_profile(logfile_path, task_config)
+    except Exception:
+        logger.warning("Failed to upload profile", exc_info=True)
+
 
+def upload_profile(logfile_path, task_config):
+    '''Stops the sampling profiler, if it is running, writes its collapsed
+    stacks next to the given logfile, and uploads them for the task.
 
-def fail_gracefully(failure_type, task_config, task_status, logfile_path=None):
+    The profile is only uploaded if the TaskConfig provides a ``profile``
+    location; otherwise it is only written locally.
+
+    Args:
+        logfile_path (str): the path to the logfile of the task
+        task_config (TaskConfig): the TaskConfig for the task
+    '''
+    profiler = voxp.stop_profiler()
+    if profiler is None:
+        return
+
+    profile_path = voxp.get_profile_path(logfile_path)
+    profiler.write_collapsed(profile_path)
+    logger.info("Profile written to %s", profile_path)
+    if task_config.profile is not None:
+        logger.info("Uploading profile to %s", str(task_config.profile))
+        voxu.upload(
+            profile_path, task_config.profile,
+            priority=voxu.TransferPriority.BACKGROUND)
+
+
+def fail_gracefully(
+        failure_type, task_config, task_status, logfile_path=None,
+        output_writer=None, timeout=None):
     '''Marks the task as failed and gracefully winds up by posting any
     available information (status, logfile, etc.).
 
+    The status, logfile and any streamed output are posted concurrently, and
+    this function returns after at most ``timeout`` seconds, abandoning any
+    posts that have not finished by then.
+
     Args:
         failure_type (TaskFailureType): the failure reason
         task_config (TaskConfig): the TaskConfig for the task
         task_status (TaskStatus): the TaskStatus for the task
         logfile_path (str, optional): the path to a logfile to upload
+        output_writer (optional): an output stream opened via ``open_output``
+            to close
+        timeout (float, optional): the time budget, in seconds. By default,
+            ``voxel51.config.DEFAULT_FAILURE_TIMEOUT`` is used
     '''
     # Log the stack trace and mark the task as failed
     exc_info = sys.exc_info()
@@ -624,18 +2207,35 @@ def fail_gracefully(failure_type, task_config, task_status, logfile_path=None):
     logger.error("Uncaught exception", exc_info=exc_info)
     task_status.fail(failure_type)
 
-    try:
-        # Try to publish the task status
-        task_status.publish()
-    except:
-        logger.error("Failed to publish job status")
+    if timeout is None:
+        timeout = voxc.DEFAULT_FAILURE_TIMEOUT
 
+    operations = OrderedDict()
+    operations["status"] = task_status.publish
+    if logfile_path:
+        operations["logfile"] = partial(
+            upload_logfile, logfile_path, task_config)
+    if output_writer is not None:
+        operations["output"] = output_writer.close
+
+    # The failure may be due to the exhausted time budget of the task, which
+    # must not prevent the failure from being reported
+    deadline = voxu.get_task_deadline()
+    voxu.set_task_deadline(voxu.Deadline(timeout))
     try:
-        # Try to upload the logfile, if any
-        if logfile_path:
-            upload_logfile(logfile_path, task_config)
-    except:
-        logger.error("Failed to upload logfile")
+        errors, pending = _run_concurrently(operations, timeout=timeout)
+    finally:
+        voxu.set_task_deadline(deadline)
+    failure_messages = {
+        "status": "Failed to publish job status",
+        "logfile": "Failed to upload logfile",
+        "output": "Failed to upload streamed output",
+    }
+    for name in operations:
+        if name in errors:
+            logger.error(failure_messages[name])
+        elif name in pending:
+            logger.error("%s within %gs", failure_messages[name], timeout)
 
 
 def fail_epically(task_config_url):
@@ -677,8 +2277,199 @@ def fail_epically(task_config_url):
         logger.error("Unable to communicate with API")
 
 
+def _run_concurrently(operations, timeout=None):
+    # Runs the operations in daemon threads, so that operations that are still
+    # pending after the timeout do not prevent the process from exiting
+    errors = {}
+    errors_lock = threading.Lock()
+
+    def _run(name, func):
+        try:
+            func()
+        except Exception as e:
+            logger.warning("Operation '%s' failed", name, exc_info=True)
+            with errors_lock:
+                errors[name] = e
+
+    threads = []
+    for name, func in iteritems(operations):
+        thread = threading.Thread(
+            target=_run, args=(name, func), name="voxel51-" + name)
+        thread.daemon = True
+        thread.start()
+        threads.append((name, thread))
+
+    deadline = time.time() + timeout if timeout is not None else None
+    for _, thread in threads:
+        if deadline is None:
+            thread.join()
+        else:
+            thread.join(max(0, deadline - time.time()))
+
+    # Operations that fail after the timeout are reported as pending
+    with errors_lock:
+        pending = [name for name, thread in threads if thread.is_alive()]
+        return dict(errors), pending
+
+
+def _flush_log_shipper(logfile_path):
+    if _LOG_SHIPPER is None or _LOG_SHIPPER.logfile_path != logfile_path:
+        return False
+
+    logger.info("Shipping logfile tail")
+    try:
+        return _LOG_SHIPPER.stop()
+    except Exception:
+        logger.warning("Failed to ship logfile tail", exc_info=True)
+        return False
+
+
+def _fetch_input(name, path_config, inputs_dir, is_archive):
+    if is_archive:
+        return voxu.download_archive(
+            path_config, os.path.join(inputs_dir, name))
+
+    return voxu.download_file(path_config, inputs_dir)
+
+
+def _get_existing_input(name, inputs_dir, existing_paths, task_status):
+    path = (existing_paths or {}).get(name)
+    if not path or not os.path.isfile(path):
+        return None
+
+    if os.path.dirname(os.path.abspath(path)) != os.path.abspath(inputs_dir):
+        return None
+
+    digests = task_status.input_digests.get(name)
+    if not digests or voxu.compute_digests(path, list(digests)) != digests:
+        return None
+
+    return path
+
+
+def _extract_checkpoint(archive_path, checkpoint_dir):
+    if not os.path.isdir(checkpoint_dir):
+        os.makedirs(checkpoint_dir)
+
+    checkpoint = None
+    files = {}
+    prefix = _CHECKPOINT_FILES_DIR + "/"
+    with tarfile.open(archive_path) as tf:
+        for member in tf:
+            if not member.isfile():
+                continue
+
+            if member.name == voxc.CHECKPOINT_MANIFEST_NAME:
+                checkpoint = Checkpoint.from_dict(
+                    json.loads(tf.extractfile(member).read().decode("utf-8")))
+                continue
+
+            name = member.name[len(prefix):]
+            if (not member.name.startswith(prefix) or
+                    name in ("", ".", "..") or
+                    os.path.basename(name) != name):
+                continue
+
+            local_path = os.path.join(checkpoint_dir, name)
+            with open(local_path, "wb") as f:
+                shutil.copyfileobj(tf.extractfile(member), f)
+            files[name] = local_path
+
+    return checkpoint, files
+
+
+def _set_task_time_budget(time_budget):
+    # The deadline of a previous task run in the same process is replaced
+    if time_budget is None:
+        time_budget = get_task_time_budget()
+
+    if time_budget is None:
+        voxu.set_task_deadline(None)
+        return
+
+    logger.info("Task time budget is %gs", time_budget)
+    voxu.set_task_deadline(voxu.Deadline(time_budget))
+
+
+def _get_data_dedup_index(task_config):
+    if _DATA_DEDUP_SETTINGS is None:
+        index_path = os.environ.get(voxc.DATA_DEDUP_INDEX_ENV_VAR)
+        if not index_path:
+            return None
+
+        return enable_data_dedup(index_path, task_config)
+
+    index_path, scope = _DATA_DEDUP_SETTINGS
+    return _make_data_dedup_index(index_path, task_config, scope)
+
+
+def _make_data_dedup_index(index_path, task_config, scope):
+    if scope == DataDedupScope.JOB:
+        scope_key = "job:" + task_config.job_id
+    elif scope == DataDedupScope.USER:
+        # The token identifies the user, but it must not be stored
+        token = os.environ.get(voxc.API_TOKEN_ENV_VAR, "")
+        scope_key = "user:" + hashlib.sha256(
+            token.encode("utf-8")).hexdigest()
+    else:
+        raise ValueError("Unsupported data dedup scope '%s'" % scope)
+
+    # Indexes are cached per scope, so that the tasks of different jobs run
+    # in the same process never share entries of the job scope
+    with _DATA_DEDUP_LOCK:
+        key = (index_path, scope_key)
+        if key not in _DATA_DEDUP_INDEXES:
+            _DATA_DEDUP_INDEXES[key] = DataDedupIndex(index_path, scope_key)
+
+        return _DATA_DEDUP_INDEXES[key]
+
+
+def _post_output_as_data(output_name, output_path, task_config, api_client):
+    index = _get_data_dedup_index(task_config)
+    digest = None
+    if index is not None:
+        digest = voxu.compute_digests(
+            output_path, [voxu.DigestAlgorithm.SHA256])[
+                voxu.DigestAlgorithm.SHA256]
+
+    return _post_data(
+        output_name, index, digest,
+        partial(
+            api_client.upload_job_output_as_data, task_config.job_id,
+            output_path))
+
+
+def _post_data(output_name, index, digest, upload):
+    if index is None:
+        data_id = upload()
+        logger.info("Output '%s' published as data", output_name)
+        return data_id, None
+
+    data_id = index.get(digest)
+    if data_id is not None:
+        logger.info(
+            "Output '%s' matches previously posted data '%s'; skipping "
+            "upload", output_name, data_id)
+        return data_id, {"sha256": digest, "deduplicated": True}
+
+    data_id = upload()
+    index.add(digest, data_id)
+    logger.info("Output '%s' published as data", output_name)
+    return data_id, {"sha256": digest, "deduplicated": False}
+
+
+def _make_job_metadata(vm):
+    return {
+        "frame_count": vm.total_frame_count,
+        "duration_seconds": vm.duration,
+        "size_bytes": vm.size_bytes
+    }
+
+
 def _get_api_client():
     global _API_CLIENT
     if _API_CLIENT is None:
-        _API_CLIENT = voxa.make_api_client()
+        with _API_CLIENT_LOCK:
+            if _API_CLIENT is None:
+                _API_CLIENT = voxa.make_api_client()
     return _API_CLIENT
@@ -14,29 +14,90 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 from builtins import *
+from future.utils import text_type
 # pragma pylint: enable=redefined-builtin
 # pragma pylint: enable=unused-wildcard-import
 # pragma pylint: enable=wildcard-import
 
+import base64
+import binascii
+import bz2
+from collections import deque
+import contextlib
+from functools import partial
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import mmap
 import os
+import random
+import re
+import shutil
+import socket
+import struct
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+
+try:
+    import queue  # Python 3
+except ImportError:
+    import Queue as queue  # Python 2
 
 try:
     import urllib.parse as urlparse  # Python 3
 except ImportError:
     import urlparse  # Python 2
 
+try:
+    from urllib.parse import quote as urlquote  # Python 3
+except ImportError:
+    from urllib import quote as urlquote  # Python 2
+
 from eta.core.config import Config
-import eta.core.storage as etas
-import eta.core.video as etav
 
 import voxel51.config as voxc
 
 
-_HTTP_CLIENT = None
+_HTTP_SESSION = None
+_HTTP_SESSION_POOL = None
+_HTTP_SESSION_LOCK = threading.Lock()
+_TRANSFER_SCHEDULER = None
+_TRANSFER_SCHEDULER_LOCK = threading.Lock()
+_CONCURRENCY_CONTROLLERS = {}
+_CONCURRENCY_CONTROLLERS_LOCK = threading.Lock()
+_LATENCY_TRACKERS = {}
+_LATENCY_TRACKERS_LOCK = threading.Lock()
+_HEDGE_LOSERS = {}
+_HEDGE_LOSERS_LOCK = threading.Lock()
+_TASK_DEADLINE = None
+_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+_THROTTLING_STATUS_CODES = (429, 503)
+_CHUNK_SIZE = 1024 * 1024
+_FILENAME_PATTERN = re.compile(r"filename=([^;]+)")
+_ABORT_UPLOAD = object()
+_FICLONE = 0x40049409  # Linux ioctl that clones a file copy-on-write
+_ARCHIVE_MAGIC_SIZE = 262
+_ZIP_LOCAL_HEADER_FORMAT = "<4s5H3L2H"
+_ZIP_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+logger = logging.getLogger(__name__)
 
 
 class RemotePathConfig(Config):
-    '''Class that describes the location of a remote file.'''
+    '''Class that describes the location of a remote file.
+
+    The ``signed-url`` of the file may also be a ``file://`` URL, in which
+    case the file is transferred via the filesystem rather than HTTP. Plain
+    local paths are accepted only when opted into; see ``get_local_path`` for
+    details.
+    '''
 
     def __init__(self, d):
         self.signed_url = self.parse_string(d, "signed-url")
@@ -44,6 +105,13 @@ class RemotePathConfig(Config):
     def __str__(self):
         return self.signed_url
 
+    @property
+    def local_path(self):
+        '''The path of the file on the local filesystem, or None if the file
+        is remote.
+        '''
+        return get_local_path(self.signed_url)
+
     @staticmethod
     def is_path_config_dict(d):
         '''Determines whether ``d`` is a valid RemotePathConfig dictionary.'''
@@ -65,113 +133,3375 @@ class RemotePathConfig(Config):
         '''
         return cls({"signed-url": signed_url})
 
+    @classmethod
+    def from_local_path(cls, path):
+        '''Constructs a RemotePathConfig for the given local path, which is
+        referred to by a ``file://`` URL so that it is recognized as local
+        regardless of whether plain local paths are allowed.
 
-def is_macos():
-    '''Determines whether the current platform is Mac.
+        Args:
+            path (str): a local path
 
-    Returns:
-        True/False if the current operating system is macOS
+        Returns:
+            a RemotePathConfig instance describing the given path
+        '''
+        return cls({"signed-url": "file://" + urlquote(os.path.abspath(path))})
+
+
+class ContentEncoding(object):
+    '''Enum describing the supported content encodings of uploads.'''
+
+    IDENTITY = "identity"
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+
+class ArchiveFormat(object):
+    '''Enum describing the archive formats that can be extracted on the fly
+    as they are downloaded.'''
+
+    TAR = "tar"
+    TAR_GZ = "tar.gz"
+    TAR_ZSTD = "tar.zst"
+    ZIP = "zip"
+
+
+class SessionPool(object):
+    '''Class that maintains one HTTP session per local source address and
+    hands them out round-robin, so that parallel transfers are striped across
+    network interfaces.
+
+    Attributes:
+        source_addresses (list): the local IP addresses of the sessions
     '''
-    return os.environ.get(voxc.OS_ENV_VAR, "").lower() == "darwin"
 
+    def __init__(self, source_addresses):
+        '''Creates a SessionPool instance.
 
-def handle_macos_localhost(url):
-    '''Converts ``localhost`` to ``docker.for.mac.localhost`` in the given URL,
-    if necessary, when running on macOS. This is required for Docker containers
-    running on macOS.
+        Args:
+            source_addresses (list): a list of local IP addresses or network
+                interface names
+        '''
+        self.source_addresses = [
+            resolve_source_address(a) for a in source_addresses]
+        self._sessions = [
+            make_session(source_address=a) for a in self.source_addresses]
+        self._lock = threading.Lock()
+        self._next = 0
 
-    Args:
-        url (str): a URL
+    @property
+    def sessions(self):
+        '''The list of sessions in the pool.'''
+        return list(self._sessions)
 
-    Returns:
-        a URL with ``localhost`` replaced with ``docker.for.mac.localhost``,
-            if necessary
+    def next_session(self):
+        '''Returns the next session in round-robin order.
+
+        Returns:
+            a ``requests.Session``
+        '''
+        with self._lock:
+            session = self._sessions[self._next]
+            self._next = (self._next + 1) % len(self._sessions)
+        return session
+
+
+class DigestAlgorithm(object):
+    '''Enum describing the digest algorithms that can be computed inline
+    during transfers.'''
+
+    MD5 = "md5"
+    SHA256 = "sha256"
+    CRC32C = "crc32c"
+
+
+class TransferResult(object):
+    '''Class describing a completed transfer.
+
+    Attributes:
+        path (str): the local path of the downloaded file, or None if the
+            transfer was not a file download
+        size (int): the number of bytes transferred
+        digests (dict): a dictionary mapping digest algorithms to the hex
+            digests of the transferred bytes
+        verified (list): the digest algorithms that were verified against
+            digests provided by the server
+        metrics (dict): a dictionary of metrics describing the transfer, such
+            as the concurrency chosen for segmented downloads
     '''
-    if not is_macos():
-        return url
 
-    chunks = list(urlparse.urlsplit(url))
-    netloc = chunks[1].split(":", 1)
-    hostname = netloc[0]
-    if hostname == "localhost" or hostname.startswith("127.0.0."):
-        netloc[0] = "docker.for.mac.localhost"
-        chunks[1] = ":".join(netloc)
-        url = urlparse.urlunsplit(chunks)
-    return url
+    def __init__(self, path, size, digests, verified, metrics=None):
+        '''Creates a TransferResult instance.
 
+        Args:
+            path (str): the local path of the downloaded file, or None
+            size (int): the number of bytes transferred
+            digests (dict): a dictionary of hex digests
+            verified (list): the list of verified digest algorithms
+            metrics (dict, optional): a dictionary of transfer metrics
+        '''
+        self.path = path
+        self.size = size
+        self.digests = digests
+        self.verified = verified
+        self.metrics = metrics or {}
 
-def get_metadata_for_video(video_path):
-    '''Gets metadata about the given video.
 
-    Args:
-        video_path (str): the path to the video
+class IntegrityError(IOError):
+    '''Exception raised when the digest of transferred bytes does not match
+    the digest provided by the server.'''
 
-    Returns:
-        a VideoMetadata instance describing the video
+    pass
+
+
+class TransferPriority(object):
+    '''Enum describing the priorities of transfers.
+
+    Control-plane transfers (status publishes, task configs, etc.) are always
+    admitted immediately and are never shaped. Bulk transfers (inputs,
+    outputs) and background transfers (log shipping) share the concurrency
+    and bandwidth caps of the TransferScheduler, with bulk transfers admitted
+    first and given a larger bandwidth share. Background transfers are
+    guaranteed a slot, and they are promoted as they wait, so they are never
+    starved.
     '''
-    return etav.VideoMetadata.build_for(video_path)
 
+    CONTROL = "CONTROL"
+    BULK = "BULK"
+    BACKGROUND = "BACKGROUND"
 
-def download(path_config, output_dir):
-    '''Downloads the specified file to the given directory.
+    _RANKS = {CONTROL: 0, BULK: 1, BACKGROUND: 2}
 
-    Args:
-        path_config (RemotePathConfig): a RemotePathConfig describing the file
-            to download
-        output_dir (str): the directory to download the file to
+    @classmethod
+    def rank(cls, priority):
+        '''Returns the rank of the given priority; lower ranks go first.'''
+        return cls._RANKS[priority]
 
-    Returns:
-        the local path to the downloaded file
+
+class TransferScheduler(object):
+    '''Class that coordinates all transfers of the SDK so that they share the
+    network according to their priorities.
+
+    Non-control transfers are admitted in priority order up to
+    ``max_transfers`` at a time. To prevent starvation, a waiting transfer is
+    promoted by one priority rank every
+    ``voxel51.config.TRANSFER_PRIORITY_AGING_INTERVAL`` seconds, and
+    ``voxel51.config.TRANSFER_RESERVED_SLOTS`` slots are kept free for
+    lower-priority transfers while they are waiting and none of them is
+    active. If ``max_bandwidth`` is set, the bandwidth is divided among the
+    active non-control transfers in proportion to the
+    ``voxel51.config.TRANSFER_PRIORITY_WEIGHTS`` of their priorities.
+
+    Attributes:
+        max_bandwidth (int): the bandwidth cap, in bytes per second, or None
+            for unlimited bandwidth
+        max_transfers (int): the maximum number of concurrent non-control
+            transfers
     '''
-    url = handle_macos_localhost(path_config.signed_url)
-    filename = etas.HTTPStorageClient.get_filename(url)
-    local_path = os.path.join(output_dir, filename)
-    _get_http_client().download(url, local_path)
-    return local_path
 
+    def __init__(self, max_bandwidth=None, max_transfers=None):
+        '''Creates a TransferScheduler instance.
 
-def download_bytes(path_config):
-    '''Downloads the specified file as bytes.
+        Args:
+            max_bandwidth (int, optional): the bandwidth cap, in bytes per
+                second. By default, bandwidth is unlimited
+            max_transfers (int, optional): the maximum number of concurrent
+                non-control transfers. By default,
+                ``voxel51.config.DEFAULT_MAX_TRANSFERS`` is used
+        '''
+        self.max_bandwidth = max_bandwidth or None
+        self.max_transfers = max_transfers or voxc.DEFAULT_MAX_TRANSFERS
+        self._cond = threading.Condition()
+        self._active = []
+        self._waiting = []
+        self._seq = 0
 
-    Args:
-        path_config (RemotePathConfig): a RemotePathConfig describing the file
-            to download
+    @classmethod
+    def from_env(cls):
+        '''Creates a TransferScheduler configured by the
+        ``voxel51.config.MAX_BANDWIDTH_ENV_VAR`` and
+        ``voxel51.config.MAX_TRANSFERS_ENV_VAR`` environment variables.
 
-    Returns:
-        the bytes of the downloaded file
+        Returns:
+            a TransferScheduler instance
+        '''
+        max_bandwidth = os.environ.get(voxc.MAX_BANDWIDTH_ENV_VAR)
+        max_transfers = os.environ.get(voxc.MAX_TRANSFERS_ENV_VAR)
+        return cls(
+            max_bandwidth=int(max_bandwidth) if max_bandwidth else None,
+            max_transfers=int(max_transfers) if max_transfers else None)
+
+    def transfer(self, priority):
+        '''Returns a context manager that admits a transfer of the given
+        priority, waiting for a slot if necessary.
+
+        Example::
+
+            with scheduler.transfer(TransferPriority.BULK) as transfer:
+                for chunk in chunks:
+                    transfer.throttle(len(chunk))
+                    send(chunk)
+
+        Args:
+            priority (TransferPriority): the priority of the transfer
+
+        Returns:
+            a context manager that yields a Transfer
+        '''
+        return Transfer(self, priority)
+
+    def iter_chunks(self, chunks, priority):
+        '''Generates the given chunks, admitting a separate transfer of the
+        given priority for each chunk.
+
+        A slot is only held from the time a chunk is emitted until the next
+        chunk is requested, i.e., while the chunk is being sent, so streams
+        whose chunks are produced slowly, e.g., by an UploadWriter, do not
+        hold a slot while they wait for their next chunk.
+
+        Args:
+            chunks (iterable): an iterable of bytes
+            priority (TransferPriority): the priority of the transfers
+
+        Returns:
+            a generator that emits the chunks
+        '''
+        for chunk in chunks:
+            with self.transfer(priority) as transfer:
+                transfer.throttle(len(chunk))
+                yield chunk
+
+    def _admit(self, transfer):
+        if transfer.priority == TransferPriority.CONTROL:
+            return
+
+        with self._cond:
+            self._seq += 1
+            entry = (
+                TransferPriority.rank(transfer.priority), self._seq,
+                time.time())
+            self._waiting.append(entry)
+            while self._get_next_entry() != entry:
+                # Waiting transfers are promoted over time, so the order may
+                # change without any transfer being released
+                self._cond.wait(voxc.TRANSFER_PRIORITY_AGING_INTERVAL)
+
+            self._waiting.remove(entry)
+            self._active.append(transfer)
+            self._cond.notify_all()
+
+    def _get_next_entry(self):
+        # Returns the waiting entry to admit next, if any slot is free for it
+        now = time.time()
+        active_ranks = set(
+            TransferPriority.rank(t.priority) for t in self._active)
+        num_free = self.max_transfers - len(self._active)
+        next_entry = None
+        next_key = None
+        for entry in self._waiting:
+            rank, seq, start_time = entry
+            num_reserved = 0
+            if any(e[0] > rank and e[0] not in active_ranks
+                   for e in self._waiting):
+                num_reserved = min(
+                    voxc.TRANSFER_RESERVED_SLOTS, self.max_transfers - 1)
+            if num_free <= num_reserved:
+                continue
+
+            num_promotions = int(
+                (now - start_time) / voxc.TRANSFER_PRIORITY_AGING_INTERVAL)
+            key = (max(rank - num_promotions, 0), seq)
+            if next_key is None or key < next_key:
+                next_entry, next_key = entry, key
+
+        return next_entry
+
+    def _release(self, transfer):
+        if transfer.priority == TransferPriority.CONTROL:
+            return
+
+        with self._cond:
+            self._active.remove(transfer)
+            self._cond.notify_all()
+
+    def _get_rate(self, transfer):
+        if (self.max_bandwidth is None or
+                transfer.priority == TransferPriority.CONTROL):
+            return None
+
+        with self._cond:
+            total_weight = sum(t.weight for t in self._active)
+
+        return self.max_bandwidth * transfer.weight / max(
+            total_weight, transfer.weight)
+
+
+class Transfer(object):
+    '''Class representing a transfer admitted by a TransferScheduler.
+
+    Attributes:
+        priority (TransferPriority): the priority of the transfer
+        weight (int): the bandwidth weight of the transfer
+        num_bytes (int): the number of bytes transferred so far
     '''
-    url = handle_macos_localhost(path_config.signed_url)
-    return _get_http_client().download_bytes(url)
 
+    def __init__(self, scheduler, priority):
+        '''Creates a Transfer instance.
 
-def upload(local_path, path_config):
-    '''Uploads the given file to the specified location.
+        Args:
+            scheduler (TransferScheduler): the scheduler
+            priority (TransferPriority): the priority of the transfer
+        '''
+        self.priority = priority
+        self.weight = voxc.TRANSFER_PRIORITY_WEIGHTS.get(priority, 1)
+        self.num_bytes = 0
+        self._scheduler = scheduler
+        self._tokens = 0.0
+        self._last_time = None
 
-    Args:
-        local_path (str): the path to the file to upload
-        path_config (RemotePathConfig): a RemotePathConfig describing where to
-            upload the file
+    def __enter__(self):
+        self._scheduler._admit(self)
+        self._last_time = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self._scheduler._release(self)
+
+    def throttle(self, num_bytes):
+        '''Accounts for the given number of bytes, sleeping as necessary to
+        keep the transfer within its bandwidth share.
+
+        Args:
+            num_bytes (int): the number of bytes about to be transferred
+        '''
+        self.num_bytes += num_bytes
+        rate = self._scheduler._get_rate(self)
+        if rate is None:
+            return
+
+        now = time.time()
+        self._tokens = min(
+            self._tokens + (now - self._last_time) * rate,
+            rate * voxc.TRANSFER_MAX_BURST)
+        self._last_time = now
+        self._tokens -= num_bytes
+        if self._tokens < 0:
+            time.sleep(-self._tokens / rate)
+
+    def iter_chunks(self, chunks):
+        '''Generates the given chunks, throttling them as they are emitted.
+
+        Args:
+            chunks (iterable): an iterable of bytes
+
+        Returns:
+            a generator that emits the chunks
+        '''
+        for chunk in chunks:
+            self.throttle(len(chunk))
+            yield chunk
+
+
+class ConcurrencyController(object):
+    '''Class that adapts the number of parallel requests of segmented
+    transfers using additive-increase/multiplicative-decrease (AIMD).
+
+    Completed requests are grouped into windows of ``concurrency`` requests.
+    At the end of each window, the concurrency is increased by one if the
+    aggregate throughput improved on the previous window, and decreased
+    multiplicatively if requests were throttled (HTTP 429/503) or failed, or
+    if request latency rose well above its baseline without a throughput
+    gain.
+
+    Attributes:
+        concurrency (int): the current concurrency
+        min_concurrency (int): the minimum concurrency
+        max_concurrency (int): the maximum concurrency
     '''
-    url = handle_macos_localhost(path_config.signed_url)
-    _get_http_client().upload(local_path, url)
 
+    def __init__(
+            self, min_concurrency=voxc.MIN_SEGMENT_CONCURRENCY,
+            max_concurrency=voxc.MAX_SEGMENT_CONCURRENCY,
+            initial_concurrency=voxc.INITIAL_SEGMENT_CONCURRENCY):
+        '''Creates a ConcurrencyController instance.
 
-def upload_bytes(bytes_str, path_config, content_type=None):
-    '''Uploads the given bytes to the specified location.
+        Args:
+            min_concurrency (int, optional): the minimum concurrency
+            max_concurrency (int, optional): the maximum concurrency
+            initial_concurrency (int, optional): the initial concurrency
+        '''
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = max(
+            min_concurrency, min(initial_concurrency, max_concurrency))
+        self._lock = threading.Lock()
+        self._throughput = None
+        self._base_latency = None
+        self._num_throttled = 0
+        self._reset_window()
 
-    Args:
-        bytes_str (str): the bytes to upload
-        path_config (RemotePathConfig): a RemotePathConfig describing where to
-            upload the bytes
-        content_type (str, optional): a string specifying the content type of
-            the file being uploaded
+    def record(self, num_bytes, latency, throttled=False):
+        '''Records the outcome of a request.
+
+        Args:
+            num_bytes (int): the number of bytes transferred by the request
+            latency (float): the duration of the request, in seconds
+            throttled (bool, optional): whether the request was throttled or
+                failed. By default, this is False
+        '''
+        now = time.time()
+        with self._lock:
+            if throttled:
+                self._num_throttled += 1
+                self._decrease()
+                self._reset_window()
+                return
+
+            if self._window_start is None:
+                self._window_start = now - latency
+
+            self._window_bytes += num_bytes
+            self._window_latency += latency
+            self._window_count += 1
+            if self._window_count >= self.concurrency:
+                self._adapt(now)
+
+    def get_metrics(self):
+        '''Returns a dictionary of metrics describing the controller.
+
+        Returns:
+            a dictionary with the current ``concurrency``, the ``throughput``
+            of the last window, in bytes per second, the ``base_latency`` of
+            requests, in seconds, and the ``num_throttled`` requests
+        '''
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "throughput": self._throughput,
+                "base_latency": self._base_latency,
+                "num_throttled": self._num_throttled,
+            }
+
+    def _adapt(self, now):
+        throughput = self._window_bytes / max(now - self._window_start, 1e-6)
+        latency = self._window_latency / self._window_count
+        if self._base_latency is None or latency < self._base_latency:
+            self._base_latency = latency
+
+        improved = self._throughput is None or throughput > (
+            self._throughput * (1 + voxc.ADAPTIVE_MIN_THROUGHPUT_GAIN))
+        congested = latency > (
+            self._base_latency * voxc.ADAPTIVE_LATENCY_TOLERANCE)
+        if congested and not improved:
+            self._decrease()
+        elif improved:
+            self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+
+        self._throughput = throughput
+        self._reset_window()
+
+    def _decrease(self):
+        self.concurrency = max(
+            int(self.concurrency * voxc.ADAPTIVE_DECREASE_FACTOR),
+            self.min_concurrency)
+
+    def _reset_window(self):
+        self._window_start = None
+        self._window_bytes = 0
+        self._window_latency = 0.0
+        self._window_count = 0
+
+
+class Deadline(object):
+    '''Class describing the time by which an operation must complete.
+
+    Attributes:
+        timeout (float): the time budget, in seconds, of the operation
+        expires_at (float): the time, in seconds since the epoch, at which the
+            deadline expires
     '''
-    url = handle_macos_localhost(path_config.signed_url)
-    _get_http_client().upload_bytes(bytes_str, url, content_type=content_type)
 
+    def __init__(self, timeout):
+        '''Creates a Deadline instance.
+
+        Args:
+            timeout (float): the time budget, in seconds, from now
+        '''
+        self.timeout = timeout
+        self.expires_at = time.time() + timeout
+
+    @property
+    def expired(self):
+        '''Whether the deadline has expired.'''
+        return time.time() >= self.expires_at
+
+    def remaining(self):
+        '''Returns the time remaining, in seconds, until the deadline.'''
+        return max(0, self.expires_at - time.time())
+
+    def check(self, operation="Operation"):
+        '''Raises a DeadlineExceededError if the deadline has expired.
+
+        Args:
+            operation (str, optional): a description of the operation
+
+        Raises:
+            DeadlineExceededError: if the deadline has expired
+        '''
+        if self.expired:
+            raise DeadlineExceededError(
+                "%s exceeded its deadline of %gs" % (operation, self.timeout))
+
+    @staticmethod
+    def earliest(*deadlines):
+        '''Returns the earliest of the given deadlines.
+
+        Args:
+            *deadlines: Deadline instances or None
+
+        Returns:
+            the earliest Deadline, or None if no deadlines were provided
+        '''
+        deadlines = [d for d in deadlines if d is not None]
+        if not deadlines:
+            return None
+
+        return min(deadlines, key=lambda d: d.expires_at)
+
+
+class DeadlineExceededError(IOError):
+    '''Exception raised when a request cannot complete before its deadline.
+
+    Like ``requests.RequestException``, this is an ``IOError``, so that it
+    can be raised without importing ``requests``.
+    '''
+    pass
+
+
+class LatencyTracker(object):
+    '''Class that tracks the recent latencies of requests to a host, which
+    determine when hedged requests send their duplicates.
+
+    Attributes:
+        percentile (float): the latency percentile after which duplicates are
+            sent
+        min_samples (int): the number of latencies required before the
+            percentile is used
+    '''
+
+    def __init__(
+            self, percentile=voxc.HEDGE_LATENCY_PERCENTILE,
+            min_samples=voxc.HEDGE_MIN_SAMPLES,
+            max_samples=voxc.HEDGE_MAX_SAMPLES):
+        '''Creates a LatencyTracker instance.
+
+        Args:
+            percentile (float, optional): the latency percentile, in [0, 100],
+                after which duplicates are sent
+            min_samples (int, optional): the number of latencies required
+                before the percentile is used
+            max_samples (int, optional): the number of recent latencies kept
+        '''
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        '''Records the latency of a completed request.
+
+        Args:
+            latency (float): the latency, in seconds
+        '''
+        with self._lock:
+            self._latencies.append(latency)
+
+    def get_hedge_delay(self):
+        '''Gets the delay after which a duplicate of a pending request
+        should be sent.
+
+        Returns:
+            the delay, in seconds
+        '''
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        if len(latencies) < self.min_samples:
+            return voxc.HEDGE_DEFAULT_DELAY
+
+        index = int(round(self.percentile / 100 * (len(latencies) - 1)))
+        return max(latencies[index], voxc.HEDGE_MIN_DELAY)
+
+
+class UploadWriter(io.RawIOBase):
+    '''A writable stream that uploads the bytes written to it in the
+    background.
+
+    Bytes are buffered into parts of ``part_size`` bytes, which are handed to
+    a background thread that streams them to the remote location as part of a
+    single chunked upload. At most ``max_parts`` parts are buffered at once,
+    so writers are throttled to the upload speed and memory usage is bounded.
+    The upload only holds a slot of the TransferScheduler while a part is
+    being sent, not while it waits for the writer to produce the next part.
+
+    Closing the writer flushes the final part and waits for the upload to
+    finish. Errors that occur during the upload are raised by the next call
+    to ``write()`` or ``close()``. A writer that is aborted, or garbage
+    collected before it was closed, abandons the upload, so a partial upload
+    is never committed.
+
+    Attributes:
+        path_config (RemotePathConfig): the location to which the bytes are
+            uploaded
+        content_type (str): the content type of the upload, if any
+        num_bytes (int): the number of bytes written so far
+    '''
+
+    def __init__(
+            self, path_config, content_type=None, content_encoding=None,
+            part_size=voxc.UPLOAD_PART_SIZE,
+            max_parts=voxc.UPLOAD_MAX_BUFFERED_PARTS, set_content_type=False):
+        '''Creates an UploadWriter instance and starts the upload.
+
+        Args:
+            path_config (RemotePathConfig): a RemotePathConfig describing where
+                to upload the bytes
+            content_type (str, optional): a string specifying the content type
+                of the upload, which is used to choose the content encoding of
+                the upload
+            content_encoding (ContentEncoding, optional): the content encoding
+                to apply to the upload. By default, this is chosen
+                automatically via ``get_content_encoding``
+            part_size (int, optional): the size of the parts handed to the
+                uploader, in bytes
+            max_parts (int, optional): the maximum number of parts to buffer
+            set_content_type (bool, optional): whether to send
+                ``content_type`` as the ``Content-Type`` header of the upload.
+                By default, this is False
+        '''
+        super(UploadWriter, self).__init__()
+        self.path_config = path_config
+        self.content_type = content_type
+        self.num_bytes = 0
+        self._part_size = part_size
+        self._buffer = bytearray()
+        self._parts = queue.Queue(maxsize=max_parts)
+        self._errors = []
+
+        # The uploader must not reference the writer, so that an abandoned
+        # writer can be garbage collected
+        self._thread = threading.Thread(
+            target=_run_upload_writer,
+            args=(
+                self._parts, self._errors, path_config, content_type,
+                content_encoding, set_content_type),
+            name="voxel51-upload-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        '''Writes the given bytes to the stream.
+
+        Args:
+            b (bytes): a bytes-like object
+
+        Returns:
+            the number of bytes written
+        '''
+        if self.closed:
+            raise ValueError("I/O operation on closed UploadWriter")
+
+        self._raise_error()
+        self._buffer.extend(b)
+        while len(self._buffer) >= self._part_size:
+            part = bytes(self._buffer[:self._part_size])
+            del self._buffer[:self._part_size]
+            self._put(part)
+
+        num_bytes = len(memoryview(b))
+        self.num_bytes += num_bytes
+        return num_bytes
+
+    def __del__(self):
+        # Unlike IOBase, which closes the stream on deletion, an abandoned
+        # writer must not commit its partial upload. Module globals may
+        # already be torn down at interpreter exit, so any error is ignored
+        try:
+            self.abort()
+        except:  # pylint: disable=bare-except
+            pass
+
+    def abort(self):
+        '''Abandons the upload, so that the bytes written so far are not
+        committed to the remote location.
+        '''
+        if self.closed:
+            return
+
+        try:
+            self._buffer = bytearray()
+
+            # The writer is the only producer, so the queue has room for the
+            # abort marker once the pending parts are discarded
+            while True:
+                try:
+                    self._parts.get_nowait()
+                except queue.Empty:
+                    break
+            self._parts.put_nowait(_ABORT_UPLOAD)
+            self._thread.join()
+        finally:
+            super(UploadWriter, self).close()
+
+    def close(self):
+        '''Flushes the final part and waits for the upload to complete.'''
+        if self.closed:
+            return
+
+        try:
+            if self._buffer:
+                self._put(bytes(self._buffer))
+                self._buffer = bytearray()
+            self._put(None)
+            self._thread.join()
+            self._raise_error()
+        finally:
+            super(UploadWriter, self).close()
+
+    def _put(self, part):
+        while True:
+            self._raise_error()
+            try:
+                self._parts.put(part, timeout=1)
+                return
+            except queue.Full:
+                pass
+
+    def _raise_error(self):
+        if self._errors:
+            raise self._errors[0]
+
+
+class AccessPattern(object):
+    '''Enum describing the expected access patterns of memory-mapped files,
+    which are passed to the kernel as ``madvise`` hints.'''
+
+    NORMAL = "normal"
+    SEQUENTIAL = "sequential"
+    RANDOM = "random"
+    WILLNEED = "willneed"
+
+
+class SpooledOutput(object):
+    '''A writable staging buffer for an output that is kept in memory up to a
+    size threshold and spilled to a temporary file on disk beyond it.
+
+    Staged outputs can be uploaded directly from the buffer, which avoids
+    writing small outputs to disk and reading them back.
+
+    Attributes:
+        filename (str): the filename of the output, which determines its MIME
+            type and the name under which it is posted as data
+        max_size (int): the size, in bytes, beyond which the output is spilled
+            to disk
+    '''
+
+    def __init__(
+            self, filename, max_size=voxc.DEFAULT_OUTPUT_SPOOL_MAX_SIZE,
+            dir=None):
+        '''Creates a SpooledOutput instance.
+
+        Args:
+            filename (str): the filename of the output
+            max_size (int, optional): the size, in bytes, beyond which the
+                output is spilled to disk
+            dir (str, optional): the directory in which to create the spill
+                file. By default, the system temporary directory is used
+        '''
+        self.filename = filename
+        self.max_size = max_size
+        self._file = tempfile.SpooledTemporaryFile(
+            max_size=max_size, mode="w+b", dir=dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def content_type(self):
+        '''The MIME type of the output.'''
+        return get_mime_type(self.filename)
+
+    @property
+    def is_spilled(self):
+        '''Whether the output has been spilled to disk.'''
+        # pylint: disable=protected-access
+        return self._file._rolled
+
+    @property
+    def size(self):
+        '''The number of bytes written so far.'''
+        position = self._file.tell()
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        self._file.seek(position)
+        return size
+
+    def write(self, b):
+        '''Writes the given bytes to the output.
+
+        Args:
+            b (bytes): a bytes-like object
+
+        Returns:
+            the number of bytes written
+        '''
+        return self._file.write(b)
+
+    def open_for_reading(self):
+        '''Rewinds the output so that it can be read from the beginning.
+
+        Returns:
+            the underlying binary file-like object
+        '''
+        self._file.flush()
+        self._file.seek(0)
+        return self._file
+
+    def close(self):
+        '''Discards the output, deleting its spill file, if any.'''
+        self._file.close()
+
+
+class FrameLabelsWriter(object):
+    '''Class that incrementally writes frame-indexed labels to a stream with
+    bounded memory.
+
+    In JSON mode, the output is a document of the form::
+
+        {<header fields>, "frames": {"1": <labels>, "2": <labels>, ...}}
+
+    In JSON-lines mode, each frame is written as a line of the form
+    ``{"frame_number": 1, "labels": <labels>}``, preceded by a
+    ``{"header": <header fields>}`` line if a header was provided.
+
+    Frames are serialized and written as soon as they are added. The document
+    is terminated by ``close()``, so the output is valid even if the writer is
+    closed early, e.g., when the task fails.
+
+    Attributes:
+        jsonl (bool): whether the output is in JSON-lines format
+        num_frames (int): the number of frames written so far
+    '''
+
+    def __init__(self, stream, jsonl=False, header=None, close_stream=True):
+        '''Creates a FrameLabelsWriter instance.
+
+        Args:
+            stream: a binary file-like object, e.g., an UploadWriter, to which
+                to write the labels
+            jsonl (bool, optional): whether to write JSON-lines rather than a
+                single JSON document. By default, this is False
+            header (dict, optional): a dictionary of top-level fields to write
+                before the frames
+            close_stream (bool, optional): whether to close ``stream`` when the
+                writer is closed. By default, this is True
+        '''
+        self.jsonl = jsonl
+        self.num_frames = 0
+        self._stream = stream
+        self._close_stream = close_stream
+        self._closed = False
+        self._write_header(header or {})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def closed(self):
+        '''Whether the writer has been closed.'''
+        return self._closed
+
+    def write_frame(self, frame_number, labels):
+        '''Writes the labels for the given frame.
+
+        Args:
+            frame_number (int): the frame number
+            labels (dict): a dictionary or Serializable object describing the
+                labels of the frame
+        '''
+        if self._closed:
+            raise ValueError("I/O operation on closed FrameLabelsWriter")
+
+        if hasattr(labels, "serialize"):
+            labels = labels.serialize()
+
+        if self.jsonl:
+            line = _dump_json(
+                {"frame_number": frame_number, "labels": labels}) + "\n"
+        else:
+            prefix = "," if self.num_frames else ""
+            line = "%s%s:%s" % (
+                prefix, _dump_json(str(frame_number)), _dump_json(labels))
+
+        self._write(line)
+        self.num_frames += 1
+
+    def close(self):
+        '''Terminates the document and, if requested, closes the underlying
+        stream.
+        '''
+        if self._closed:
+            return
+
+        self._closed = True
+        if not self.jsonl:
+            self._write("}}")
+        if self._close_stream:
+            self._stream.close()
+
+    def _write_header(self, header):
+        if self.jsonl:
+            if header:
+                self._write(_dump_json({"header": header}) + "\n")
+            return
+
+        fields = [
+            "%s:%s" % (_dump_json(k), _dump_json(v))
+            for k, v in sorted(header.items())]
+        fields.append(_dump_json("frames") + ":{")
+        self._write("{" + ",".join(fields))
+
+    def _write(self, s):
+        self._stream.write(s.encode("utf-8"))
+
+
+class TarBundle(object):
+    '''Class that streams a collection of files as a tar archive, optionally
+    gzip-compressed, without writing the archive to disk.
+
+    While the archive is generated, an index is recorded that allows
+    consumers to extract individual members via HTTP range requests. Each
+    index entry is a dictionary with the following keys:
+
+        - ``name``: the name of the member in the archive
+        - ``size``: the size of the member's data, in bytes
+        - ``offset``: the byte offset in the archive of the member's record
+        - ``length``: the length of the member's record, in bytes
+        - ``header_size``: the size of the tar header(s) that precede the
+          member's data in its record
+
+    To extract a member, read ``length`` bytes at ``offset``, gunzip them if
+    the bundle is compressed, and take the ``size`` bytes that follow the
+    first ``header_size`` bytes. When compressed, each member is encoded as
+    its own gzip member, so the archive remains a valid ``.tar.gz`` file.
+
+    The index itself is appended to the archive as a final member named
+    ``voxel51.config.OUTPUT_BUNDLE_INDEX_NAME``.
+
+    Attributes:
+        members (list): a list of ``(arcname, path)`` tuples
+        compress (bool): whether the archive is gzip-compressed
+        compression_level (int): the gzip compression level
+        index (list): the index entries of the members emitted so far
+        index_entry (dict): the index entry of the index member, which is
+            available once the archive has been fully generated
+    '''
+
+    def __init__(self, members, compress=False, compression_level=None):
+        '''Creates a TarBundle instance.
+
+        Args:
+            members (dict or list): a dictionary mapping archive names to local
+                paths, or a list of local paths, which are archived by their
+                basenames
+            compress (bool, optional): whether to gzip-compress the archive.
+                By default, this is False
+            compression_level (int, optional): the gzip compression level. By
+                default, the level is chosen via ``get_compression_level``
+        '''
+        if isinstance(members, dict):
+            self.members = sorted(members.items())
+        else:
+            self.members = [(os.path.basename(p), p) for p in members]
+        self.compress = compress
+        self.compression_level = get_compression_level(
+            ContentEncoding.GZIP, level=compression_level)
+        self.index = []
+        self.index_entry = None
+
+    @property
+    def content_type(self):
+        '''The MIME type of the archive, which is never compressible, so the
+        archive is uploaded as-is and the offsets in its index remain valid.
+        '''
+        return "application/gzip" if self.compress else "application/x-tar"
+
+    def iter_chunks(self):
+        '''Generates the bytes of the archive.
+
+        Returns:
+            a generator that emits the bytes of the archive
+        '''
+        self.index = []
+        self.index_entry = None
+        offset = 0
+        for arcname, path in self.members:
+            size = os.path.getsize(path)
+            header = _make_tar_header(arcname, size)
+            length = 0
+            for chunk in self._encode(
+                    _iter_tar_record(
+                        header, read_chunks(path, 0, size), size)):
+                length += len(chunk)
+                yield chunk
+
+            self.index.append({
+                "name": arcname,
+                "size": size,
+                "offset": offset,
+                "length": length,
+                "header_size": len(header),
+            })
+            offset += length
+
+        index_bytes = json.dumps(self.index).encode("utf-8")
+        header = _make_tar_header(
+            voxc.OUTPUT_BUNDLE_INDEX_NAME, len(index_bytes))
+        length = 0
+        for chunk in self._encode(_iter_tar_record(
+                header, [index_bytes], len(index_bytes), last=True)):
+            length += len(chunk)
+            yield chunk
+
+        self.index_entry = {
+            "name": voxc.OUTPUT_BUNDLE_INDEX_NAME,
+            "size": len(index_bytes),
+            "offset": offset,
+            "length": length,
+            "header_size": len(header),
+        }
+
+    def _encode(self, chunks):
+        if not self.compress:
+            return chunks
+        return gzip_chunks(chunks, level=self.compression_level)
+
+
+def is_macos():
+    '''Determines whether the current platform is Mac.
+
+    Returns:
+        True/False if the current operating system is macOS
+    '''
+    return os.environ.get(voxc.OS_ENV_VAR, "").lower() == "darwin"
+
+
+def handle_macos_localhost(url):
+    '''Converts ``localhost`` to ``docker.for.mac.localhost`` in the given URL,
+    if necessary, when running on macOS. This is required for Docker containers
+    running on macOS.
+
+    Args:
+        url (str): a URL
+
+    Returns:
+        a URL with ``localhost`` replaced with ``docker.for.mac.localhost``,
+            if necessary
+    '''
+    if not is_macos():
+        return url
+
+    chunks = list(urlparse.urlsplit(url))
+    netloc = chunks[1].split(":", 1)
+    hostname = netloc[0]
+    if hostname == "localhost" or hostname.startswith("127.0.0."):
+        netloc[0] = "docker.for.mac.localhost"
+        chunks[1] = ":".join(netloc)
+        url = urlparse.urlunsplit(chunks)
+    return url
+
+
+def get_local_path(url):
+    '''Gets the local path referred to by the given URL, if any.
+
+    Plain local paths are only recognized if the
+    ``voxel51.config.ALLOW_LOCAL_PATHS_ENV_VAR`` environment variable is set
+    to "true" or the ``voxel51.config.LOCAL_API_DIR_ENV_VAR`` environment
+    variable is set, so that a malformed URL is never mistaken for a path.
+    Otherwise, local files must be referred to by ``file://`` URLs.
+
+    Args:
+        url (str): a URL, a ``file://`` URL, or a local path
+
+    Returns:
+        the local path, or None if the URL refers to a remote file
+    '''
+    chunks = urlparse.urlsplit(url)
+    if chunks.scheme == "file":
+        return urlparse.unquote(chunks.path)
+
+    if not chunks.scheme or len(chunks.scheme) == 1:
+        # A relative or absolute path, possibly with a Windows drive letter
+        if _allow_local_paths():
+            return url
+
+    return None
+
+
+def link_or_copy(src_path, dst_path, allow_link=True):
+    '''Makes the given file available at the given path without copying its
+    bytes, if possible.
+
+    A hard link is made if allowed and both paths are on the same
+    filesystem, a copy-on-write clone is made if the filesystem supports it,
+    and the file is copied otherwise. Any existing file at ``dst_path`` is
+    replaced atomically.
+
+    Note that hard links share their contents, so later writes to either file
+    are visible in the other. Pass ``allow_link=False`` when the source may
+    still be modified, e.g., when uploading a file that is still being
+    written.
+
+    Args:
+        src_path (str): the path to the file
+        dst_path (str): the path at which to make the file available
+        allow_link (bool, optional): whether a hard link may be made. By
+            default, this is True
+
+    Returns:
+        how the file was made available: "link", "clone" or "copy"
+    '''
+    if os.path.exists(dst_path) and os.path.samefile(src_path, dst_path):
+        return "link"
+
+    dst_dir = os.path.dirname(os.path.abspath(dst_path))
+    if not os.path.isdir(dst_dir):
+        os.makedirs(dst_dir)
+
+    tmp_path = _make_temp_path(dst_path)
+    try:
+        if allow_link and _link_file(src_path, tmp_path):
+            method = "link"
+        elif _clone_file(src_path, tmp_path):
+            method = "clone"
+        else:
+            shutil.copyfile(src_path, tmp_path)
+            method = "copy"
+
+        _replace_file(tmp_path, dst_path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return method
+
+
+def get_metadata_for_video(video_path):
+    '''Gets metadata about the given video.
+
+    Args:
+        video_path (str): the path to the video
+
+    Returns:
+        a VideoMetadata instance describing the video
+    '''
+    import eta.core.video as etav
+
+    return etav.VideoMetadata.build_for(video_path)
+
+
+def iter_frame_labels(path, jsonl=False):
+    '''Iterates over the frame-indexed labels in the given file, as written by
+    a FrameLabelsWriter.
+
+    In JSON-lines mode, the file is read one line at a time. In JSON mode, the
+    entire document is loaded into memory.
+
+    Args:
+        path (str): the path to the labels file
+        jsonl (bool, optional): whether the file is in JSON-lines format. By
+            default, this is False
+
+    Returns:
+        an iterator over ``(frame_number, labels)`` tuples, in the order in
+            which the frames were written
+    '''
+    with io.open(path, "r", encoding="utf-8") as f:
+        if not jsonl:
+            frames = json.load(f).get("frames", {})
+            for frame_number in sorted(frames, key=int):
+                yield int(frame_number), frames[frame_number]
+            return
+
+        for line in f:
+            if not line.strip():
+                continue
+
+            d = json.loads(line)
+            if "header" in d:
+                continue
+
+            yield d["frame_number"], d["labels"]
+
+
+def map_file(path, access_pattern=None):
+    '''Memory-maps the given file read-only.
+
+    The mapping is backed by the page cache, so processes on the same host
+    that map the same file share its pages rather than each holding a copy.
+
+    Args:
+        path (str): the path to the file
+        access_pattern (AccessPattern, optional): the expected access pattern,
+            which is passed to the kernel via ``madvise`` where supported
+
+    Returns:
+        a read-only ``mmap.mmap``
+
+    Raises:
+        ValueError: if the file is empty, since empty files cannot be mapped
+    '''
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Cannot memory-map empty file '%s'" % path)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if access_pattern is not None:
+        _madvise(mm, access_pattern)
+
+    return mm
+
+
+def map_array(path, dtype, shape=None, offset=0, access_pattern=None):
+    '''Memory-maps the given file read-only as a NumPy array.
+
+    This function requires the ``numpy`` package.
+
+    Args:
+        path (str): the path to the file
+        dtype: the NumPy dtype of the array
+        shape (tuple, optional): the shape of the array. By default, the
+            remainder of the file after ``offset`` is mapped as a 1D array
+        offset (int, optional): the byte offset of the array in the file
+        access_pattern (AccessPattern, optional): the expected access pattern,
+            which is passed to the kernel via ``madvise`` where supported
+
+    Returns:
+        a read-only ``numpy.ndarray`` backed by the mapped file
+    '''
+    import numpy as np
+
+    mm = map_file(path, access_pattern=access_pattern)
+    dtype = np.dtype(dtype)
+    count = -1
+    if shape is not None:
+        count = int(np.prod(shape))
+
+    arr = np.frombuffer(mm, dtype=dtype, count=count, offset=offset)
+    if shape is not None:
+        arr = arr.reshape(shape)
+    return arr
+
+
+def download(path_config, output_dir, priority=TransferPriority.BULK):
+    '''Downloads the specified file to the given directory.
+
+    Args:
+        path_config (RemotePathConfig): a RemotePathConfig describing the file
+            to download
+        output_dir (str): the directory to download the file to
+        priority (TransferPriority, optional): the priority of the transfer.
+            By default, this is ``TransferPriority.BULK``
+
+    Returns:
+        the local path to the downloaded file
+    '''
+    return download_file(path_config, output_dir, priority=priority).path
+
+
+def download_file(
+        path_config, output_dir, digests=None,
+        priority=TransferPriority.BULK):
+    '''Downloads the specified file to the given directory, computing the
+    given digests inline as the bytes arrive.
+
+    The digests are verified against any Content-MD5 or x-goog-hash headers
+    provided by the server, and against its ETag if
+    ``voxel51.config.VERIFY_ETAG_MD5_ENV_VAR`` is set to "true".
+
+    Args:
+        path_config (RemotePathConfig): a RemotePathConfig describing the file
+            to download
+        output_dir (str): the directory to download the file to
+        digests (list, optional): a list of DigestAlgorithm values to compute.
+            By default, the algorithms are chosen via
+            ``get_digest_algorithms``
+        priority (TransferPriority, optional): the priority of the transfer.
+            By default, this is ``TransferPriority.BULK``
+
+    Returns:
+        a TransferResult describing the download
+
+    Raises:
+        IntegrityError: if a digest does not match the server-provided digest
+    '''
+    if path_config.local_path is not None:
+        local_path = os.path.join(
+            output_dir, os.path.basename(path_config.local_path))
+        link_or_copy(path_config.local_path, local_path)
+        return _digest_local_file(local_path, digests)
+
+    url = handle_macos_localhost(path_config.signed_url)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    digester = _Digester(get_digest_algorithms(digests))
+    metrics = {}
+    segment_size = voxc.DOWNLOAD_SEGMENT_SIZE
+    with get_transfer_scheduler().transfer(priority) as transfer:
+        # Request the first segment; servers that do not support ranges
+        # respond with the entire file instead
+        res = send_request(
+            _get_http_session(), "GET", url, idempotent=True, stream=True,
+            headers={"Range": "bytes=0-%d" % (segment_size - 1)})
+        if res.status_code == 416:
+            # Empty files cannot satisfy any range
+            res.close()
+            res = send_request(
+                _get_http_session(), "GET", url, idempotent=True,
+                stream=True)
+        try:
+            res.raise_for_status()
+            total_size = _get_total_size(res)
+            local_path = os.path.join(
+                output_dir, _get_filename(url, res.headers))
+            with open(local_path, "wb") as f:
+                for chunk in res.iter_content(chunk_size=_CHUNK_SIZE):
+                    transfer.throttle(len(chunk))
+                    digester.update(chunk)
+                    f.write(chunk)
+
+                if total_size is not None and total_size > digester.size:
+                    controller = get_concurrency_controller(url)
+                    _download_segments(
+                        url, f, digester.size, total_size, segment_size,
+                        transfer, digester, controller)
+                    metrics = controller.get_metrics()
+        finally:
+            res.close()
+
+    try:
+        verified = digester.verify(res.headers, url)
+    except IntegrityError:
+        os.remove(local_path)
+        raise
+
+    return digester.make_result(local_path, verified, metrics=metrics)
+
+
+def download_archive(
+        path_config, output_dir, digests=None, max_workers=None,
+        priority=TransferPriority.BULK):
+    '''Downloads the specified archive and extracts its members to the given
+    directory on the fly, without writing the archive to disk.
+
+    The format of the archive is detected from its first bytes. Tar archives,
+    optionally gzip- or zstd-compressed, are extracted from the HTTP stream as
+    it arrives. Zip archives are read via range requests: the central
+    directory is fetched first, and the members are then fetched and
+    extracted in parallel. If the server does not support range requests, zip
+    archives are spooled to disk before they are extracted.
+
+    Members whose paths would escape ``output_dir``, and tar members that are
+    not regular files or directories, are skipped.
+
+    Args:
+        path_config (RemotePathConfig): a RemotePathConfig describing the
+            archive to download
+        output_dir (str): the directory to which to extract the archive
+        digests (list, optional): a list of DigestAlgorithm values to compute
+            over the bytes of the archive. By default, the algorithms are
+            chosen via ``get_digest_algorithms``. Digests are not computed for
+            zip archives read via range requests, whose members are verified
+            against their CRC-32 checksums instead
+        max_workers (int, optional): the maximum number of zip members to
+            fetch concurrently. By default,
+            ``voxel51.config.DEFAULT_MAX_ARCHIVE_WORKERS`` is used
+        priority (TransferPriority, optional): the priority of the transfer.
+            By default, this is ``TransferPriority.BULK``
+
+    Returns:
+        a TransferResult whose ``path`` is ``output_dir``
+
+    Raises:
+        ValueError: if the archive format is not supported
+        IntegrityError: if a digest or checksum does not match
+    '''
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    if max_workers is None:
+        max_workers = voxc.DEFAULT_MAX_ARCHIVE_WORKERS
+
+    digester = _Digester(get_digest_algorithms(digests))
+    local_path = path_config.local_path
+    if local_path is not None:
+        reader = _IterReader(digester.iter_chunks(read_chunks(local_path)))
+        if _sniff_archive_format(reader) == ArchiveFormat.ZIP:
+            with open(local_path, "rb") as f:
+                _extract_zip(
+                    f, partial(_open_local_range, local_path), output_dir,
+                    max_workers)
+            return TransferResult(
+                output_dir, os.path.getsize(local_path), {}, [])
+
+        _extract_tar(reader, output_dir)
+        return digester.make_result(output_dir, [])
+
+    url = handle_macos_localhost(path_config.signed_url)
+    with get_transfer_scheduler().transfer(priority) as transfer:
+        # An open-ended range reveals whether the server supports ranges
+        res = send_request(
+            _get_http_session(), "GET", url, idempotent=True, stream=True,
+            headers={"Range": "bytes=0-"})
+        try:
+            res.raise_for_status()
+            reader = _IterReader(transfer.iter_chunks(digester.iter_chunks(
+                res.iter_content(chunk_size=_CHUNK_SIZE))))
+            archive_format = _sniff_archive_format(reader)
+            total_size = _get_total_size(res)
+            if archive_format != ArchiveFormat.ZIP:
+                _extract_tar(reader, output_dir)
+            elif total_size is not None:
+                res.close()
+                open_range = partial(_open_http_range, url, transfer)
+                _extract_zip(
+                    _RangeReader(open_range, total_size), open_range,
+                    output_dir, max_workers)
+                return TransferResult(output_dir, total_size, {}, [])
+            else:
+                _extract_spooled_zip(reader, output_dir, max_workers)
+        finally:
+            res.close()
+
+    return digester.make_result(output_dir, digester.verify(res.headers, url))
+
+
+def download_bytes(
+        path_config, digests=None, priority=TransferPriority.CONTROL):
+    '''Downloads the specified file as bytes.
+
+    Args:
+        path_config (RemotePathConfig): a RemotePathConfig describing the file
+            to download
+        digests (list, optional): a list of DigestAlgorithm values to compute
+            and verify. By default, the algorithms are chosen via
+            ``get_digest_algorithms``
+        priority (TransferPriority, optional): the priority of the transfer.
+            By default, this is ``TransferPriority.CONTROL``
+
+    Returns:
+        the bytes of the downloaded file
+
+    Raises:
+        IntegrityError: if a digest does not match the server-provided digest
+    '''
+    if path_config.local_path is not None:
+        with open(path_config.local_path, "rb") as f:
+            return f.read()
+
+    url = handle_macos_localhost(path_config.signed_url)
+    is_control = priority == TransferPriority.CONTROL
+    with get_transfer_scheduler().transfer(priority) as transfer:
+        res = send_request(
+            _get_http_session(), "GET", url,
+            timeout=voxc.CONTROL_REQUEST_TIMEOUT if is_control else None,
+            idempotent=True, hedge=is_control)
+        transfer.throttle(len(res.content))
+    res.raise_for_status()
+    digester = _Digester(get_digest_algorithms(digests))
+    digester.update(res.content)
+    digester.verify(res.headers, url)
+    return res.content
+
+
+def get_digest_algorithms(digests=None):
+    '''Gets the digest algorithms to compute inline during transfers.
+
+    Args:
+        digests (list, optional): an explicit list of DigestAlgorithm values,
+            which, if provided, is returned as-is
+
+    Returns:
+        a list of DigestAlgorithm values, from the
+            ``voxel51.config.TRANSFER_DIGESTS_ENV_VAR`` environment variable,
+            if set, or ``voxel51.config.DEFAULT_TRANSFER_DIGESTS`` otherwise
+    '''
+    if digests is not None:
+        return list(digests)
+
+    value = os.environ.get(voxc.TRANSFER_DIGESTS_ENV_VAR)
+    if value is None:
+        return list(voxc.DEFAULT_TRANSFER_DIGESTS)
+
+    if value.strip().lower() == "none":
+        return []
+
+    return [d.strip().lower() for d in value.split(",") if d.strip()]
+
+
+def compute_digests(path, digests=None):
+    '''Computes the digests of the given local file.
+
+    Args:
+        path (str): the path to the file
+        digests (list, optional): a list of DigestAlgorithm values to compute.
+            By default, the algorithms are chosen via
+            ``get_digest_algorithms``
+
+    Returns:
+        a dictionary mapping DigestAlgorithm values to hex digests
+    '''
+    return compute_chunk_digests(read_chunks(path), digests=digests)
+
+
+def compute_chunk_digests(chunks, digests=None):
+    '''Computes the digests of the given stream of bytes.
+
+    Args:
+        chunks (iterable): an iterable of bytes
+        digests (list, optional): a list of DigestAlgorithm values to compute.
+            By default, the algorithms are chosen via
+            ``get_digest_algorithms``
+
+    Returns:
+        a dictionary mapping DigestAlgorithm values to hex digests
+    '''
+    digester = _Digester(get_digest_algorithms(digests))
+    for chunk in chunks:
+        digester.update(chunk)
+
+    return digester.hexdigests()
+
+
+def get_transfer_scheduler():
+    '''Gets the global TransferScheduler through which all transfers of the
+    SDK are routed.
+
+    The scheduler is created on first use via ``TransferScheduler.from_env``.
+
+    Returns:
+        the TransferScheduler
+    '''
+    global _TRANSFER_SCHEDULER
+    if _TRANSFER_SCHEDULER is None:
+        with _TRANSFER_SCHEDULER_LOCK:
+            if _TRANSFER_SCHEDULER is None:
+                _TRANSFER_SCHEDULER = TransferScheduler.from_env()
+    return _TRANSFER_SCHEDULER
+
+
+def make_session(source_address=None, pool_size=None):
+    '''Makes a ``requests.Session``, optionally bound to a local source
+    address.
+
+    Args:
+        source_address (str, optional): a local IP address or network
+            interface name to bind connections to. By default, the OS chooses
+        pool_size (int, optional): the maximum number of connections to keep
+            open per host. By default,
+            ``voxel51.config.MAX_SEGMENT_CONCURRENCY`` is used
+
+    Returns:
+        a ``requests.Session``
+    '''
+    import requests
+    from requests.adapters import HTTPAdapter
+    import voxel51.adapters as voxad
+
+    if pool_size is None:
+        pool_size = voxc.MAX_SEGMENT_CONCURRENCY
+
+    session = requests.Session()
+    if source_address:
+        adapter = voxad.SourceAddressAdapter(
+            resolve_source_address(source_address),
+            pool_connections=pool_size, pool_maxsize=pool_size)
+    else:
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def resolve_source_address(source_address):
+    '''Resolves the given local IP address or network interface name to an IP
+    address.
+
+    Interface names are resolved to their first IPv4 address, which requires
+    the ``psutil`` package.
+
+    Args:
+        source_address (str): a local IP address or network interface name
+
+    Returns:
+        the local IP address
+
+    Raises:
+        ValueError: if the interface has no IPv4 address
+    '''
+    if _is_ip_address(source_address):
+        return source_address
+
+    import psutil
+
+    for addr in psutil.net_if_addrs().get(source_address, []):
+        if addr.family == socket.AF_INET:
+            return addr.address
+
+    raise ValueError(
+        "Network interface '%s' has no IPv4 address" % source_address)
+
+
+def warm_up_connections(urls, sessions=None):
+    '''Opens connections to the hosts of the given URLs in the background, so
+    that subsequent requests to them skip the DNS, TCP and TLS handshakes.
+
+    A lightweight HEAD request is sent to the origin of each distinct host via
+    each session, which leaves an open connection in the session's pool.
+    Failures are ignored.
+
+    Args:
+        urls (iterable): an iterable of URLs
+        sessions (list, optional): the ``requests.Session`` instances to warm
+            up. By default, the sessions used for storage transfers are used
+
+    Returns:
+        the list of started daemon threads
+    '''
+    if sessions is None:
+        sessions = _get_http_sessions()
+
+    origins = set()
+    for url in urls:
+        chunks = urlparse.urlsplit(handle_macos_localhost(url))
+        if chunks.scheme in ("http", "https") and chunks.netloc:
+            origins.add(chunks.scheme + "://" + chunks.netloc + "/")
+
+    threads = []
+    for origin in sorted(origins):
+        for session in sessions:
+            thread = threading.Thread(
+                target=_warm_up_connection, args=(session, origin),
+                name="voxel51-prewarm")
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+    return threads
+
+
+def get_concurrency_controller(url):
+    '''Gets the ConcurrencyController for segmented transfers to the host of
+    the given URL.
+
+    Controllers are shared by all transfers to the same host, so the
+    concurrency learned by one transfer carries over to the next.
+
+    Args:
+        url (str): a URL
+
+    Returns:
+        the ConcurrencyController for the host
+    '''
+    host = urlparse.urlsplit(url).netloc
+    with _CONCURRENCY_CONTROLLERS_LOCK:
+        controller = _CONCURRENCY_CONTROLLERS.get(host)
+        if controller is None:
+            controller = ConcurrencyController()
+            _CONCURRENCY_CONTROLLERS[host] = controller
+    return controller
+
+
+def get_latency_tracker(url):
+    '''Gets the LatencyTracker for requests to the host of the given URL.
+
+    Args:
+        url (str): a URL
+
+    Returns:
+        the LatencyTracker for the host
+    '''
+    host = urlparse.urlsplit(url).netloc
+    with _LATENCY_TRACKERS_LOCK:
+        tracker = _LATENCY_TRACKERS.get(host)
+        if tracker is None:
+            tracker = LatencyTracker()
+            _LATENCY_TRACKERS[host] = tracker
+    return tracker
+
+
+def get_task_deadline():
+    '''Gets the deadline of the current task, which bounds all requests sent
+    by the SDK.
+
+    Returns:
+        the Deadline of the task, or None if the task has no time budget
+    '''
+    return _TASK_DEADLINE
+
+
+def set_task_deadline(deadline):
+    '''Sets the deadline of the current task, which bounds all requests sent
+    by the SDK.
+
+    Args:
+        deadline (Deadline): the Deadline of the task, or None to remove it
+    '''
+    global _TASK_DEADLINE
+    _TASK_DEADLINE = deadline
+
+
+def get_backoff_delay(num_retries):
+    '''Gets the delay before the given retry of a failed request, using
+    exponential backoff with full jitter.
+
+    Args:
+        num_retries (int): the number of the retry, starting from 1
+
+    Returns:
+        the delay, in seconds
+    '''
+    cap = min(
+        voxc.RETRY_BACKOFF_MAX,
+        voxc.RETRY_BACKOFF_BASE * 2 ** (num_retries - 1))
+    return random.uniform(0, cap)
+
+
+def send_request(
+        session, method, url, timeout=None, deadline=None, idempotent=False,
+        hedge=False, **kwargs):
+    '''Sends an HTTP request with a timeout.
+
+    Idempotent requests that fail with a connection error, a timeout or a
+    retryable status code (429 or 5xx) are retried with exponential backoff
+    and full jitter. Hedged requests send a duplicate if no response is
+    received within a percentile of the recent latencies to the host, and the
+    first response wins; a hedged request waits for the duplicates of any
+    previous hedged request with the same method and URL, so that writes are
+    never reordered.
+
+    The timeout of each attempt is capped by the time remaining until the
+    deadline of the request or the deadline of the task, whichever is
+    earlier. Only idempotent requests whose body can be sent again, i.e.,
+    not streamed from an iterator, may be retried or hedged. Bodies that
+    provide a ``rewind()`` method are rewound before they are sent again.
+
+    Args:
+        session: a ``requests.Session`` or the ``requests`` module
+        method (str): the HTTP method
+        url (str): the URL
+        timeout (float or tuple, optional): the timeout, in seconds, or a
+            ``(connect, read)`` tuple of timeouts. By default,
+            ``voxel51.config.REQUEST_CONNECT_TIMEOUT`` and
+            ``voxel51.config.REQUEST_READ_TIMEOUT`` are used
+        deadline (Deadline, optional): the deadline of the request
+        idempotent (bool, optional): whether the request is idempotent and
+            may be retried. By default, this is False
+        hedge (bool, optional): whether to hedge the request. This requires
+            ``idempotent=True``. By default, this is False
+        **kwargs: keyword arguments for ``session.request()``
+
+    Returns:
+        the ``requests.Response``, which may have a retryable error status if
+            the retries were exhausted
+
+    Raises:
+        DeadlineExceededError: if the deadline expired before the request
+            could be sent
+        requests.RequestException: if the request failed
+    '''
+    import requests
+
+    if hedge and not idempotent:
+        raise ValueError("Only idempotent requests can be hedged")
+
+    if timeout is None:
+        timeout = (voxc.REQUEST_CONNECT_TIMEOUT, voxc.REQUEST_READ_TIMEOUT)
+
+    deadline = Deadline.earliest(deadline, _TASK_DEADLINE)
+    max_retries = voxc.MAX_REQUEST_RETRIES if idempotent else 0
+    num_retries = 0
+    while True:
+        if num_retries and hasattr(kwargs.get("data"), "rewind"):
+            kwargs["data"].rewind()
+
+        attempt_timeout = _cap_timeout(timeout, deadline, method, url)
+        res = None
+        try:
+            if hedge:
+                res = _send_hedged_request(
+                    session, method, url, attempt_timeout, deadline, kwargs)
+            else:
+                res = _send_request(
+                    session, method, url, attempt_timeout, kwargs)
+        except DeadlineExceededError:
+            raise
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if deadline is not None:
+                # The attempt may have been cut short by the deadline
+                deadline.check(
+                    "%s request to '%s'" % (method, _strip_query(url)))
+            if num_retries >= max_retries:
+                raise
+            error = e
+        else:
+            if (res.status_code not in _RETRY_STATUS_CODES or
+                    num_retries >= max_retries):
+                return res
+            error = "status %d" % res.status_code
+
+        num_retries += 1
+        delay = get_backoff_delay(num_retries)
+        if deadline is not None and delay >= deadline.remaining():
+            if res is not None:
+                return res
+            raise error
+
+        if res is not None:
+            res.close()
+        logger.debug(
+            "%s request to '%s' failed (%s); retrying in %.2fs", method,
+            _strip_query(url), error, delay)
+        time.sleep(delay)
+
+
+def set_transfer_scheduler(scheduler):
+    '''Sets the global TransferScheduler through which all transfers of the
+    SDK are routed.
+
+    Args:
+        scheduler (TransferScheduler): a TransferScheduler
+    '''
+    global _TRANSFER_SCHEDULER
+    _TRANSFER_SCHEDULER = scheduler
+
+
+def upload(
+        local_path, path_config, content_type=None, content_encoding=None,
+        compression_level=None, priority=TransferPriority.BULK,
+        set_content_type=False):
+    '''Uploads the given file to the specified location.
+
+    The file is not compressed unless a ``content_encoding`` is provided or
+    enabled for its MIME type via ``get_content_encoding``, in which case it
+    is compressed into a spool first, so that it is sent with a
+    Content-Length.
+
+    Args:
+        local_path (str): the path to the file to upload
+        path_config (RemotePathConfig): a RemotePathConfig describing where to
+            upload the file
+        content_type (str, optional): a string specifying the content type of
+            the file being uploaded. This is only used to choose the content
+            encoding of the upload
+        content_encoding (ContentEncoding, optional): the content encoding to
+            apply to the upload. By default, this is chosen automatically via
+            ``get_content_encoding``
+        compression_level (int, optional): the compression level to use. By
+            default, the level is chosen via ``get_compression_level``
+        priority (TransferPriority, optional): the priority of the transfer.
+            By default, this is ``TransferPriority.BULK``
+        set_content_type (bool, optional): whether to send ``content_type``
+            as the ``Content-Type`` header of the upload. Signed URLs whose
+            signature does not cover this header, e.g., GCS signed URLs,
+            reject such uploads. By default, this is False
+
+    Returns:
+        a TransferResult describing the upload
+    '''
+    if path_config.local_path is not None:
+        # The uploaded file must not change if the source is modified later,
+        # e.g., a logfile that is still being written, so it is never linked
+        link_or_copy(local_path, path_config.local_path, allow_link=False)
+        result = _digest_local_file(path_config.local_path, None)
+        result.path = None
+        return result
+
+    url = handle_macos_localhost(path_config.signed_url)
+    content_type = content_type or get_mime_type(local_path)
+    content_encoding = get_content_encoding(
+        content_type, content_encoding=content_encoding)
+    if not set_content_type:
+        content_type = None
+    with open(local_path, "rb") as f:
+        with contextlib.closing(make_request_body(
+                [f], content_encoding=content_encoding,
+                compression_level=compression_level)) as body:
+            return _upload_stream(
+                body, url, content_type, content_encoding, priority=priority)
+
+
+def upload_bytes(
+        bytes_str, path_config, content_type=None, content_encoding=None,
+        compression_level=None, priority=TransferPriority.BULK,
+        set_content_type=False):
+    '''Uploads the given bytes to the specified location.
+
+    Any object supporting the buffer protocol (``bytes``, ``bytearray``,
+    ``memoryview``, ``mmap``, C-contiguous NumPy arrays, etc.) can be
+    uploaded. The buffer is sent in zero-copy slices, so it is never copied
+    as a whole. Text strings are encoded as UTF-8 first.
+
+    The bytes are not compressed unless a ``content_encoding`` is provided or
+    enabled for their ``content_type`` via ``get_content_encoding``.
+
+    Args:
+        bytes_str (bytes): the bytes or buffer to upload
+        path_config (RemotePathConfig): a RemotePathConfig describing where to
+            upload the bytes
+        content_type (str, optional): a string specifying the content type of
+            the file being uploaded, which is used to choose the content
+            encoding of the upload
+        content_encoding (ContentEncoding, optional): the content encoding to
+            apply to the upload. By default, this is chosen automatically via
+            ``get_content_encoding``
+        compression_level (int, optional): the compression level to use. By
+            default, the level is chosen via ``get_compression_level``
+        priority (TransferPriority, optional): the priority of the transfer.
+            By default, this is ``TransferPriority.BULK``
+        set_content_type (bool, optional): whether to send ``content_type``
+            as the ``Content-Type`` header of the upload. Signed URLs whose
+            signature does not cover this header, e.g., GCS signed URLs,
+            reject such uploads. By default, this is False
+
+    Returns:
+        a TransferResult describing the upload
+    '''
+    if isinstance(bytes_str, text_type):
+        bytes_str = bytes_str.encode("utf-8")
+
+    if path_config.local_path is not None:
+        return _write_local_file(
+            read_buffer_chunks(bytes_str), path_config.local_path)
+
+    url = handle_macos_localhost(path_config.signed_url)
+    content_encoding = get_content_encoding(
+        content_type, content_encoding=content_encoding)
+    if not set_content_type:
+        content_type = None
+    if (priority == TransferPriority.CONTROL and
+            len(_as_byte_view(bytes_str)) <= voxc.CONTROL_UPLOAD_MAX_SIZE):
+        # Small control-plane uploads are buffered, so that they can be
+        # retried and hedged
+        body = b"".join(compress_chunks(
+            read_buffer_chunks(bytes_str), content_encoding,
+            level=compression_level))
+        return _upload_stream(
+            body, url, content_type, content_encoding, priority=priority)
+
+    with contextlib.closing(make_request_body(
+            [_BufferReader(bytes_str)], content_encoding=content_encoding,
+            compression_level=compression_level)) as body:
+        return _upload_stream(
+            body, url, content_type, content_encoding, priority=priority)
+
+
+def upload_stream(
+        chunks, path_config, content_type=None, content_encoding=None,
+        compression_level=None, priority=TransferPriority.BULK,
+        set_content_type=False, schedule_chunks=False):
+    '''Uploads the given stream of bytes to the specified location.
+
+    Uncompressed streams are consumed as they are uploaded, so they are never
+    buffered whole, but they are sent with chunked transfer encoding, which
+    not all signed URLs accept. Compressed streams are spooled first, so that
+    they are sent with a Content-Length.
+
+    Args:
+        chunks (iterable): an iterable of bytes to upload
+        path_config (RemotePathConfig): a RemotePathConfig describing where to
+            upload the bytes
+        content_type (str, optional): a string specifying the content type of
+            the bytes being uploaded, which is used to choose the content
+            encoding of the upload
+        content_encoding (ContentEncoding, optional): the content encoding to
+            apply to the upload. By default, this is chosen automatically via
+            ``get_content_encoding``
+        compression_level (int, optional): the compression level to use. By
+            default, the level is chosen via ``get_compression_level``
+        priority (TransferPriority, optional): the priority of the transfer.
+            By default, this is ``TransferPriority.BULK``
+        set_content_type (bool, optional): whether to send ``content_type``
+            as the ``Content-Type`` header of the upload. Signed URLs whose
+            signature does not cover this header, e.g., GCS signed URLs,
+            reject such uploads. By default, this is False
+        schedule_chunks (bool, optional): whether to admit each chunk of an
+            uncompressed stream as a separate transfer via
+            ``TransferScheduler.iter_chunks()``, so that a slot is not held
+            while the stream waits for its next chunk. This is useful for
+            streams that are produced slowly. By default, this is False
+
+    Returns:
+        a TransferResult describing the upload
+    '''
+    if path_config.local_path is not None:
+        return _write_local_file(chunks, path_config.local_path)
+
+    url = handle_macos_localhost(path_config.signed_url)
+    content_encoding = get_content_encoding(
+        content_type, content_encoding=content_encoding)
+    if not set_content_type:
+        content_type = None
+    if content_encoding == ContentEncoding.IDENTITY:
+        return _upload_stream(
+            chunks, url, content_type, content_encoding, priority=priority,
+            schedule_chunks=schedule_chunks)
+
+    with contextlib.closing(_spool_chunks(compress_chunks(
+            chunks, content_encoding, level=compression_level))) as body:
+        return _upload_stream(
+            body, url, content_type, content_encoding, priority=priority)
+
+
+def upload_file_obj(
+        f, path_config, content_type=None, content_encoding=None,
+        compression_level=None, priority=TransferPriority.BULK,
+        set_content_type=False):
+    '''Uploads the contents of the given file-like object, from its current
+    position, to the specified location.
+
+    The upload is sent with a Content-Length, so file-like objects that are
+    not seekable, or whose contents are compressed, are spooled first.
+
+    Args:
+        f: a binary file-like object
+        path_config (RemotePathConfig): a RemotePathConfig describing where to
+            upload the file
+        content_type (str, optional): a string specifying the content type of
+            the file being uploaded. This is only used to choose the content
+            encoding of the upload
+        content_encoding (ContentEncoding, optional): the content encoding to
+            apply to the upload. By default, this is chosen automatically via
+            ``get_content_encoding``
+        compression_level (int, optional): the compression level to use. By
+            default, the level is chosen via ``get_compression_level``
+        priority (TransferPriority, optional): the priority of the transfer.
+            By default, this is ``TransferPriority.BULK``
+        set_content_type (bool, optional): whether to send ``content_type``
+            as the ``Content-Type`` header of the upload. Signed URLs whose
+            signature does not cover this header, e.g., GCS signed URLs,
+            reject such uploads. By default, this is False
+
+    Returns:
+        a TransferResult describing the upload
+    '''
+    if path_config.local_path is not None:
+        return _write_local_file(
+            read_file_obj_chunks(f), path_config.local_path)
+
+    url = handle_macos_localhost(path_config.signed_url)
+    content_encoding = get_content_encoding(
+        content_type, content_encoding=content_encoding)
+    if not set_content_type:
+        content_type = None
+    with contextlib.closing(make_request_body(
+            [f], content_encoding=content_encoding,
+            compression_level=compression_level)) as body:
+        return _upload_stream(
+            body, url, content_type, content_encoding, priority=priority)
+
+
+def get_mime_type(path):
+    '''Guesses the MIME type of the given file from its extension.
+
+    Args:
+        path (str): the path to the file
+
+    Returns:
+        the MIME type, or "application/octet-stream" if it cannot be guessed
+    '''
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def is_compressible_mime_type(mime_type):
+    '''Determines whether content of the given MIME type is worth compressing.
+
+    Args:
+        mime_type (str): a MIME type
+
+    Returns:
+        True/False
+    '''
+    if not mime_type:
+        return False
+
+    mime_type = mime_type.split(";", 1)[0].strip().lower()
+    return (
+        mime_type.startswith("text/") or
+        mime_type in voxc.COMPRESSIBLE_MIME_TYPES or
+        mime_type.endswith("+json") or
+        mime_type.endswith("+xml"))
+
+
+def get_content_encoding(content_type, content_encoding=None):
+    '''Gets the content encoding to apply when uploading content of the given
+    type.
+
+    Compressible content is encoded via the encoding specified by the
+    ``voxel51.config.CONTENT_ENCODING_ENV_VAR`` environment variable, if set,
+    or ``voxel51.config.DEFAULT_CONTENT_ENCODING`` otherwise, which does not
+    compress it. All other content is uploaded as-is.
+
+    Args:
+        content_type (str): the MIME type of the content, or None if unknown
+        content_encoding (ContentEncoding, optional): an explicit content
+            encoding to use, which, if provided, is returned as-is
+
+    Returns:
+        the ContentEncoding to use
+    '''
+    if content_encoding is not None:
+        return content_encoding
+
+    if not is_compressible_mime_type(content_type):
+        return ContentEncoding.IDENTITY
+
+    return os.environ.get(
+        voxc.CONTENT_ENCODING_ENV_VAR, voxc.DEFAULT_CONTENT_ENCODING)
+
+
+def get_compression_level(content_encoding, level=None):
+    '''Gets the compression level to use for the given content encoding.
+
+    Args:
+        content_encoding (ContentEncoding): the content encoding
+        level (int, optional): an explicit compression level to use, which, if
+            provided, is returned as-is
+
+    Returns:
+        the compression level
+    '''
+    if level is not None:
+        return level
+
+    level = os.environ.get(voxc.COMPRESSION_LEVEL_ENV_VAR)
+    if level:
+        return int(level)
+
+    return voxc.DEFAULT_COMPRESSION_LEVELS.get(content_encoding)
+
+
+def compress_chunks(chunks, content_encoding, level=None):
+    '''Compresses the given stream of bytes with the given content encoding.
+
+    Args:
+        chunks (iterable): an iterable of bytes to compress
+        content_encoding (ContentEncoding): the content encoding to apply
+        level (int, optional): the compression level to use. By default, the
+            level is chosen via ``get_compression_level``
+
+    Returns:
+        an iterable that emits the encoded bytes
+
+    Raises:
+        ValueError: if the content encoding is not supported
+    '''
+    if content_encoding == ContentEncoding.IDENTITY:
+        return chunks
+
+    level = get_compression_level(content_encoding, level=level)
+    if content_encoding == ContentEncoding.GZIP:
+        return gzip_chunks(chunks, level=level)
+
+    if content_encoding == ContentEncoding.ZSTD:
+        return zstd_chunks(chunks, level=level)
+
+    raise ValueError("Unsupported content encoding '%s'" % content_encoding)
+
+
+def make_request_body(parts, content_encoding=None, compression_level=None):
+    '''Makes a request body that concatenates the given parts.
+
+    The body reports its size, so that it is sent with a Content-Length, as
+    signed URLs often require, and it can be rewound, so that requests whose
+    body it is can be retried. Parts that are not seekable, and compressed
+    bodies, are spooled, in memory up to
+    ``voxel51.config.UPLOAD_SPOOL_MAX_SIZE`` bytes and on disk beyond it.
+
+    The body must be closed when it is no longer needed, which deletes its
+    spools, if any, but does not close the given parts.
+
+    Args:
+        parts (list): a list of bytes and binary file-like objects, which are
+            read from their current positions
+        content_encoding (ContentEncoding, optional): the content encoding to
+            apply to the body. By default, the body is not encoded
+        compression_level (int, optional): the compression level to use. By
+            default, the level is chosen via ``get_compression_level``
+
+    Returns:
+        a readable file-like object. If its ``transfer`` attribute is set to a
+            Transfer, its reads are throttled by the transfer
+    '''
+    reader = _ConcatReader(parts)
+    if content_encoding in (None, ContentEncoding.IDENTITY):
+        return _SizedReader(reader, len(reader))
+
+    try:
+        return _spool_chunks(compress_chunks(
+            read_file_obj_chunks(reader), content_encoding,
+            level=compression_level))
+    finally:
+        reader.close()
+
+
+def read_chunks(path, start=0, end=None, chunk_size=_CHUNK_SIZE):
+    '''Generates the contents of the given file in chunks.
+
+    Args:
+        path (str): the path to the file
+        start (int, optional): the byte offset at which to start reading. By
+            default, this is 0
+        end (int, optional): the byte offset at which to stop reading. By
+            default, the file is read until EOF
+        chunk_size (int, optional): the maximum size of each chunk, in bytes
+
+    Returns:
+        a generator that emits the bytes of the file
+    '''
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start if end is not None else None
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(
+                chunk_size, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def read_file_obj_chunks(f, chunk_size=_CHUNK_SIZE):
+    '''Generates the contents of the given file-like object, from its current
+    position, in chunks.
+
+    Args:
+        f: a binary file-like object
+        chunk_size (int, optional): the maximum size of each chunk, in bytes
+
+    Returns:
+        a generator that emits the bytes of the file
+    '''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def read_buffer_chunks(buf, chunk_size=_CHUNK_SIZE):
+    '''Generates zero-copy slices of the given buffer.
+
+    Args:
+        buf: an object supporting the buffer protocol
+        chunk_size (int, optional): the maximum size of each slice, in bytes
+
+    Returns:
+        a generator that emits ``memoryview`` slices of the buffer
+    '''
+    view = _as_byte_view(buf)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:(start + chunk_size)]
+
+
+def gzip_chunks(chunks, level=zlib.Z_DEFAULT_COMPRESSION):
+    '''Compresses the given stream of bytes as a single gzip member.
+
+    Concatenated gzip members are themselves a valid gzip stream, so the
+    outputs of successive calls can be appended to one another.
+
+    Args:
+        chunks (iterable): an iterable of bytes to compress
+        level (int, optional): the compression level, from 1 to 9
+
+    Returns:
+        a generator that emits the compressed bytes
+    '''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def zstd_chunks(chunks, level=3):
+    '''Compresses the given stream of bytes as a single zstd frame.
+
+    This function requires the ``zstandard`` package.
+
+    Args:
+        chunks (iterable): an iterable of bytes to compress
+        level (int, optional): the compression level, from 1 to 22
+
+    Returns:
+        a generator that emits the compressed bytes
+
+    Raises:
+        ImportError: if the ``zstandard`` package is not installed
+    '''
+    zstandard = _import_zstandard("zstd content encoding")
+    return _iter_zstd_chunks(zstandard, chunks, level)
+
+
+def _iter_zstd_chunks(zstandard, chunks, level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _BufferReader(object):
+    '''A read-only file-like view of a buffer whose reads return zero-copy
+    slices. It reports its length so that HTTP clients can send a
+    Content-Length rather than chunking the body.
+    '''
+
+    def __init__(self, buf):
+        self._view = _as_byte_view(buf)
+        self._position = 0
+
+    def __len__(self):
+        return len(self._view)
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, min(offset, len(self._view)))
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        start = self._position
+        end = len(self._view) if size is None or size < 0 else min(
+            start + size, len(self._view))
+        self._position = end
+        return self._view[start:end]
+
+
+class _IterReader(object):
+    '''Wraps an iterator of bytes in a readable file-like object.'''
+
+    def __init__(self, chunks, close=None):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._close = close
+
+    def peek(self, size):
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        return self._buffer[:size]
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._buffer + b"".join(self._chunks)
+            self._buffer = b""
+            return data
+
+        if not self._buffer:
+            self._buffer = next(self._chunks, b"")
+        data = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return data
+
+    def drain(self):
+        for _ in self._chunks:
+            pass
+        self._buffer = b""
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+
+
+class _RangeReader(object):
+    '''A seekable file-like object that reads a remote file via range
+    requests.'''
+
+    def __init__(self, open_range, size):
+        self._open_range = open_range
+        self._size = size
+        self._position = 0
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._size
+        self._position = max(0, min(offset, self._size))
+        return self._position
+
+    def read(self, size=-1):
+        end = self._size
+        if size is not None and size >= 0:
+            end = min(self._position + size, self._size)
+        if end <= self._position:
+            return b""
+
+        reader = self._open_range(self._position, end)
+        try:
+            data = reader.read()
+        finally:
+            reader.close()
+
+        self._position = end
+        return data
+
+
+class _SizedReader(object):
+    '''A file-like wrapper that reports the size of the wrapped reader, so
+    that HTTP clients send a Content-Length, and that passes the bytes read
+    through an optional _Digester and Transfer.
+
+    Seekable readers can be rewound, so that requests whose body they are can
+    be sent again.
+    '''
+
+    def __init__(self, f, size):
+        self._f = f
+        self._size = size
+        self._start = f.tell() if _is_seekable(f) else None
+        self.digester = None
+        self.transfer = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def is_rewindable(self):
+        return self._start is not None
+
+    def rewind(self):
+        self._f.seek(self._start)
+        if self.digester is not None:
+            self.digester.reset()
+
+    def close(self):
+        if hasattr(self._f, "close"):
+            self._f.close()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        if self.transfer is not None:
+            self.transfer.throttle(len(data))
+        if self.digester is not None:
+            self.digester.update(data)
+        return data
+
+
+class _ConcatReader(object):
+    '''A seekable read-only file-like object that concatenates bytes and
+    binary file-like objects, from their current positions. Parts that are
+    not seekable are spooled, and the spools are deleted when the reader is
+    closed.
+    '''
+
+    def __init__(self, parts):
+        self._parts = []
+        self._spools = []
+        for part in parts:
+            if isinstance(part, bytes):
+                part = _BufferReader(part)
+            if not _is_seekable(part):
+                part = _spool_chunks(read_file_obj_chunks(part))._f
+                self._spools.append(part)
+
+            start = part.tell()
+            part.seek(0, os.SEEK_END)
+            self._parts.append((part, start, part.tell() - start))
+
+        self._size = sum(size for _, _, size in self._parts)
+        self._position = 0
+
+    def __len__(self):
+        return self._size
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._size
+        self._position = max(0, min(offset, self._size))
+        return self._position
+
+    def read(self, size=-1):
+        end = self._size
+        if size is not None and size >= 0:
+            end = min(self._position + size, self._size)
+
+        chunks = []
+        offset = 0
+        for part, start, part_size in self._parts:
+            if self._position >= end:
+                break
+
+            if self._position < offset + part_size:
+                part.seek(start + self._position - offset)
+                chunk = part.read(
+                    min(end, offset + part_size) - self._position)
+                chunks.append(chunk)
+                self._position += len(chunk)
+
+            offset += part_size
+
+        if len(chunks) == 1:
+            return chunks[0]  # Possibly a zero-copy slice
+
+        return b"".join(chunks)
+
+    def close(self):
+        for spool in self._spools:
+            spool.close()
+
+
+class _Digester(object):
+    '''Computes digests of a stream of bytes and verifies them against the
+    digest headers of an HTTP response.
+    '''
+
+    def __init__(self, algorithms):
+        self.size = 0
+        self._algorithms = algorithms
+        self._hashes = {a: _make_hash(a) for a in algorithms}
+
+    def reset(self):
+        self.size = 0
+        self._hashes = {a: _make_hash(a) for a in self._algorithms}
+
+    def update(self, data):
+        self.size += len(data)
+        for h in self._hashes.values():
+            h.update(data)
+
+    def iter_chunks(self, chunks):
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    def hexdigests(self):
+        return {
+            a: binascii.hexlify(h.digest()).decode("ascii")
+            for a, h in self._hashes.items()}
+
+    def verify(self, headers, url):
+        encoding = headers.get("Content-Encoding", ContentEncoding.IDENTITY)
+        if encoding != ContentEncoding.IDENTITY:
+            # Server digests describe the encoded bytes, not the decoded ones
+            return []
+
+        verified = []
+        for algorithm, expected in _parse_digest_headers(headers).items():
+            h = self._hashes.get(algorithm)
+            if h is None:
+                continue
+
+            if h.digest() != expected:
+                raise IntegrityError(
+                    "%s digest mismatch for '%s': expected %s, got %s" % (
+                        algorithm, url,
+                        binascii.hexlify(expected).decode("ascii"),
+                        binascii.hexlify(h.digest()).decode("ascii")))
+
+            verified.append(algorithm)
+
+        return verified
+
+    def make_result(self, path, verified, metrics=None):
+        return TransferResult(
+            path, self.size, self.hexdigests(), verified, metrics=metrics)
+
+
+class _CRC32CHash(object):
+
+    def __init__(self):
+        try:
+            import google_crc32c
+        except ImportError:
+            raise ImportError(
+                "The 'google-crc32c' package is required for crc32c digests")
+
+        self._checksum = google_crc32c.Checksum()
+
+    def update(self, data):
+        # The C extension only accepts read-only buffers that need not be
+        # released, so memoryview and bytearray chunks must be copied
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        self._checksum.update(data)
+
+    def digest(self):
+        return self._checksum.digest()
+
+
+def _make_hash(algorithm):
+    if algorithm == DigestAlgorithm.CRC32C:
+        return _CRC32CHash()
+
+    if algorithm in (DigestAlgorithm.MD5, DigestAlgorithm.SHA256):
+        return hashlib.new(algorithm)
+
+    raise ValueError("Unsupported digest algorithm '%s'" % algorithm)
+
+
+def _parse_digest_headers(headers):
+    digests = {}
+
+    # x-goog-hash: crc32c=<base64>,md5=<base64>
+    for value in headers.get("x-goog-hash", "").split(","):
+        algorithm, _, encoded = value.strip().partition("=")
+        if algorithm in (DigestAlgorithm.MD5, DigestAlgorithm.CRC32C):
+            digests[algorithm] = base64.b64decode(encoded)
+
+    content_md5 = headers.get("Content-MD5")
+    if content_md5 and "Content-Range" not in headers:
+        digests[DigestAlgorithm.MD5] = base64.b64decode(content_md5)
+
+    # ETags are only MD5s for simple (non-multipart, non-composite,
+    # unencrypted) objects, so they are only used if explicitly allowed
+    allow = os.environ.get(voxc.VERIFY_ETAG_MD5_ENV_VAR, "")
+    if allow.lower() != "true":
+        return digests
+
+    etag = headers.get("ETag", "").strip()
+    if etag.startswith("W/"):
+        etag = ""
+    etag = etag.strip('"')
+    if DigestAlgorithm.MD5 not in digests and len(etag) == 32:
+        try:
+            digests[DigestAlgorithm.MD5] = binascii.unhexlify(etag)
+        except (TypeError, ValueError):
+            pass
+
+    return digests
+
+
+def _get_total_size(res):
+    # Content-Range: bytes <start>-<end>/<total>
+    if res.status_code != 206:
+        return None
+
+    total = res.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def _get_filename(url, headers):
+    # Prefer the filename from the Content-Disposition header, if any
+    match = _FILENAME_PATTERN.search(headers.get("Content-Disposition", ""))
+    filename = match.group(1).strip("\"'") if match else None
+    if filename:
+        return os.path.basename(filename)
+
+    return os.path.basename(urlparse.urlparse(url).path)
+
+
+def _cap_timeout(timeout, deadline, method, url):
+    if deadline is None:
+        return timeout
+
+    deadline.check("%s request to '%s'" % (method, _strip_query(url)))
+    remaining = deadline.remaining()
+    if isinstance(timeout, tuple):
+        return tuple(min(t, remaining) for t in timeout)
+
+    return min(timeout, remaining)
+
+
+def _strip_query(url):
+    # Signed URLs carry credentials in their query strings
+    return url.split("?", 1)[0]
+
+
+def _send_request(session, method, url, timeout, kwargs):
+    start_time = time.time()
+    res = session.request(method, url, timeout=timeout, **kwargs)
+    get_latency_tracker(url).record(time.time() - start_time)
+    return res
+
+
+def _send_hedged_request(session, method, url, timeout, deadline, kwargs):
+    key = (method, url)
+    _wait_for_hedge_losers(key, deadline)
+
+    results = queue.Queue()
+    winner = []
+    lock = threading.Lock()
+
+    def _run(attempt_timeout):
+        try:
+            res = _send_request(session, method, url, attempt_timeout, kwargs)
+            error = None
+        except Exception as e:
+            res = None
+            error = e
+
+        with lock:
+            if winner and res is not None:
+                res.close()  # A response was already returned
+            if res is not None:
+                winner.append(res)
+        results.put((res, error))
+
+    threads = [_start_daemon_thread(partial(_run, timeout), "voxel51-hedge")]
+    try:
+        try:
+            res, error = results.get(
+                timeout=get_latency_tracker(url).get_hedge_delay())
+        except queue.Empty:
+            # The duplicate must not outlive the deadline either
+            hedge_timeout = _cap_timeout(timeout, deadline, method, url)
+            logger.debug(
+                "Hedging %s request to '%s'", method, _strip_query(url))
+            threads.append(_start_daemon_thread(
+                partial(_run, hedge_timeout), "voxel51-hedge"))
+            res, error = results.get()
+            if res is None:
+                # The other request may still succeed
+                res, error = results.get()
+    finally:
+        losers = [thread for thread in threads if thread.is_alive()]
+        if losers:
+            with _HEDGE_LOSERS_LOCK:
+                _HEDGE_LOSERS[key] = losers
+
+    if error is not None:
+        raise error
+
+    return res
+
+
+def _wait_for_hedge_losers(key, deadline):
+    with _HEDGE_LOSERS_LOCK:
+        losers = _HEDGE_LOSERS.pop(key, [])
+
+    for thread in losers:
+        thread.join(deadline.remaining() if deadline is not None else None)
+
+
+def _start_daemon_thread(target, name):
+    thread = threading.Thread(target=target, name=name)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def _sniff_archive_format(reader):
+    magic = reader.peek(_ARCHIVE_MAGIC_SIZE)
+    if magic[:4] in (_ZIP_LOCAL_HEADER_SIGNATURE, b"PK\x05\x06"):
+        return ArchiveFormat.ZIP
+    if magic[:2] == b"\x1f\x8b":
+        return ArchiveFormat.TAR_GZ
+    if magic[:4] == b"\x28\xb5\x2f\xfd":
+        return ArchiveFormat.TAR_ZSTD
+    if magic[257:262] == b"ustar":
+        return ArchiveFormat.TAR
+
+    raise ValueError("Unsupported archive format")
+
+
+def _get_extraction_path(output_dir, name):
+    parts = [
+        p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+    if not parts or ".." in parts or ":" in parts[0]:
+        return None
+
+    return os.path.join(output_dir, *parts)
+
+
+def _extract_tar(reader, output_dir):
+    archive_format = _sniff_archive_format(reader)
+    fileobj = reader
+    if archive_format == ArchiveFormat.TAR_ZSTD:
+        zstandard = _import_zstandard("zstd archives")
+        fileobj = zstandard.ZstdDecompressor().stream_reader(reader)
+
+    mode = "r|gz" if archive_format == ArchiveFormat.TAR_GZ else "r|"
+    num_members = 0
+    with tarfile.open(fileobj=fileobj, mode=mode) as tf:
+        for member in tf:
+            path = _get_extraction_path(output_dir, member.name)
+            if path is None or not (member.isfile() or member.isdir()):
+                logger.warning("Skipping archive member '%s'", member.name)
+                continue
+
+            if member.isdir():
+                if not os.path.isdir(path):
+                    os.makedirs(path)
+                continue
+
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as f:
+                shutil.copyfileobj(tf.extractfile(member), f, _CHUNK_SIZE)
+            num_members += 1
+
+    # Read any padding after the end of the archive, so that the digests
+    # cover the entire archive
+    reader.drain()
+    logger.debug("Extracted %d member(s) to '%s'", num_members, output_dir)
+
+
+def _extract_zip(fileobj, open_range, output_dir, max_workers):
+    from multiprocessing.pool import ThreadPool
+
+    with zipfile.ZipFile(fileobj) as zf:
+        infos = zf.infolist()
+        central_directory_offset = zf.start_dir
+
+    # Each member spans from its local header to the next member, which
+    # includes any data descriptor
+    offsets = sorted(set(info.header_offset for info in infos))
+    offsets.append(central_directory_offset)
+    end_offsets = dict(zip(offsets[:-1], offsets[1:]))
+
+    members = []
+    for info in infos:
+        path = _get_extraction_path(output_dir, info.filename)
+        if path is None:
+            logger.warning("Skipping archive member '%s'", info.filename)
+        elif info.filename.endswith("/"):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        else:
+            members.append((info, path, end_offsets[info.header_offset]))
+
+    if not members:
+        return
+
+    def _extract(member):
+        _extract_zip_member(open_range, *member)
+
+    pool = ThreadPool(min(max_workers, len(members)))
+    try:
+        pool.map(_extract, members)
+    finally:
+        pool.close()
+        pool.join()
+
+    logger.debug("Extracted %d member(s) to '%s'", len(members), output_dir)
+
+
+def _extract_zip_member(open_range, info, path, end_offset):
+    if info.flag_bits & 0x1:
+        raise ValueError(
+            "Encrypted archive member '%s' is not supported" % info.filename)
+
+    if info.compress_type == zipfile.ZIP_STORED:
+        decompressor = None
+    elif info.compress_type == zipfile.ZIP_DEFLATED:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    elif info.compress_type == zipfile.ZIP_BZIP2:
+        decompressor = bz2.BZ2Decompressor()
+    else:
+        raise ValueError(
+            "Unsupported compression method %d of archive member '%s'" % (
+                info.compress_type, info.filename))
+
+    reader = open_range(info.header_offset, end_offset)
+    try:
+        header = _read_exactly(reader, struct.calcsize(
+            _ZIP_LOCAL_HEADER_FORMAT), info.filename)
+        fields = struct.unpack(_ZIP_LOCAL_HEADER_FORMAT, header)
+        if fields[0] != _ZIP_LOCAL_HEADER_SIGNATURE:
+            raise IOError(
+                "Invalid local header of archive member '%s'" % info.filename)
+        _read_exactly(reader, fields[-2] + fields[-1], info.filename)
+
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        crc = 0
+        remaining = info.compress_size
+        with open(path, "wb") as f:
+            while remaining > 0:
+                chunk = _read_exactly(
+                    reader, min(remaining, _CHUNK_SIZE), info.filename)
+                remaining -= len(chunk)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                crc = zlib.crc32(chunk, crc)
+                f.write(chunk)
+
+            if hasattr(decompressor, "flush"):
+                chunk = decompressor.flush()
+                crc = zlib.crc32(chunk, crc)
+                f.write(chunk)
+    finally:
+        reader.close()
+
+    if crc & 0xffffffff != info.CRC:
+        os.remove(path)
+        raise IntegrityError(
+            "CRC-32 mismatch for archive member '%s'" % info.filename)
+
+
+def _extract_spooled_zip(reader, output_dir, max_workers):
+    fd, spool_path = tempfile.mkstemp(suffix=".zip", dir=output_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(reader, f, _CHUNK_SIZE)
+
+        with open(spool_path, "rb") as f:
+            _extract_zip(
+                f, partial(_open_local_range, spool_path), output_dir,
+                max_workers)
+    finally:
+        os.remove(spool_path)
+
+
+def _read_exactly(reader, size, name):
+    data = b""
+    while len(data) < size:
+        chunk = reader.read(size - len(data))
+        if not chunk:
+            raise IOError("Archive member '%s' is truncated" % name)
+        data += chunk
+    return data
+
+
+def _open_http_range(url, transfer, start, end):
+    res = send_request(
+        _get_http_session(), "GET", url, idempotent=True, stream=True,
+        headers={"Range": "bytes=%d-%d" % (start, end - 1)})
+    try:
+        res.raise_for_status()
+        if res.status_code != 206:
+            raise IOError("Range requests are not supported by the server")
+    except:
+        res.close()
+        raise
+
+    return _IterReader(
+        transfer.iter_chunks(res.iter_content(chunk_size=_CHUNK_SIZE)),
+        close=res.close)
+
+
+def _open_local_range(path, start, end):
+    return _IterReader(read_chunks(path, start=start, end=end))
+
+
+def _is_seekable(f):
+    if isinstance(f, tempfile.SpooledTemporaryFile):
+        return True  # Only implements seekable() on Python 3.11+
+
+    try:
+        return f.seekable()
+    except (AttributeError, IOError, OSError, ValueError):
+        return False
+
+
+def _spool_chunks(chunks):
+    spool = tempfile.SpooledTemporaryFile(max_size=voxc.UPLOAD_SPOOL_MAX_SIZE)
+    try:
+        for chunk in chunks:
+            spool.write(chunk)
+        size = spool.tell()
+        spool.seek(0)
+    except:
+        spool.close()
+        raise
+
+    return _SizedReader(spool, size)
+
+
+def _digest_local_file(path, digests):
+    digester = _Digester(get_digest_algorithms(digests))
+    if digester.hexdigests():
+        for chunk in read_chunks(path):
+            digester.update(chunk)
+    else:
+        digester.size = os.path.getsize(path)
+
+    return digester.make_result(path, [])
+
+
+def _write_local_file(chunks, path):
+    # Written to a temporary file that is renamed into place, so that readers
+    # never see a partial file
+    dst_dir = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(dst_dir):
+        os.makedirs(dst_dir)
+
+    digester = _Digester(get_digest_algorithms())
+    tmp_path = _make_temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in digester.iter_chunks(chunks):
+                f.write(chunk)
+
+        _replace_file(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return digester.make_result(None, [])
+
+
+def _make_temp_path(path):
+    dirname, basename = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix="." + basename + ".", dir=dirname)
+    os.close(fd)
+    os.remove(tmp_path)
+    return tmp_path
+
+
+def _replace_file(src_path, dst_path):
+    if hasattr(os, "replace"):
+        os.replace(src_path, dst_path)  # Python 3
+    else:
+        os.rename(src_path, dst_path)  # Python 2, atomic on POSIX only
+
+
+def _allow_local_paths():
+    if os.environ.get(voxc.LOCAL_API_DIR_ENV_VAR):
+        return True
+
+    allow = os.environ.get(voxc.ALLOW_LOCAL_PATHS_ENV_VAR, "")
+    return allow.lower() == "true"
+
+
+def _link_file(src_path, dst_path):
+    try:
+        os.link(src_path, dst_path)
+        return True
+    except (AttributeError, OSError):
+        return False  # Not supported or different filesystems
+
+
+def _clone_file(src_path, dst_path):
+    try:
+        import fcntl
+    except ImportError:
+        return False  # Not supported on Windows
+
+    try:
+        with open(src_path, "rb") as fsrc, open(dst_path, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        return True
+    except (IOError, OSError):
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        return False
+
+
+def _download_segments(
+        url, f, start, total_size, segment_size, transfer, digester,
+        controller):
+    tasks = queue.Queue()
+    results = queue.Queue()
+
+    def _worker():
+        while True:
+            item = tasks.get()
+            if item is None:
+                return
+
+            index, first, last = item
+            start_time = time.time()
+            try:
+                # Throttled segments are retried below, so that the
+                # concurrency controller sees the throttling
+                res = send_request(
+                    _get_http_session(), "GET", url,
+                    headers={"Range": "bytes=%d-%d" % (first, last)})
+                if res.status_code in _THROTTLING_STATUS_CODES:
+                    data = None
+                else:
+                    res.raise_for_status()
+                    data = res.content
+                    if len(data) != last - first + 1:
+                        raise IOError(
+                            "Expected %d bytes but received %d" % (
+                                last - first + 1, len(data)))
+                error = None
+            except Exception as e:
+                data = None
+                error = e
+
+            results.put((index, first, data, time.time() - start_time, error))
+
+    threads = []
+    for _ in range(controller.max_concurrency):
+        thread = threading.Thread(target=_worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    # Out-of-order segments are held in memory until they can be hashed in
+    # order, so dispatch is limited to a bounded distance ahead of the hash
+    ordered = bool(digester.hexdigests())
+    pending = deque(enumerate(range(start, total_size, segment_size)))
+    held = {}
+    next_index = 0
+    num_retries = {}
+    num_in_flight = 0
+    try:
+        while pending or num_in_flight:
+            while (pending and num_in_flight < controller.concurrency and (
+                    not ordered or
+                    pending[0][0] - next_index < controller.max_concurrency)):
+                index, first = pending.popleft()
+                last = min(first + segment_size, total_size) - 1
+                tasks.put((index, first, last))
+                num_in_flight += 1
+
+            index, first, data, latency, error = results.get()
+            num_in_flight -= 1
+            if data is None:
+                controller.record(0, latency, throttled=True)
+                num_retries[index] = num_retries.get(index, 0) + 1
+                if num_retries[index] > voxc.MAX_SEGMENT_RETRIES:
+                    raise error or IOError(
+                        "Range request for '%s' was throttled %d times" % (
+                            url, num_retries[index]))
+
+                time.sleep(min(2 ** num_retries[index] * 0.1, 5))
+                pending.appendleft((index, first))
+                continue
+
+            controller.record(len(data), latency)
+            transfer.throttle(len(data))
+            f.seek(first)
+            f.write(data)
+            if not ordered:
+                digester.size += len(data)
+                continue
+
+            held[index] = data
+            while next_index in held:
+                digester.update(held.pop(next_index))
+                next_index += 1
+    finally:
+        for _ in threads:
+            tasks.put(None)
+
+
+def _as_byte_view(buf):
+    view = memoryview(buf)
+    if not view.contiguous:
+        # Non-contiguous buffers (e.g., strided arrays) must be copied
+        view = memoryview(view.tobytes())
+    if view.ndim != 1 or view.format != "B":
+        view = view.cast("B")
+    return view
+
+
+def _madvise(mm, access_pattern):
+    advice = getattr(mmap, "MADV_" + access_pattern.upper(), None)
+    if advice is None or not hasattr(mm, "madvise"):
+        return  # not supported on this platform/Python version
+    mm.madvise(advice)
+
+
+def _dump_json(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def _make_tar_header(arcname, size):
+    tarinfo = tarfile.TarInfo(arcname)
+    tarinfo.size = size
+    tarinfo.mtime = int(time.time())
+    tarinfo.mode = 0o644
+    return tarinfo.tobuf(
+        format=tarfile.PAX_FORMAT, encoding="utf-8", errors="strict")
+
+
+def _run_upload_writer(
+        parts, errors, path_config, content_type, content_encoding,
+        set_content_type):
+    def _iter_parts():
+        while True:
+            part = parts.get()
+            if part is None:
+                return
+            if part is _ABORT_UPLOAD:
+                # Failing the request body prevents the upload from being
+                # committed
+                raise IOError("Upload was aborted")
+            yield part
+
+    try:
+        upload_stream(
+            _iter_parts(), path_config, content_type=content_type,
+            content_encoding=content_encoding,
+            set_content_type=set_content_type, schedule_chunks=True)
+    except Exception as e:
+        errors.append(e)
+
+
+def _import_zstandard(purpose):
+    # Imported on first use, since it is slow to import and rarely needed
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "The 'zstandard' package is required for %s" % purpose)
+
+    return zstandard
+
+
+def _iter_tar_record(header, chunks, size, last=False):
+    yield header
+    num_bytes = 0
+    for chunk in chunks:
+        num_bytes += len(chunk)
+        yield chunk
+
+    if num_bytes != size:
+        raise IOError(
+            "Expected %d bytes but read %d; was the file modified while it "
+            "was being uploaded?" % (size, num_bytes))
+
+    remainder = size % tarfile.BLOCKSIZE
+    if remainder:
+        yield tarfile.NUL * (tarfile.BLOCKSIZE - remainder)
+    if last:
+        yield tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+
+
+def _upload_stream(
+        body, url, content_type, content_encoding, digests=None,
+        priority=TransferPriority.BULK, schedule_chunks=False):
+    headers = {}
+    if content_encoding != ContentEncoding.IDENTITY:
+        headers["Content-Encoding"] = content_encoding
+    if content_type:
+        headers["Content-Type"] = content_type
+
+    # Bodies that are fully buffered can be sent again, so their uploads are
+    # retried, and, if they are control-plane uploads, hedged. Seekable
+    # readers are sent again too, but never hedged, since duplicates would
+    # read them concurrently
+    is_buffered = isinstance(body, bytes)
+    is_replayable = is_buffered or (
+        isinstance(body, _SizedReader) and body.is_rewindable)
+    is_control = priority == TransferPriority.CONTROL
+    digester = _Digester(get_digest_algorithms(digests))
+    scheduler = get_transfer_scheduler()
+
+    def _send(data):
+        return send_request(
+            _get_http_session(), "PUT", url,
+            timeout=voxc.CONTROL_REQUEST_TIMEOUT if is_control else None,
+            idempotent=is_replayable, hedge=is_buffered and is_control,
+            data=data, headers=headers)
+
+    # Streams whose chunks are scheduled separately only hold a slot while a
+    # chunk is being sent
+    is_stream = not is_buffered and not isinstance(body, _SizedReader)
+    if schedule_chunks and is_stream:
+        res = _send(scheduler.iter_chunks(
+            digester.iter_chunks(body), priority))
+    else:
+        with scheduler.transfer(priority) as transfer:
+            if is_buffered:
+                digester.update(body)
+                transfer.throttle(len(body))
+            elif isinstance(body, _SizedReader):
+                body.digester = digester
+                body.transfer = transfer
+            else:
+                body = transfer.iter_chunks(digester.iter_chunks(body))
+
+            res = _send(body)
+
+    res.raise_for_status()
+
+    # The digests describe the bytes as stored, i.e., after any encoding
+    headers = res.headers.copy()
+    headers.pop("Content-Encoding", None)
+    return digester.make_result(None, digester.verify(headers, url))
+
+
+def _is_ip_address(address):
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, address)
+            return True
+        except (socket.error, ValueError):
+            pass
+    return False
+
+
+def _warm_up_connection(session, origin):
+    try:
+        session.head(origin, timeout=voxc.PREWARM_TIMEOUT).close()
+    except Exception:
+        pass
+
+
+def _get_http_sessions():
+    _get_http_session()
+    if _HTTP_SESSION_POOL is not None:
+        return _HTTP_SESSION_POOL.sessions
+    return [_HTTP_SESSION]
+
+
+def _get_http_session():
+    # Data transfers are striped across the configured source addresses, if
+    # any, by handing out sessions round-robin
+    global _HTTP_SESSION, _HTTP_SESSION_POOL
+    if _HTTP_SESSION_POOL is None and _HTTP_SESSION is None:
+        with _HTTP_SESSION_LOCK:
+            if _HTTP_SESSION_POOL is None and _HTTP_SESSION is None:
+                addresses = os.environ.get(
+                    voxc.DATA_SOURCE_ADDRESSES_ENV_VAR, "")
+                addresses = [
+                    a.strip() for a in addresses.split(",") if a.strip()]
+                if addresses:
+                    _HTTP_SESSION_POOL = SessionPool(addresses)
+                else:
+                    _HTTP_SESSION = make_session()
+
+    if _HTTP_SESSION_POOL is not None:
+        return _HTTP_SESSION_POOL.next_session()
+
+    return _HTTP_SESSION
 
-def _get_http_client():
-    global _HTTP_CLIENT
-    if _HTTP_CLIENT is None:
-        _HTTP_CLIENT = etas.HTTPStorageClient()
-    return _HTTP_CLIENT